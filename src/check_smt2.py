@@ -0,0 +1,39 @@
+import argparse
+import glob
+import json
+import os
+from collections import Counter
+
+from fol_reasoning.smtlib import BatchChecker, ResultCache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check SMT-LIB2 files in bulk with a pool of solver processes.")
+    parser.add_argument("paths", nargs="+", help="SMT-LIB2 files, or directories searched for *.smt2 files.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of solver processes (default: CPU count).")
+    parser.add_argument("--timeout", type=int, default=10000, help="Timeout of each file, in milliseconds.")
+    parser.add_argument("--cache", default=None, help="Optional SQLite file persisting results by content hash across runs.")
+    parser.add_argument("--command", nargs="+", default=None, help="Solver command line (default: z3 -smt2 if installed).")
+    parser.add_argument("--output", default=None, help="Optional path to write the results as JSONL.")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, "**", "*.smt2"), recursive=True)))
+        else:
+            paths.append(path)
+
+    cache = ResultCache(path=args.cache)
+    checker = BatchChecker(workers=args.workers, timeout=args.timeout, cache=cache, command=args.command)
+    results = checker.check_files(paths)
+    cache.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            for result in results:
+                file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    statuses = Counter(result["status"] for result in results)
+    cached = sum(result["cached"] for result in results)
+    print(f"Checked {len(results)} files ({cached} from the cache): "
+          + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())))
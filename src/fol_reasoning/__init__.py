@@ -0,0 +1,50 @@
+"""
+Generation of first-order logic reasoning problems.
+
+Names are resolved lazily (PEP 562): `from fol_reasoning import FOLRenderer` only imports
+the modules it needs, and z3 is loaded on first use by code that calls the solver, so
+rendering, serializing and reading stored datasets do not load the Z3 library.
+"""
+import importlib
+
+# Public name -> module defining it
+_EXPORTS = {
+    "FOLReasoning": "reasoning",
+    "Signature": "signature",
+    "FOLRenderer": "utils",
+    "expr_to_fol_string": "utils",
+    "build_record": "utils",
+    "save_to_json": "utils",
+    "FormulaStore": "premise",
+    "Premise": "premise",
+    "compact_premises": "premise",
+    "dump_premises": "premise",
+    "load_premises": "premise",
+    "JsonlWriter": "writer",
+    "read_jsonl": "writer",
+    "ValidityCache": "cache",
+    "SolverProfiler": "profiling",
+    "BudgetExceeded": "profiling",
+    "EntailmentOracle": "oracle",
+    "ForwardChainer": "chaining",
+    "DistractorMiner": "distractors",
+    "Problem": "smtlib",
+    "BatchChecker": "smtlib",
+    "Grader": "grading",
+    "generate_bulk": "bulk",
+    "GenerationService": "service",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
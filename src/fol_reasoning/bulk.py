@@ -0,0 +1,281 @@
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .reasoning import FOLReasoning
+from .questions import generate_chained_multiple_choice_question, generate_chained_yes_no_question, displayed_premises
+from .utils import FOLRenderer, build_record
+from .oracle import EntailmentOracle
+from .cache import ValidityCache
+from .writer import JsonlWriter
+from .profiling import SolverProfiler, BudgetExceeded, merge_summaries
+from .canonical import DedupIndex, problem_fingerprint
+from .distractors import DistractorMiner
+from .entailment import DerivationError
+
+logger = logging.getLogger(__name__)
+
+
+def shard_seed(seed, shard_idx):
+    """
+    Derive the deterministic seed of a shard from the run seed.
+
+    Args:
+        seed (int): Seed of the whole bulk run.
+        shard_idx (int): Index of the shard.
+
+    Returns:
+        int: A 64-bit seed that only depends on (seed, shard_idx).
+    """
+    # String seeds are hashed with SHA-512, so the result is stable across processes and runs
+    return random.Random(f"{seed}:{shard_idx}").getrandbits(64)
+
+
+def generate_sample(fol_reasoning, steps, chain_count, derive_count, dedup=None, miner=None):
+    """
+    Generate one dataset sample: a premise set with a multiple-choice and a yes/no/uncertain question.
+
+    Args:
+        fol_reasoning (FOLReasoning): The reasoner used to build the premises.
+        steps (int): Total number of premises to generate.
+        chain_count (int): Number of premises that should be logically chained.
+        derive_count (int): Number of derived premises to create.
+        dedup (DedupIndex): Optional index of the problems generated so far. A premise set
+            whose renaming-invariant fingerprint is already in it is rejected.
+        miner (DistractorMiner): Optional miner of the multiple-choice distractors.
+
+    Returns:
+        dict: A record with the same layout as the files written by save_to_json, or None
+        if the premise set is a duplicate.
+    """
+    premises = fol_reasoning.generate_premises(steps=steps, chain_count=chain_count, derive_count=derive_count)
+    all_premises = displayed_premises(premises)
+    # Reject duplicates before paying for the questions
+    if dedup is not None and not dedup.add(problem_fingerprint(expr for _, expr in all_premises)):
+        return None
+
+    # One renderer and one oracle per sample: premises and questions share their rendered
+    # subterms, and both questions are labelled by the same incremental solver over the
+    # premises they are shown with
+    renderer = FOLRenderer()
+    oracle = EntailmentOracle(all_premises, profiler=fol_reasoning.profiler)
+    rendered_premises = [renderer.render(expr) for _, expr in all_premises]
+    mc_question, mc_answer, mc_used_indices = generate_chained_multiple_choice_question(
+        premises, option="last", renderer=renderer, oracle=oracle, miner=miner)
+    yn_question, yn_answer, yn_used_indices = generate_chained_yes_no_question(
+        premises, option="random", renderer=renderer, oracle=oracle)
+
+    return build_record(
+        rendered_premises,
+        [mc_question, yn_question],
+        [mc_answer, yn_answer],
+        [mc_used_indices, yn_used_indices],
+    )
+
+
+def generate_shard(shard_idx, num_samples, output_dir, seed, steps, chain_count, derive_count,
+                   cache_path=None, compression=None, max_file_bytes=None, checkpoint_every=100, resume=False,
+                   timeout=None, rlimit=None, dedup=True, dedup_path=None, mine_distractors=False, signature=None):
+    """
+    Generate one shard of the dataset and stream it to disk as JSONL.
+
+    Runs inside a worker process: the process owns its own Z3 context, and the global
+    random generator is reseeded from (seed, shard_idx), so a shard can be regenerated
+    on its own and always yields the same samples. The writer checkpoints the record
+    count, the generator state and the dedup index, so an interrupted shard resumes
+    where it stopped and writes the same records as an uninterrupted one.
+
+    Args:
+        shard_idx (int): Index of the shard.
+        num_samples (int): Number of samples in the shard.
+        output_dir (str): Directory the shard files are written to.
+        seed (int): Seed of the whole bulk run.
+        steps (int): Total number of premises per sample.
+        chain_count (int): Number of chained premises per sample.
+        derive_count (int): Number of derived premises per sample.
+        cache_path (str): Optional SQLite file of the validity cache shared by all workers.
+        compression (str): Optional compression of the JSONL files ("gzip", "bz2" or "xz").
+        max_file_bytes (int): Optional size after which the shard rolls over to a new file.
+        checkpoint_every (int): Number of samples between checkpoints.
+        resume (bool): If True, continue from the last checkpoint of the shard.
+        timeout (int): Optional timeout of each solver check, in milliseconds.
+        rlimit (int): Optional resource limit of each solver check.
+        dedup (bool): If True, reject samples whose premise set duplicates an earlier one
+            up to reordering and predicate renaming.
+        dedup_path (str): Optional SQLite file of the dedup index shared by all workers, so
+            duplicates are also rejected across shards and runs.
+        mine_distractors (bool): If True, the multiple-choice distractors are mined by a
+            DistractorMiner instead of built from templates (requires NumPy).
+        signature (dict): Optional keyword arguments of the Signature the premises are
+            drawn over (built in the worker, since Z3 objects cannot be pickled).
+
+    Returns:
+        dict: Statistics of the shard (index, paths, sample count, elapsed seconds, worker pid,
+        cache counters, dedup counters, solver profile).
+    """
+    random.seed(shard_seed(seed, shard_idx))
+    cache = ValidityCache(path=cache_path)
+    profiler = SolverProfiler(timeout=timeout, rlimit=rlimit)
+    fol_reasoning = FOLReasoning(cache=cache, profiler=profiler, signature=signature)
+    prefix = f"shard-{shard_idx:05d}"
+    # The journal checkpoints the index with the shard, so a resumed shard rejects the same duplicates
+    dedup_index = DedupIndex(path=dedup_path, journal=os.path.join(output_dir, f"{prefix}.dedup")) if dedup else None
+    miner = DistractorMiner.from_reasoner(fol_reasoning) if mine_distractors else None
+
+    start = time.perf_counter()
+    try:
+        with JsonlWriter(output_dir, prefix=prefix, compression=compression, max_shard_bytes=max_file_bytes,
+                         checkpoint_every=checkpoint_every, resume=resume, state=dedup_index) as writer:
+            resumed = writer.count
+            skipped = 0
+            duplicates = 0
+            resampled = 0
+            while writer.count < num_samples:
+                try:
+                    record = generate_sample(fol_reasoning, steps, chain_count, derive_count, dedup=dedup_index, miner=miner)
+                    if record is None:
+                        duplicates += 1
+                        if duplicates > 10 * num_samples:
+                            raise RuntimeError(f"Shard {shard_idx}: too many duplicate samples; "
+                                               "the configuration admits too few distinct problems.")
+                        continue
+                    writer.write(record)
+                except BudgetExceeded as exc:
+                    # Skip the pathological sample instead of stalling the worker
+                    logger.warning("Shard %d: skipping sample %d: %s", shard_idx, writer.count, exc)
+                    profiler.count_skip(f"{exc.stage}/{exc.rule}")
+                    skipped += 1
+                    if skipped > num_samples:
+                        raise RuntimeError(f"Shard {shard_idx}: more samples skipped than requested; raise the solver budgets.")
+                except DerivationError as exc:
+                    # The premise set admits too few derivations or distractors: draw another one
+                    logger.debug("Shard %d: resampling sample %d: %s", shard_idx, writer.count, exc)
+                    profiler.count_retry("sample", "derivation")
+                    resampled += 1
+                    if resampled > num_samples:
+                        raise RuntimeError(f"Shard {shard_idx}: more samples resampled than requested; "
+                                           "the configuration admits too few derivations.")
+    finally:
+        # Release the databases even if the shard fails, so no write transaction is left open
+        cache.close()
+        if dedup_index is not None:
+            dedup_index.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "shard": shard_idx,
+        "paths": writer.paths,
+        "samples": num_samples - resumed,
+        "resumed_from": resumed,
+        "elapsed": elapsed,
+        "pid": os.getpid(),
+        "cache": cache.stats(),
+        "dedup": dedup_index.stats() if dedup_index is not None else None,
+        "profile": profiler.summary(),
+    }
+
+
+def summarize_throughput(shard_stats):
+    """
+    Aggregate shard statistics into per-worker and overall throughput.
+
+    Args:
+        shard_stats (list): Statistics returned by generate_shard.
+
+    Returns:
+        dict: Per-worker sample counts, busy time and samples/sec, plus the totals.
+    """
+    workers = defaultdict(lambda: {"shards": 0, "samples": 0, "elapsed": 0.0})
+    for stats in shard_stats:
+        worker = workers[stats["pid"]]
+        worker["shards"] += 1
+        worker["samples"] += stats["samples"]
+        worker["elapsed"] += stats["elapsed"]
+
+    for worker in workers.values():
+        worker["samples_per_sec"] = worker["samples"] / worker["elapsed"] if worker["elapsed"] else 0.0
+
+    cache = {counter: sum(stats["cache"][counter] for stats in shard_stats)
+             for counter in ("hits", "misses", "evictions", "disk_hits")}
+    duplicates = sum(stats["dedup"]["duplicates"] for stats in shard_stats if stats.get("dedup"))
+
+    return {
+        "workers": dict(workers),
+        "cache": cache,
+        "duplicates": duplicates,
+        "samples": sum(worker["samples"] for worker in workers.values()),
+        "samples_per_sec_per_worker": sum(worker["samples_per_sec"] for worker in workers.values()) / len(workers) if workers else 0.0,
+    }
+
+
+def generate_bulk(output_dir, num_samples, shard_size=1000, workers=None, seed=0,
+                  steps=3, chain_count=1, derive_count=2, shards=None, cache_path=None,
+                  compression=None, max_file_bytes=None, checkpoint_every=100, resume=False,
+                  timeout=None, rlimit=None, dedup=True, dedup_path=None, mine_distractors=False,
+                  signature=None):
+    """
+    Generate a dataset in parallel, spreading shards over a process pool.
+
+    Args:
+        output_dir (str): Directory the shard files are written to.
+        num_samples (int): Total number of samples in the dataset.
+        shard_size (int): Number of samples per shard.
+        workers (int): Number of worker processes (defaults to the number of CPUs).
+        seed (int): Seed of the run; each shard derives its own seed from it.
+        steps (int): Total number of premises per sample.
+        chain_count (int): Number of chained premises per sample.
+        derive_count (int): Number of derived premises per sample.
+        shards (list): Optional subset of shard indices to (re)generate.
+        cache_path (str): Optional SQLite file persisting validity results across workers and runs.
+        compression (str): Optional compression of the JSONL files ("gzip", "bz2" or "xz").
+        max_file_bytes (int): Optional size after which a shard rolls over to a new file.
+        checkpoint_every (int): Number of samples between checkpoints.
+        resume (bool): If True, shards continue from their last checkpoint instead of starting over.
+        timeout (int): Optional timeout of each solver check, in milliseconds.
+        rlimit (int): Optional resource limit of each solver check.
+        dedup (bool): If True, reject duplicate problems (up to reordering and predicate renaming).
+        dedup_path (str): Optional SQLite file of the dedup index, shared by the workers and
+            kept across runs. Without it, duplicates are only rejected within a shard, which
+            keeps every shard reproducible on its own.
+        mine_distractors (bool): If True, mine semantically close distractors for the
+            multiple-choice questions (requires NumPy).
+        signature (dict): Optional keyword arguments of a Signature (num_predicates, arities,
+            num_sorts, constants_per_sort) the premises are drawn over.
+
+    Returns:
+        dict: Per-shard statistics, the throughput summary and the merged solver profile.
+    """
+    if chain_count > steps:
+        raise ValueError("chain_count should be less than or equal to steps.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    num_shards = (num_samples + shard_size - 1) // shard_size
+    shard_indices = range(num_shards) if shards is None else shards
+
+    start = time.perf_counter()
+    shard_stats = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for shard_idx in shard_indices:
+            if not 0 <= shard_idx < num_shards:
+                raise ValueError(f"Shard {shard_idx} is out of range for {num_shards} shards.")
+            size = min(shard_size, num_samples - shard_idx * shard_size)
+            futures.append(executor.submit(
+                generate_shard, shard_idx, size, output_dir, seed, steps, chain_count, derive_count,
+                cache_path, compression, max_file_bytes, checkpoint_every, resume, timeout, rlimit,
+                dedup, dedup_path, mine_distractors, signature))
+
+        for future in as_completed(futures):
+            shard_stats.append(future.result())
+    wall_time = time.perf_counter() - start
+
+    shard_stats.sort(key=lambda stats: stats["shard"])
+    summary = summarize_throughput(shard_stats)
+    summary["wall_time"] = wall_time
+    summary["samples_per_sec"] = summary["samples"] / wall_time if wall_time else 0.0
+
+    profile = merge_summaries([stats.pop("profile") for stats in shard_stats])
+    return {"shards": shard_stats, "summary": summary, "profile": profile}
@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import sqlite3
+from collections import OrderedDict
+
+from .lazy import z3
+
+logger = logging.getLogger(__name__)
+
+
+def structural_hash(expr):
+    """
+    Compute a canonical structural hash of a Z3 expression.
+
+    The hash only depends on the shape of the AST: declaration names and kinds, sorts,
+    numerals and de Bruijn indices of bound variables. It does not depend on AST ids or
+    on the Python process, so it can be used as a key in a cache persisted on disk.
+    Quantifiers are hashed up to renaming of their bound variables.
+
+    Args:
+        expr (z3.ExprRef): The expression to hash.
+
+    Returns:
+        str: A 32-character hexadecimal digest.
+    """
+    ctx = expr.ctx_ref()
+    memo = {}
+    # Iterative post-order walk over raw AST pointers, memoized on the AST id of shared subterms
+    stack = [(expr.as_ast(), False)]
+    while stack:
+        ast, expanded = stack.pop()
+        ast_id = z3.Z3_get_ast_id(ctx, ast)
+        if ast_id in memo and not expanded:
+            continue
+        kind = z3.Z3_get_ast_kind(ctx, ast)
+
+        if kind == z3.Z3_APP_AST:
+            num_args = z3.Z3_get_app_num_args(ctx, ast)
+            children = [z3.Z3_get_app_arg(ctx, ast, i) for i in range(num_args)]
+        elif kind == z3.Z3_QUANTIFIER_AST:
+            children = [z3.Z3_get_quantifier_body(ctx, ast)]
+        else:
+            children = []
+
+        if children and not expanded:
+            stack.append((ast, True))
+            stack.extend((child, False) for child in children)
+            continue
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(kind).encode())
+        if kind == z3.Z3_APP_AST:
+            decl = z3.Z3_get_app_decl(ctx, ast)
+            digest.update(b"|%d|" % z3.Z3_get_decl_kind(ctx, decl))
+            digest.update(z3.Z3_get_symbol_string(ctx, z3.Z3_get_decl_name(ctx, decl)).encode())
+            digest.update(b"|" + z3.Z3_sort_to_string(ctx, z3.Z3_get_sort(ctx, ast)).encode())
+        elif kind == z3.Z3_NUMERAL_AST:
+            digest.update(b"|" + z3.Z3_get_numeral_string(ctx, ast).encode())
+            digest.update(b"|" + z3.Z3_sort_to_string(ctx, z3.Z3_get_sort(ctx, ast)).encode())
+        elif kind == z3.Z3_VAR_AST:
+            digest.update(b"|%d" % z3.Z3_get_index_value(ctx, ast))
+        elif kind == z3.Z3_QUANTIFIER_AST:
+            digest.update(b"|forall" if z3.Z3_is_quantifier_forall(ctx, ast) else b"|exists")
+            for i in range(z3.Z3_get_quantifier_num_bound(ctx, ast)):
+                digest.update(b"|" + z3.Z3_sort_to_string(ctx, z3.Z3_get_quantifier_bound_sort(ctx, ast, i)).encode())
+        for child in children:
+            digest.update(memo[z3.Z3_get_ast_id(ctx, child)])
+        memo[ast_id] = digest.digest()
+
+    return memo[z3.Z3_get_ast_id(ctx, expr.as_ast())].hex()
+
+
+def tautology_key(expr):
+    """
+    Return the cache key of a validity query.
+    """
+    return "T:" + structural_hash(expr)
+
+
+def entailment_key(premises, conclusion):
+    """
+    Return the cache key of an entailment query. The key does not depend on the order of the premises.
+    """
+    premise_hashes = sorted(structural_hash(premise) for premise in premises)
+    return "E:" + ",".join(premise_hashes) + ">" + structural_hash(conclusion)
+
+
+class ValidityCache:
+    """
+    A bounded LRU cache of validity and entailment results, optionally persisted to SQLite.
+
+    Memory misses fall through to the database, and new results are written to both, so
+    long bulk jobs and restarted runs start with warm hits. New results are buffered and
+    written in one short transaction per flush, so processes and threads sharing the
+    database never wait on a write transaction left open between puts.
+    """
+
+    def __init__(self, maxsize=65536, path=None, commit_every=1000):
+        """
+        Args:
+            maxsize (int): Maximum number of entries kept in memory.
+            path (str): Optional path of a SQLite database used to persist results.
+            commit_every (int): Number of new results buffered before they are written to
+                the database.
+        """
+        self.maxsize = maxsize
+        self.commit_every = commit_every
+        self._entries = OrderedDict()
+        self._pending = {}  # Results not yet written to the database
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=60)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS validity (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Look up a cached result.
+
+        Args:
+            key (str): Key built with tautology_key or entailment_key.
+
+        Returns:
+            bool: The cached result, or None on a miss.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        if key in self._pending:
+            self.hits += 1
+            return self._pending[key]
+
+        if self._db is not None:
+            row = self._db.execute("SELECT value FROM validity WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, bool(row[0]))
+                return bool(row[0])
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """
+        Store a result in memory and, if persistence is enabled, on disk.
+        """
+        self._remember(key, value)
+        if self._db is not None:
+            self._pending[key] = value
+            if len(self._pending) >= self.commit_every:
+                self.flush()
+
+    def _remember(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def flush(self):
+        """
+        Write the buffered results to the database in one transaction.
+
+        If the database stays locked by another writer past the busy timeout, the results
+        are kept in the buffer and written by a later flush.
+        """
+        if self._db is None or not self._pending:
+            return
+        try:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO validity (key, value) VALUES (?, ?)",
+                                     [(key, int(value)) for key, value in self._pending.items()])
+        except sqlite3.OperationalError as exc:
+            logger.warning("Could not write %d cached results: %s", len(self._pending), exc)
+            return
+        self._pending.clear()
+
+    def close(self):
+        """
+        Write the buffered results and close the database.
+        """
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        """
+        Return the hit/miss/eviction counters of the cache.
+
+        Returns:
+            dict: Counters and the current number of entries in memory.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_hits": self.disk_hits,
+            "size": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,340 @@
+import hashlib
+import logging
+import os
+import sqlite3
+
+from z3 import *
+
+# Operators whose arguments are unordered; AND/OR are also flattened (associative)
+_COMMUTATIVE = {Z3_OP_AND, Z3_OP_OR, Z3_OP_IFF, Z3_OP_XOR, Z3_OP_EQ, Z3_OP_DISTINCT, Z3_OP_ADD, Z3_OP_MUL}
+_ASSOCIATIVE = {Z3_OP_AND, Z3_OP_OR, Z3_OP_ADD, Z3_OP_MUL}
+
+logger = logging.getLogger(__name__)
+
+# Colour refinement rounds of the renaming-invariant fingerprint
+_MAX_ROUNDS = 4
+
+
+def _digest(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part)
+    return digest.digest()
+
+
+def _collect(exprs):
+    # Walk the formulas once over raw AST pointers and return their distinct nodes in
+    # post-order as (tag, op, children, predicate), plus the position of every root.
+    # Tags describe the node without the names of the predicates.
+    nodes = []
+    positions = {}
+    roots = []
+    for expr in exprs:
+        ctx = expr.ctx_ref()
+        stack = [(expr.as_ast(), False)]
+        while stack:
+            ast, expanded = stack.pop()
+            ast_id = Z3_get_ast_id(ctx, ast)
+            if ast_id in positions and not expanded:
+                continue
+            kind = Z3_get_ast_kind(ctx, ast)
+            if kind == Z3_APP_AST:
+                children = [Z3_get_app_arg(ctx, ast, i) for i in range(Z3_get_app_num_args(ctx, ast))]
+            elif kind == Z3_QUANTIFIER_AST:
+                children = [Z3_get_quantifier_body(ctx, ast)]
+            else:
+                children = []
+            if children and not expanded:
+                stack.append((ast, True))
+                stack.extend((child, False) for child in children)
+                continue
+
+            op = None
+            predicate = None
+            if kind == Z3_APP_AST:
+                decl = Z3_get_app_decl(ctx, ast)
+                op = Z3_get_decl_kind(ctx, decl)
+                sort = Z3_sort_to_string(ctx, Z3_get_sort(ctx, ast))
+                name = Z3_get_symbol_string(ctx, Z3_get_decl_name(ctx, decl))
+                if op == Z3_OP_UNINTERPRETED and Z3_get_sort_kind(ctx, Z3_get_sort(ctx, ast)) == Z3_BOOL_SORT:
+                    # Predicates are only named through their colour
+                    predicate = name
+                    tag = b"pred|%d" % len(children)
+                else:
+                    tag = b"app|%d|" % op + name.encode() + b"|" + sort.encode()
+            elif kind == Z3_NUMERAL_AST:
+                tag = b"num|" + Z3_get_numeral_string(ctx, ast).encode()
+            elif kind == Z3_VAR_AST:
+                tag = b"var|%d" % Z3_get_index_value(ctx, ast)
+            else:
+                tag = b"forall" if Z3_is_quantifier_forall(ctx, ast) else b"exists"
+                for i in range(Z3_get_quantifier_num_bound(ctx, ast)):
+                    tag += b"|" + Z3_sort_to_string(ctx, Z3_get_quantifier_bound_sort(ctx, ast, i)).encode()
+            positions[ast_id] = len(nodes)
+            nodes.append((tag, op, [positions[Z3_get_ast_id(ctx, child)] for child in children], predicate))
+        roots.append(positions[Z3_get_ast_id(ctx, expr.as_ast())])
+    return nodes, roots
+
+
+def _hash_nodes(nodes, colours):
+    # Bottom-up hashes of every node. Arguments of commutative operators are sorted and
+    # nested AND/OR/+/* are flattened, so AC-variants of a formula hash the same.
+    hashes = []
+    flat = []  # Flattened argument hashes of associative nodes
+    for tag, op, children, predicate in nodes:
+        args = []
+        for child in children:
+            if op in _ASSOCIATIVE and nodes[child][1] == op:
+                args.extend(flat[child])
+            else:
+                args.append(hashes[child])
+        if op in _COMMUTATIVE:
+            args.sort()
+        flat.append(args if op in _ASSOCIATIVE else None)
+        hashes.append(_digest(tag, colours[predicate] if predicate is not None else b"", *args))
+    return hashes
+
+
+def _fingerprint(exprs, rename):
+    nodes, roots = _collect(exprs)
+    predicates = {predicate for _, _, _, predicate in nodes if predicate is not None}
+    if not rename:
+        colours = {predicate: predicate.encode() for predicate in predicates}
+        hashes = _hash_nodes(nodes, colours)
+    else:
+        # Weisfeiler-Lehman style refinement: every predicate starts with the same colour
+        # and is recoloured by the multiset of contexts (parent node hashes) its atoms occur
+        # in, until the partition of the predicates stops splitting
+        colours = dict.fromkeys(predicates, b"")
+        parents = [[] for _ in nodes]
+        for position, (_, _, children, _) in enumerate(nodes):
+            for child in children:
+                parents[child].append(position)
+        num_classes = 1
+        for _ in range(_MAX_ROUNDS):
+            hashes = _hash_nodes(nodes, colours)
+            contexts = {predicate: [] for predicate in predicates}
+            for position, (_, _, _, predicate) in enumerate(nodes):
+                if predicate is not None:
+                    contexts[predicate].append(hashes[position])
+                    contexts[predicate].extend(hashes[parent] for parent in parents[position])
+            colours = {predicate: _digest(colours[predicate], *sorted(context))
+                       for predicate, context in contexts.items()}
+            classes = len(set(colours.values()))
+            if classes == num_classes:
+                break
+            num_classes = classes
+        hashes = _hash_nodes(nodes, colours)
+    # The formulas of a problem are an unordered multiset
+    return _digest(b"problem", *sorted(hashes[root] for root in roots))
+
+
+def canonical_hash(expr, rename=False):
+    """
+    Compute a fixed-size canonical fingerprint of a formula.
+
+    The fingerprint is invariant under reordering the arguments of commutative operators
+    and under re-associating AND/OR (Or(p, q), Or(q, p) and Or(p, Or(q, q)) vs
+    Or(Or(p, q), q) hash the same). With rename=True it is also invariant under a
+    consistent renaming of the predicates, e.g. P(x) → Q(x) and Q(x) → P(x).
+
+    Args:
+        expr (z3.ExprRef): The formula.
+        rename (bool): If True, ignore predicate names.
+
+    Returns:
+        bytes: A 16-byte digest.
+    """
+    return _fingerprint([expr], rename)
+
+
+def problem_fingerprint(exprs, rename=True):
+    """
+    Compute the canonical fingerprint of a problem given as a set of formulas.
+
+    The order of the formulas does not matter, and by default predicates are renamed
+    consistently across all of them, so two samples that only differ in the choice of
+    predicate letters get the same fingerprint.
+
+    Args:
+        exprs (list): The formulas of the problem (e.g. all of its premises).
+        rename (bool): If True, ignore predicate names.
+
+    Returns:
+        bytes: A 16-byte digest.
+    """
+    return _fingerprint(list(exprs), rename)
+
+
+class DedupIndex:
+    """
+    A set of fingerprints used to reject duplicate problems, with an optional SQLite spill.
+
+    Without a path the index is an in-memory set. With a path, every fingerprint is also
+    written to the database, which is authoritative: the in-memory set only keeps up to
+    maxsize recent fingerprints to answer repeated lookups without a query, and the
+    database is shared by the workers of a bulk run and kept across runs. Every new
+    fingerprint is committed in its own short transaction, so the workers never wait on
+    each other for longer than one insert.
+
+    An optional journal makes the index resumable along with a JsonlWriter: every new
+    fingerprint is appended to it, and each checkpoint appends a marker with the record
+    count. Restoring a checkpoint reloads the fingerprints journaled before its marker and
+    forgets (also from the database) those accepted after it, so a resumed run rejects
+    exactly the duplicates an uninterrupted run rejects.
+    """
+
+    def __init__(self, maxsize=1000000, path=None, journal=None):
+        """
+        Args:
+            maxsize (int): Maximum number of fingerprints kept in memory when a path is
+                given. Without a path the in-memory set is unbounded.
+            path (str): Optional path of a SQLite database the index spills to.
+            journal (str): Optional path of the journal of the fingerprints added.
+        """
+        self.maxsize = maxsize
+        self.journal = journal
+        self._journal_file = None
+        self._keys = set()
+        self.added = 0
+        self.duplicates = 0
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=60)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")  # No fsync per commit in WAL mode
+            self._db.execute("CREATE TABLE IF NOT EXISTS fingerprints (key BLOB PRIMARY KEY)")
+            self._db.commit()
+
+    def __len__(self):
+        if self._db is not None:
+            return self._db.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+        return len(self._keys)
+
+    def __contains__(self, key):
+        if key in self._keys:
+            return True
+        if self._db is not None:
+            return self._db.execute("SELECT 1 FROM fingerprints WHERE key = ?", (key,)).fetchone() is not None
+        return False
+
+    def add(self, key):
+        """
+        Add a fingerprint to the index.
+
+        Args:
+            key (bytes): The fingerprint.
+
+        Returns:
+            bool: True if the fingerprint is new, False if it is a duplicate.
+        """
+        if key in self._keys:
+            self.duplicates += 1
+            return False
+        journaled = False
+        if self._db is not None:
+            try:
+                with self._db:
+                    # INSERT OR IGNORE is atomic, so concurrent workers never both accept a key
+                    if self._db.execute("INSERT OR IGNORE INTO fingerprints (key) VALUES (?)", (key,)).rowcount == 0:
+                        self._remember(key)
+                        self.duplicates += 1
+                        return False
+                    # Journaled before the commit, so a committed fingerprint is always journaled
+                    journaled = self._journal_key(key)
+            except sqlite3.OperationalError as exc:
+                # Locked past the busy timeout: only this process rejects the fingerprint
+                logger.warning("Could not write a fingerprint to the dedup index: %s", exc)
+        if not journaled:
+            self._journal_key(key)
+        self._remember(key)
+        self.added += 1
+        return True
+
+    def _remember(self, key):
+        if self._db is not None and len(self._keys) >= self.maxsize:
+            # Everything is on disk: drop the in-memory set instead of growing it
+            self._keys.clear()
+        self._keys.add(key)
+
+    def checkpoint(self, count):
+        """
+        Mark the journal at a writer checkpoint.
+
+        Args:
+            count (int): Number of records written at the checkpoint.
+        """
+        if self.journal is not None:
+            self._journal_line(f"@{count}")
+
+    def _journal_key(self, key):
+        if self.journal is None:
+            return False
+        self._journal_line(key.hex())
+        return True
+
+    def _journal_line(self, line):
+        if self._journal_file is None:
+            self._journal_file = open(self.journal, "a", encoding="utf-8")
+        self._journal_file.write(line + "\n")
+        self._journal_file.flush()
+
+    def restore(self, count):
+        """
+        Return the index to its state at a writer checkpoint, using the journal.
+
+        Fingerprints journaled up to the last marker of the checkpoint are kept (and loaded
+        into memory when there is no database); the others are removed from the index and
+        from the journal. Restoring count 0 without a marker starts over.
+
+        Args:
+            count (int): Number of records written at the checkpoint.
+        """
+        if self.journal is None:
+            return
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        lines = []
+        if os.path.exists(self.journal):
+            with open(self.journal, encoding="utf-8") as journal_file:
+                lines = journal_file.read().splitlines()
+        cut = 0
+        for i, line in enumerate(lines):
+            if line == f"@{count}":
+                cut = i + 1
+
+        dropped = [bytes.fromhex(line) for line in lines[cut:] if line and not line.startswith("@")]
+        for key in dropped:
+            self._keys.discard(key)
+        if self._db is not None and dropped:
+            with self._db:
+                self._db.executemany("DELETE FROM fingerprints WHERE key = ?", [(key,) for key in dropped])
+        if self._db is None:
+            self._keys.update(bytes.fromhex(line) for line in lines[:cut] if line and not line.startswith("@"))
+
+        tmp_path = self.journal + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as journal_file:
+            journal_file.writelines(line + "\n" for line in lines[:cut])
+        os.replace(tmp_path, self.journal)
+
+    def close(self):
+        """
+        Close the database and the journal.
+        """
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        """
+        Return the counters of the index.
+
+        Returns:
+            dict: Fingerprints added, duplicates rejected and fingerprints held in memory.
+        """
+        return {"added": self.added, "duplicates": self.duplicates, "in_memory": len(self._keys)}
@@ -0,0 +1,278 @@
+from collections import defaultdict, deque
+
+from z3 import *
+
+# Schemas of FOLReasoning.rules that combine facts into a new one. The others (BD, CT, DMT,
+# CO, IM, MI) only restate a fact or conjoin conclusions, so they add no reasoning depth
+# and would make the saturated base grow without bound.
+SCHEMAS = ("MP", "MT", "HS", "DS", "CD", "DD", "UI", "EG")
+
+
+def negate(expr):
+    """
+    Return the negation of an expression, removing a double negation.
+    """
+    return expr.arg(0) if is_not(expr) else Not(expr)
+
+
+def is_literal(expr):
+    """
+    Check if an expression is an atom or a negated atom.
+    """
+    atom = expr.arg(0) if is_not(expr) else expr
+    return is_app(atom) and atom.decl().kind() == Z3_OP_UNINTERPRETED
+
+
+class Fact:
+    """
+    A node of the derivation DAG: a premise (depth 0, no parents) or a derived fact.
+    """
+
+    __slots__ = ("expr", "rule", "parents", "depth")
+
+    def __init__(self, expr, rule, parents, depth):
+        self.expr = expr
+        self.rule = rule
+        self.parents = parents
+        self.depth = depth
+
+    def __repr__(self):
+        return f"Fact({self.rule}, {self.expr}, parents={self.parents}, depth={self.depth})"
+
+
+class ForwardChainer:
+    """
+    Saturate a fact base under the inference schemas of FOLReasoning.rules.
+
+    Facts are processed in order of depth (semi-naive evaluation): a fact is joined only
+    with facts processed before it, through indices of implications by antecedent and by
+    consequent and of disjunctions by disjunct, so every step looks at the applicable
+    premises only and each combination is found exactly once. The first derivation of a
+    fact is therefore one of minimal depth, and it is recorded in the derivation DAG.
+    """
+
+    def __init__(self, constants=(), schemas=SCHEMAS, max_depth=None, max_facts=None):
+        """
+        Args:
+            constants (list): Constants that UI instantiates universal facts with and EG
+                generalizes over.
+            schemas (iterable): Names of the schemas to apply (a subset of SCHEMAS).
+            max_depth (int): Facts at this depth are not expanded further.
+            max_facts (int): Stop deriving once the base holds this many facts.
+        """
+        unknown = set(schemas) - set(SCHEMAS)
+        if unknown:
+            raise ValueError(f"Unsupported schemas: {sorted(unknown)}")
+        self.constants = list(constants)
+        self.schemas = frozenset(schemas)
+        self.max_depth = max_depth
+        self.max_facts = max_facts
+
+        self.facts = []  # Fact nodes, premises first
+        self._ids = {}  # AST id -> fact index
+        self._queue = deque()
+        self._processed = set()  # AST ids of processed facts
+        self._by_antecedent = defaultdict(list)  # AST id of p -> processed facts p → q
+        self._by_consequent = defaultdict(list)  # AST id of q -> processed facts p → q
+        self._by_disjunct = defaultdict(list)  # AST id of d -> processed facts Or(a, b) with d in (a, b)
+        self._by_negated_disjunct = defaultdict(list)  # AST id of d -> processed facts Not(Or(a, b))
+
+    def __len__(self):
+        return len(self.facts)
+
+    def index(self, expr):
+        """
+        Return the index of a fact, or None if it is not in the base.
+        """
+        return self._ids.get(expr.get_id())
+
+    def add_premise(self, expr):
+        """
+        Add a premise to the base.
+
+        Returns:
+            int: The index of the fact.
+        """
+        return self._add(expr, None, (), 0)
+
+    def _add(self, expr, rule, parents, depth):
+        expr_id = expr.get_id()
+        if expr_id in self._ids:
+            return self._ids[expr_id]
+        if self.max_facts is not None and len(self.facts) >= self.max_facts:
+            return None
+        index = len(self.facts)
+        self.facts.append(Fact(expr, rule, tuple(parents), depth))
+        self._ids[expr_id] = index
+        self._queue.append(index)
+        return index
+
+    def _derive(self, expr, rule, *parents):
+        self._add(expr, rule, parents, 1 + max(self.facts[parent].depth for parent in parents))
+
+    def _fact(self, expr):
+        # Index of a processed fact, or None
+        expr_id = expr.get_id()
+        return self._ids[expr_id] if expr_id in self._processed else None
+
+    def saturate(self):
+        """
+        Apply the schemas until no new fact can be derived (or a limit is reached).
+
+        Returns:
+            ForwardChainer: self, for chaining.
+        """
+        while self._queue:
+            index = self._queue.popleft()
+            fact = self.facts[index]
+            if self.max_depth is None or fact.depth < self.max_depth:
+                self._expand(index, fact.expr)
+            self._register(index, fact.expr)
+        return self
+
+    def _expand(self, index, expr):
+        schemas = self.schemas
+        expr_id = expr.get_id()
+        negation = negate(expr)
+
+        # The new fact as a minor premise: p with p → q, ¬q with p → q, ¬a with Or(a, b)
+        if "MP" in schemas:
+            for other in self._by_antecedent[expr_id]:
+                self._derive(self.facts[other].expr.arg(1), "MP", other, index)
+        if "MT" in schemas:
+            for other in self._by_consequent[negation.get_id()]:
+                self._derive(negate(self.facts[other].expr.arg(0)), "MT", other, index)
+        if "DS" in schemas:
+            for other in self._by_disjunct[negation.get_id()]:
+                a, b = self.facts[other].expr.children()
+                self._derive(b if a.eq(negation) else a, "DS", other, index)
+        if "EG" in schemas and is_literal(expr):
+            for constant in self.constants:
+                if any(arg.eq(constant) for arg in (negation if is_not(expr) else expr).children()):
+                    self._derive(Exists([constant], expr), "EG", index)
+
+        if is_implies(expr):
+            p, q = expr.children()
+            if "MP" in schemas and self._fact(p) is not None:
+                self._derive(q, "MP", index, self._fact(p))
+            if "MT" in schemas and self._fact(negate(q)) is not None:
+                self._derive(negate(p), "MT", index, self._fact(negate(q)))
+            if "HS" in schemas:
+                for other in self._by_antecedent[q.get_id()]:
+                    r = self.facts[other].expr.arg(1)
+                    if not r.eq(p):
+                        self._derive(Implies(p, r), "HS", index, other)
+                for other in self._by_consequent[p.get_id()]:
+                    o = self.facts[other].expr.arg(0)
+                    if not o.eq(q):
+                        self._derive(Implies(o, q), "HS", other, index)
+            if "CD" in schemas:
+                # p → q with Or(p, r) and r → s gives Or(q, s)
+                for other in self._by_disjunct[p.get_id()]:
+                    a, b = self.facts[other].expr.children()
+                    first = a.eq(p)
+                    for implication in self._by_antecedent[(b if first else a).get_id()]:
+                        s = self.facts[implication].expr.arg(1)
+                        self._derive(Or(q, s) if first else Or(s, q), "CD", index, implication, other)
+            if "DD" in schemas:
+                # p → q with Not(Or(q, s)) and r → s gives Not(Or(p, r))
+                for other in self._by_negated_disjunct[q.get_id()]:
+                    a, b = self.facts[other].expr.arg(0).children()
+                    first = a.eq(q)
+                    for implication in self._by_consequent[(b if first else a).get_id()]:
+                        r = self.facts[implication].expr.arg(0)
+                        self._derive(Not(Or(p, r) if first else Or(r, p)), "DD", index, implication, other)
+
+        elif is_or(expr) and expr.num_args() == 2:
+            a, b = expr.children()
+            if "DS" in schemas:
+                for disjunct, other in ((a, b), (b, a)):
+                    minor = self._fact(negate(disjunct))
+                    if minor is not None:
+                        self._derive(other, "DS", index, minor)
+            if "CD" in schemas:
+                for first in self._by_antecedent[a.get_id()]:
+                    for second in self._by_antecedent[b.get_id()]:
+                        self._derive(Or(self.facts[first].expr.arg(1), self.facts[second].expr.arg(1)),
+                                     "CD", first, second, index)
+
+        elif is_not(expr) and is_or(expr.arg(0)) and expr.arg(0).num_args() == 2:
+            a, b = expr.arg(0).children()
+            if "DD" in schemas:
+                for first in self._by_consequent[a.get_id()]:
+                    for second in self._by_consequent[b.get_id()]:
+                        self._derive(Not(Or(self.facts[first].expr.arg(0), self.facts[second].expr.arg(0))),
+                                     "DD", first, second, index)
+
+        elif is_quantifier(expr) and expr.is_forall() and expr.num_vars() == 1 and "UI" in schemas:
+            for constant in self.constants:
+                if constant.sort().eq(expr.var_sort(0)):
+                    self._derive(substitute_vars(expr.body(), constant), "UI", index)
+
+    def _register(self, index, expr):
+        # Make a processed fact visible to the facts processed after it
+        self._processed.add(expr.get_id())
+        if is_implies(expr):
+            p, q = expr.children()
+            self._by_antecedent[p.get_id()].append(index)
+            self._by_consequent[q.get_id()].append(index)
+        elif is_or(expr) and expr.num_args() == 2:
+            a, b = expr.children()
+            self._by_disjunct[a.get_id()].append(index)
+            if not b.eq(a):
+                self._by_disjunct[b.get_id()].append(index)
+        elif is_not(expr) and is_or(expr.arg(0)) and expr.arg(0).num_args() == 2:
+            a, b = expr.arg(0).children()
+            self._by_negated_disjunct[a.get_id()].append(index)
+            if not b.eq(a):
+                self._by_negated_disjunct[b.get_id()].append(index)
+
+    def is_consistent(self):
+        """
+        Check that no fact of the base is the negation of another one.
+
+        This is a sufficient check only: the schemas are not complete, so an inconsistent
+        premise set may still pass it.
+        """
+        return not any(negate(fact.expr).get_id() in self._ids for fact in self.facts)
+
+    def derivation(self, index):
+        """
+        Return the sub-DAG a fact was derived from.
+
+        Args:
+            index (int): Index of the fact.
+
+        Returns:
+            list: Indices of the facts of the derivation in topological order (every fact
+            after its parents), ending with the fact itself.
+        """
+        order = []
+        visited = set()
+        stack = [(index, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if node in visited:
+                continue
+            visited.add(node)
+            stack.append((node, True))
+            stack.extend((parent, False) for parent in self.facts[node].parents)
+        return order
+
+    def proof(self, index):
+        """
+        Return the premises a fact was derived from.
+
+        Returns:
+            list: Sorted indices of the premises (depth 0 facts) of the derivation.
+        """
+        return sorted(node for node in self.derivation(index) if not self.facts[node].parents)
+
+    def at_depth(self, depth):
+        """
+        Return the indices of the facts whose minimal derivation depth is exactly `depth`.
+        """
+        return [index for index, fact in enumerate(self.facts) if fact.depth == depth]
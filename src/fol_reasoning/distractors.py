@@ -0,0 +1,244 @@
+import itertools
+import random
+
+from z3 import *
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is required by the miner only
+    np = None
+
+from .truth_table import TruthTableEngine, OutOfFragment, WORD_ATOMS
+from .monadic import MonadicEngine
+from .profiling import SolverProfiler
+
+# Candidate shapes over literals a, b, c of distinct atoms: (arity, truth vector, formula)
+_TEMPLATES = (
+    (1, lambda a: a, lambda a: a),
+    (2, lambda a, b: a & b, lambda a, b: And(a, b)),
+    (2, lambda a, b: a | b, lambda a, b: Or(a, b)),
+    (2, lambda a, b: ~a | b, lambda a, b: Implies(a, b)),
+    (2, lambda a, b: ~(a ^ b), lambda a, b: a == b),
+    (3, lambda a, b, c: ~(a & b) | c, lambda a, b, c: Implies(And(a, b), c)),
+    (3, lambda a, b, c: ~a | b | c, lambda a, b, c: Implies(a, Or(b, c))),
+    (3, lambda a, b, c: ~a | (b & c), lambda a, b, c: Implies(a, And(b, c))),
+    (3, lambda a, b, c: (a | b) & c, lambda a, b, c: And(Or(a, b), c)),
+    (3, lambda a, b, c: a | b | c, lambda a, b, c: Or(a, b, c)),
+)
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    # NumPy < 2.0: count the bits of every byte
+    table = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+class DistractorMiner:
+    """
+    Mine multiple-choice distractors that are semantically close to the answer but not
+    entailed by the premises.
+
+    A pool of candidate formulas (literals and Boolean combinations of two or three
+    literals) over the ground atoms of the signature is enumerated once, and every
+    candidate is indexed by its 64-bit truth vector over those atoms. For a question, the
+    premises are projected to the set of atom assignments that some model of the premises
+    realizes; a candidate is entailed exactly when it holds on all of them, so the whole
+    pool is verified with a few NumPy operations. The remaining candidates are ranked by
+    the Hamming distance of their truth vector to the answer's on the realizable
+    assignments, and only the chosen ones are built as Z3 expressions.
+    """
+
+    def __init__(self, atoms, constants=(), profiler=None):
+        """
+        Args:
+            atoms (list): Ground atoms of the signature (at most 6), e.g. [P(x), Q(x), ...].
+            constants (list): Constants that quantified answers are instantiated with to
+                compute their truth vector (used for ranking only).
+            profiler (SolverProfiler): Records the solver checks of premise sets outside the
+                monadic fragment.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError("The distractor miner requires NumPy.")
+        if len(atoms) > WORD_ATOMS:
+            raise ValueError(f"The miner supports at most {WORD_ATOMS} atoms.")
+        self.atoms = list(atoms)
+        self.constants = list(constants)
+        self.profiler = profiler if profiler is not None else SolverProfiler()
+        self.truth_table = TruthTableEngine()
+        self.monadic = MonadicEngine()
+        self._atom_ids = {atom.get_id(): column for column, atom in enumerate(self.atoms)}
+
+        # Truth vectors of the literals: atom k is literal 2k, its negation literal 2k + 1
+        atom_masks, full = self.truth_table._table(WORD_ATOMS)
+        self.full = np.uint64(full)
+        literals = []
+        for mask in atom_masks[:len(self.atoms)]:
+            literals += [mask, full & ~mask]
+        literals = np.array(literals, dtype=np.uint64)
+
+        vectors, templates, operands = [], [], []
+        for template, (arity, vector, _) in enumerate(_TEMPLATES):
+            combos = np.array([combo for combo in itertools.permutations(range(len(literals)), arity)
+                               if len({literal // 2 for literal in combo}) == arity], dtype=np.int64)
+            if not len(combos):
+                continue
+            vectors.append(vector(*(literals[combos[:, i]] for i in range(arity))) & self.full)
+            templates.append(np.full(len(combos), template, dtype=np.int64))
+            operands.append(np.pad(combos, ((0, 0), (0, 3 - arity)), constant_values=-1))
+        self.vectors = np.concatenate(vectors)
+        self.templates = np.concatenate(templates)
+        self.operands = np.concatenate(operands)
+
+        # Tautologies and contradictions are never useful distractors
+        keep = (self.vectors != 0) & (self.vectors != self.full)
+        self.vectors, self.templates, self.operands = self.vectors[keep], self.templates[keep], self.operands[keep]
+
+    @classmethod
+    def from_reasoner(cls, reasoning):
+        """
+        Build a miner over the atoms P(x), ..., U(x) that the premises of a reasoner use.
+
+        Args:
+            reasoning (FOLReasoning): The reasoner generating the premises.
+
+        Raises:
+            ValueError: If the reasoner draws its premises over a custom signature.
+        """
+        if reasoning.signature is not None:
+            raise ValueError("Distractors can only be mined over the default signature.")
+        predicates = [reasoning.P, reasoning.Q, reasoning.R, reasoning.S, reasoning.T, reasoning.U]
+        return cls([f(reasoning.x) for f in predicates], constants=[reasoning.x], profiler=reasoning.profiler)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def candidate(self, position):
+        """
+        Build the Z3 expression of a candidate of the pool.
+        """
+        arity, _, build = _TEMPLATES[self.templates[position]]
+        literals = [self._literal(literal) for literal in self.operands[position][:arity]]
+        return build(*literals)
+
+    def _literal(self, literal):
+        atom = self.atoms[literal // 2]
+        return Not(atom) if literal % 2 else atom
+
+    def vector(self, expr):
+        """
+        Return the truth vector of a formula over the atoms, instantiating its quantifiers
+        with the first constant.
+
+        Returns:
+            int: The truth vector, or None if the formula uses other atoms.
+        """
+        if self.constants:
+            quantifiers = []
+            stack = [expr]
+            while stack:
+                node = stack.pop()
+                if is_quantifier(node):
+                    quantifiers.append((node, substitute_vars(node.body(), self.constants[0])))
+                elif is_app(node):
+                    stack.extend(node.children())
+            if quantifiers:
+                expr = substitute(expr, *quantifiers)
+        try:
+            (mask,), _ = self.truth_table.compile([expr], dict(self._atom_ids), WORD_ATOMS)
+        except OutOfFragment:
+            return None
+        return mask
+
+    def realizable(self, premises):
+        """
+        Return the mask of the atom assignments realized by some model of the premises.
+
+        Uses the bitset engine for propositional premises, the monadic engine for premises
+        with quantified blocks, and a Z3 enumeration of the (at most 64) assignments otherwise.
+
+        Args:
+            premises (list): The premise expressions.
+
+        Returns:
+            int: The mask, with bit i set when the assignment of row i is realizable.
+        """
+        try:
+            masks, full = self.truth_table.compile(premises, dict(self._atom_ids), WORD_ATOMS)
+            realizable = full
+            for mask in masks:
+                realizable &= mask
+            return realizable
+        except OutOfFragment:
+            pass
+
+        try:
+            masks, consistent, _ = self.monadic.compile(list(premises) + self.atoms)
+        except OutOfFragment:
+            return self._enumerate_assignments(premises)
+        rows = consistent
+        for mask in masks[:len(premises)]:
+            rows &= mask
+        atom_masks = masks[len(premises):]
+        realizable = 0
+        while rows:
+            row = rows & -rows
+            rows ^= row
+            assignment = sum(1 << column for column, mask in enumerate(atom_masks) if mask & row)
+            realizable |= 1 << assignment
+        return realizable
+
+    def _enumerate_assignments(self, premises):
+        # All-SAT over the atoms: at most one check per assignment, whatever the pool size
+        solver = self.profiler.new_solver(self.atoms[0].ctx)
+        solver.add(*premises)
+        realizable = 0
+        while self.profiler.check(solver, stage="distractors") == sat:
+            model = solver.model()
+            values = [is_true(model.eval(atom, model_completion=True)) for atom in self.atoms]
+            realizable |= 1 << sum(1 << column for column, value in enumerate(values) if value)
+            solver.add(Or([Not(atom) if value else atom for atom, value in zip(self.atoms, values)]))
+        return realizable
+
+    def mine(self, premises, answer, count=3):
+        """
+        Return distractors close to the answer that do not follow from the premises.
+
+        Args:
+            premises (list): The premise expressions.
+            answer (z3.ExprRef): The correct answer.
+            count (int): Number of distractors.
+
+        Returns:
+            list: Up to `count` Z3 expressions with pairwise distinct truth vectors, nearest
+            to the answer first. Fewer are returned when the pool has fewer valid candidates.
+        """
+        realizable = np.uint64(self.realizable(premises))
+        if realizable == 0:
+            return []  # Inconsistent premises entail everything
+        answer_vector = self.vector(answer)
+
+        # One batch over the whole pool: entailed candidates hold on every realizable assignment
+        valid = np.flatnonzero((realizable & ~self.vectors) != 0)
+        if answer_vector is None:
+            distance = np.zeros(len(valid))
+        else:
+            distance = _popcount((self.vectors[valid] ^ np.uint64(answer_vector)) & realizable).astype(np.float64)
+        # Random tie-breaking from the global generator, so seeded runs stay reproducible
+        distance += np.random.default_rng(random.getrandbits(64)).random(len(valid))
+
+        distractors = []
+        seen = set() if answer_vector is None else {answer_vector}
+        for position in valid[np.argsort(distance, kind="stable")]:
+            vector = int(self.vectors[position])
+            if vector in seen:
+                continue
+            seen.add(vector)
+            distractors.append(self.candidate(position))
+            if len(distractors) == count:
+                break
+        return distractors
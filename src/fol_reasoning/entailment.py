@@ -0,0 +1,138 @@
+import random
+
+from z3 import *
+
+from .canonical import canonical_hash
+
+
+class DerivationError(ValueError):
+    """
+    Raised when no pair of premises in the pool yields a new valid derivation.
+    """
+
+
+class EntailmentIndex:
+    """
+    A pairwise entailment index over a premise pool, used to draw derived premises.
+
+    For every ordered pair of premises (p1, p2), the derived premise Implies(p1, p2) is a
+    candidate when it is not a tautology (i.e. p1 does not entail p2). It always follows
+    from {p1, p2}, since p2 is one of them, so that is not checked. The index is built once per sample and updated incrementally when a premise is
+    added, so derivations are drawn from the candidate pairs instead of by unbounded
+    rejection sampling.
+
+    A pair is only checked the first time it is drawn: checking every pair up front costs
+    more solver calls than a sample ever needs. Invalid pairs are removed as soon as they
+    are checked, so every draw takes at most one pass over the pairs and the result is
+    uniform over the valid derivations.
+
+    With implicit=True the pairs are not listed: a draw picks a random pair and rejects
+    the ones already drawn, so adding a premise costs O(1) and memory grows with the number
+    of draws instead of quadratically with the pool. Once half of the pairs have been
+    drawn, the remaining ones are listed and sampled as above.
+    """
+
+    def __init__(self, reasoner, premises=(), implicit=False):
+        """
+        Args:
+            reasoner (FOLReasoning): Reasoner answering the entailment and tautology checks.
+            premises (list): Initial premises (rule name, expression).
+            implicit (bool): If True, do not list the candidate pairs (for large pools).
+        """
+        self.reasoner = reasoner
+        self.premises = []
+        self.entailed = {}  # (i, j) -> True if premise i entails premise j, for checked pairs
+        self.candidates = []  # pairs (i, j) that are valid or not checked yet
+        self.implicit = implicit
+        self.drawn = set()  # Implicit mode: pairs (i, j) already drawn
+        for premise in premises:
+            self.add(premise)
+
+    def __len__(self):
+        return len(self.premises)
+
+    def add(self, premise):
+        """
+        Add a premise to the pool and register its pairs with every premise already present.
+
+        Args:
+            premise (tuple): The premise (rule name, expression).
+        """
+        new = len(self.premises)
+        self.premises.append(premise)
+        if self.implicit:
+            return
+        for other in range(new):
+            self.candidates.append((new, other))
+            self.candidates.append((other, new))
+        # Implies(p, p) is always a tautology
+        self.entailed[(new, new)] = True
+
+    def derive(self, i, j):
+        """
+        Check the pair (i, j) and return its derived expression, or None if it is not a valid derivation.
+        """
+        (rule1, premise1), (rule2, premise2) = self.premises[i], self.premises[j]
+        rule = f"{rule1} → {rule2}"
+        derived_expr = Implies(premise1, premise2)
+        self.entailed[(i, j)] = self.reasoner.is_tautology(derived_expr, stage="derived", rule=rule)
+        if self.entailed[(i, j)]:
+            self.reasoner.profiler.count_retry("derived", rule)
+            return None
+        return derived_expr
+
+    def entails(self, i, j):
+        """
+        Check if premise i entails premise j.
+        """
+        if (i, j) not in self.entailed:
+            self.derive(i, j)
+        return self.entailed[(i, j)]
+
+    def sample(self, seen=None):
+        """
+        Draw a derivation uniformly among the valid candidates whose fingerprint is not in `seen`.
+
+        Args:
+            seen (set): Canonical fingerprints (canonical_hash) of premises that must not be derived again.
+
+        Returns:
+            tuple: The indices (i, j) of the chained premises and the derived expression.
+
+        Raises:
+            DerivationError: If no valid derivation exists.
+        """
+        if self.implicit:
+            sampled = self._sample_implicit(seen)
+            if sampled is not None:
+                return sampled
+        while self.candidates:
+            position = random.randrange(len(self.candidates))
+            i, j = self.candidates[position]
+            # Swap-remove: the pair is either returned or not a valid derivation
+            self.candidates[position] = self.candidates[-1]
+            self.candidates.pop()
+            derived_expr = self.derive(i, j)
+            if derived_expr is not None and (seen is None or canonical_hash(derived_expr) not in seen):
+                return i, j, derived_expr
+        raise DerivationError(
+            f"No valid derivation exists among {len(self.premises)} premises: "
+            "every pair yields a tautology or a duplicate.")
+
+    def _sample_implicit(self, seen):
+        # Rejection sampling over the n * (n - 1) ordered pairs: uniform over the pairs not
+        # drawn yet, as long as they are at least half of them
+        n = len(self.premises)
+        while 2 * len(self.drawn) < n * (n - 1):
+            i, j = random.randrange(n), random.randrange(n)
+            if i == j or (i, j) in self.drawn:
+                continue
+            self.drawn.add((i, j))
+            derived_expr = self.derive(i, j)
+            if derived_expr is not None and (seen is None or canonical_hash(derived_expr) not in seen):
+                return i, j, derived_expr
+        # Dense from here on: list the remaining pairs and sample them explicitly
+        self.implicit = False
+        self.candidates = [(i, j) for i in range(n) for j in range(n) if i != j and (i, j) not in self.drawn]
+        self.drawn = set()
+        return None
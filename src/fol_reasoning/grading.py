@@ -0,0 +1,310 @@
+import json
+import re
+import time
+from collections import Counter, defaultdict
+
+from .writer import read_jsonl
+
+# Question types, recognized by the question text written by the generators in questions.py
+MULTIPLE_CHOICE = "multiple_choice"
+YES_NO = "yes_no"
+_QUESTION_PREFIXES = (
+    ("Based on the above premises, which statement can be inferred?", MULTIPLE_CHOICE),
+    ("Based on the above premises, is the statement true?", YES_NO),
+)
+
+# Entailment status of the gold answer of a yes/no question
+_STATUS = {"Yes": "entailed", "No": "refuted", "Uncertain": "undetermined"}
+
+# Phrases accepted in a yes/no prediction and the answer they stand for, negations first:
+# at a given position the first alternative that matches wins
+_YES_NO_PHRASES = (
+    (r"not\s+necessarily\s+(?:true|false)|not\s+certain|cannot\s+be\s+determined|can't\s+be\s+determined|undetermined",
+     "Uncertain"),
+    (r"not\s+(?:be\s+)?true|isn't\s+true|untrue", "No"),
+    (r"not\s+(?:be\s+)?false|isn't\s+false", "Yes"),
+    (r"yes|true", "Yes"),
+    (r"no|false", "No"),
+    (r"uncertain|unknown", "Uncertain"),
+)
+_YES_NO_PATTERN = re.compile(r"\b(?:" + "|".join(f"({phrase})" for phrase, _ in _YES_NO_PHRASES) + r")\b",
+                             re.IGNORECASE)
+
+# Option letters of the multiple-choice questions. Letters are matched in capitals only
+# and standing alone; an "A" followed by a lowercase word other than a verb is the article,
+# as in "A statement that follows is C."
+OPTION_LETTERS = "ABCD"
+_ARTICLE = r"A(?!\s+(?!(?:is|was|seems|follows|must|can|could|should|would)\b)[a-z])"
+_LETTER_PATTERN = re.compile(rf"(?<![\w'])\(?({_ARTICLE}|[{OPTION_LETTERS[1:]}])\)?(?![\w'])")
+
+# An answer is explicit when it follows "answer" (and "is", a colon...)
+_EXPLICIT_PREFIX = re.compile(r"\banswer\s*(?:is|would\s+be|should\s+be)?\s*[:\-=]?\s*\**\s*$",
+                              re.IGNORECASE)
+
+
+def _pick(matches, text):
+    # The last explicit answer if there is one, since outputs often reason before
+    # concluding; otherwise None, and the caller picks among the bare matches
+    explicit = [match for match in matches if _EXPLICIT_PREFIX.search(text, 0, match.start())]
+    return explicit[-1] if explicit else None
+
+
+def question_type(question, answer=None):
+    """
+    Return the type of a generated question (MULTIPLE_CHOICE or YES_NO).
+
+    The type is read from the fixed opening sentence of the question; questions written
+    otherwise are typed by their gold answer (a single letter is a multiple choice).
+    """
+    for prefix, kind in _QUESTION_PREFIXES:
+        if question.startswith(prefix):
+            return kind
+    return MULTIPLE_CHOICE if answer is not None and re.fullmatch(r"[A-Z]", answer) else YES_NO
+
+
+def normalize_answer(kind, text):
+    """
+    Extract the answer of a model output.
+
+    Args:
+        kind (str): MULTIPLE_CHOICE or YES_NO.
+        text (str): The raw prediction, e.g. "B", "Answer: (C)" or "The statement is true.".
+
+    Returns:
+        str: An option letter or "Yes"/"No"/"Uncertain", or None if none can be found.
+    """
+    if not isinstance(text, str):
+        return None
+    if kind == MULTIPLE_CHOICE:
+        matches = list(_LETTER_PATTERN.finditer(text))
+        if not matches:
+            return None
+        # An explicit answer, else the last letter standing alone: "C" in "A statement
+        # that follows is C."
+        match = _pick(matches, text) or matches[-1]
+        return match.group(1)
+    matches = list(_YES_NO_PATTERN.finditer(text))
+    if not matches:
+        return None
+    # An explicit answer, else the first keyword: "No" in "No. If P were true, ..."
+    match = _pick(matches, text) or matches[0]
+    return _YES_NO_PHRASES[match.lastindex - 1][1]
+
+
+def premise_scores(predicted, gold):
+    """
+    Score a premise selection against the premises the gold answer was derived from.
+
+    Args:
+        predicted (set): Indices of the premises selected by the model.
+        gold (frozenset): Indices of the gold premises.
+
+    Returns:
+        tuple: Precision, recall, F1 and exact match. An empty selection for an empty gold
+        set scores 1 on every metric.
+    """
+    if not predicted and not gold:
+        return 1.0, 1.0, 1.0, 1.0
+    overlap = len(predicted & gold)
+    precision = overlap / len(predicted) if predicted else 0.0
+    recall = overlap / len(gold) if gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if overlap else 0.0
+    return precision, recall, f1, float(predicted == gold)
+
+
+class _TypeTotals:
+    # Running totals of the predictions of one question type
+    __slots__ = ("count", "correct", "unparsed", "premise_count", "precision", "recall", "f1", "exact",
+                 "elapsed", "confusion")
+
+    def __init__(self):
+        self.count = self.correct = self.unparsed = self.premise_count = 0
+        self.precision = self.recall = self.f1 = self.exact = self.elapsed = 0.0
+        self.confusion = Counter()  # (gold, predicted) -> count
+
+    def summary(self):
+        summary = {
+            "count": self.count,
+            "accuracy": self.correct / self.count if self.count else 0.0,
+            "unparsed": self.unparsed,
+            "predictions_per_sec": self.count / self.elapsed if self.elapsed else 0.0,
+            "confusion": {f"{gold}->{predicted}": count for (gold, predicted), count in sorted(
+                self.confusion.items(), key=lambda item: (item[0][0], str(item[0][1])))},
+        }
+        if self.premise_count:
+            summary["premises"] = {
+                "count": self.premise_count,
+                "precision": self.precision / self.premise_count,
+                "recall": self.recall / self.premise_count,
+                "f1": self.f1 / self.premise_count,
+                "exact_match": self.exact / self.premise_count,
+            }
+        return summary
+
+
+class Grader:
+    """
+    Grade model answers against a generated dataset.
+
+    The dataset is loaded once and kept as flat per-question tables: the question type,
+    the gold answer, its entailment status and the used-premise indices (`idx`) of every
+    question. Predictions are then scored from these tables alone, without parsing the
+    rendered formulas or calling a solver, in batches whose cost is a dictionary lookup
+    and a few set operations per prediction.
+
+    A prediction is a dict with the "record" index (position of the sample in the dataset,
+    in load order), the "question" index within the record (0 for the multiple choice and
+    1 for the yes/no question of generated samples), the raw "answer" text, and optionally
+    the "premises" the model cites, scored with partial credit against `idx`.
+    """
+
+    def __init__(self):
+        self.kinds = []  # Per question: MULTIPLE_CHOICE or YES_NO
+        self.gold = []  # Per question: gold letter or Yes/No/Uncertain
+        self.status = []  # Per question: entailment status of the gold answer
+        self.used = []  # Per question: frozenset of used-premise indices
+        self.offsets = []  # Per record: position of its first question in the tables
+        self.totals = defaultdict(_TypeTotals)
+        self.missing = 0  # Predictions of questions that are not in the dataset, or with invalid indices
+
+    def __len__(self):
+        return len(self.gold)
+
+    @classmethod
+    def load(cls, paths):
+        """
+        Load a dataset from files written by save_to_json (one JSON record) or by the
+        bulk writer (JSONL shards, possibly compressed).
+
+        Args:
+            paths (list): Dataset files, in order.
+
+        Returns:
+            Grader: A grader over the records of all files, numbered in order.
+        """
+        grader = cls()
+        for path in paths:
+            if path.endswith(".json"):
+                with open(path, encoding="utf-8") as file:
+                    records = json.load(file)
+                for record in records if isinstance(records, list) else [records]:
+                    grader.add_record(record)
+            else:
+                for record in read_jsonl([path]):
+                    grader.add_record(record)
+        return grader
+
+    def add_record(self, record):
+        """
+        Add a record with the layout of build_record to the tables.
+
+        Returns:
+            int: The index of the record.
+        """
+        self.offsets.append(len(self.gold))
+        for question, answer, used in zip(record["questions"], record["answers"], record["idx"]):
+            kind = question_type(question, answer)
+            self.kinds.append(kind)
+            self.gold.append(answer)
+            self.status.append("entailed" if kind == MULTIPLE_CHOICE else _STATUS.get(answer, "undetermined"))
+            self.used.append(frozenset(used))
+        return len(self.offsets) - 1
+
+    def _position(self, record, question):
+        if not 0 <= record < len(self.offsets):
+            return None
+        position = self.offsets[record] + question
+        end = self.offsets[record + 1] if record + 1 < len(self.offsets) else len(self.gold)
+        return position if 0 <= question and position < end else None
+
+    def grade_batch(self, predictions):
+        """
+        Score a batch of predictions and add them to the running totals.
+
+        Args:
+            predictions (list): Prediction dicts (see the class docstring).
+
+        Returns:
+            list: Per prediction: the "record", "question", "type", gold "status", the
+            "parsed" answer, whether it is "correct", and the premise "precision", "recall"
+            and "f1" when premises were given. Predictions of unknown questions get an "error".
+        """
+        # Group by question type, so the throughput of every type is timed on its own
+        groups = defaultdict(list)
+        results = [None] * len(predictions)
+        for i, prediction in enumerate(predictions):
+            try:
+                position = self._position(int(prediction.get("record", -1)), int(prediction.get("question", 0)))
+            except (TypeError, ValueError):
+                position = None  # A null or non-numeric index cannot name a question
+            if position is None:
+                self.missing += 1
+                results[i] = {"record": prediction.get("record"), "question": prediction.get("question"),
+                              "error": "Unknown question."}
+                continue
+            groups[self.kinds[position]].append((i, position, prediction))
+
+        for kind, group in groups.items():
+            start = time.perf_counter()
+            totals = self.totals[kind]
+            for i, position, prediction in group:
+                gold = self.gold[position]
+                parsed = normalize_answer(kind, prediction.get("answer"))
+                correct = parsed == gold
+                totals.count += 1
+                totals.correct += correct
+                totals.unparsed += parsed is None
+                totals.confusion[(gold, parsed)] += 1
+                result = {"record": prediction["record"], "question": prediction.get("question", 0), "type": kind,
+                          "status": self.status[position], "parsed": parsed, "correct": correct}
+
+                cited = prediction.get("premises")
+                if cited is not None:
+                    precision, recall, f1, exact = premise_scores(set(cited), self.used[position])
+                    totals.premise_count += 1
+                    totals.precision += precision
+                    totals.recall += recall
+                    totals.f1 += f1
+                    totals.exact += exact
+                    result.update(precision=precision, recall=recall, f1=f1)
+                results[i] = result
+            totals.elapsed += time.perf_counter() - start
+        return results
+
+    def grade_stream(self, predictions, batch_size=10000):
+        """
+        Score a stream of predictions in batches.
+
+        Args:
+            predictions (iterable): Prediction dicts, e.g. read_jsonl over a predictions file.
+            batch_size (int): Number of predictions scored at once.
+
+        Yields:
+            dict: The result of every prediction, in order.
+        """
+        batch = []
+        for prediction in predictions:
+            batch.append(prediction)
+            if len(batch) == batch_size:
+                yield from self.grade_batch(batch)
+                batch = []
+        if batch:
+            yield from self.grade_batch(batch)
+
+    def summary(self):
+        """
+        Return the metrics of the predictions graded so far, per question type and overall.
+
+        Returns:
+            dict: Per type: count, accuracy, unparsed answers, predictions per second, the
+            (gold->predicted) confusion counts and the premise-selection means; plus the
+            overall accuracy and the number of predictions of unknown questions.
+        """
+        count = sum(totals.count for totals in self.totals.values())
+        correct = sum(totals.correct for totals in self.totals.values())
+        return {
+            "types": {kind: totals.summary() for kind, totals in sorted(self.totals.items())},
+            "count": count,
+            "accuracy": correct / count if count else 0.0,
+            "missing": self.missing,
+        }
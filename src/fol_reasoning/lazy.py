@@ -0,0 +1,55 @@
+import importlib
+import sys
+import time
+
+# Seconds spent importing each lazily loaded module, in this process
+IMPORT_TIMES = {}
+
+
+class LazyModule:
+    """
+    A stand-in for a module that is only imported on first attribute access.
+
+    Modules that render, serialize or load stored formulas use `z3.<name>` through this
+    object, so importing them does not load the Z3 shared library; the first call that
+    actually needs Z3 imports it. Attributes are cached on the instance after the first
+    lookup, so later accesses cost a plain attribute lookup.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+
+    def __getattr__(self, attr):
+        module = load(self._name)
+        value = getattr(module, attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        state = "loaded" if self._name in sys.modules else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def load(name):
+    """
+    Import a module, recording the time of the first import in IMPORT_TIMES.
+
+    Returns:
+        module: The module.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - start
+    return module
+
+
+def is_loaded(name="z3"):
+    """
+    Check if a module has been imported in this process.
+    """
+    return name in sys.modules
+
+
+z3 = LazyModule("z3")
@@ -0,0 +1,299 @@
+from z3 import *
+
+from .truth_table import OutOfFragment, column_masks, _is_bool, _is_ground_atom, _is_uninterpreted_app
+
+# Leaves of the compiled formulas
+_COLUMN = "column"  # A ground atom or a quantified block, by column
+_TYPE = "type"  # P(v) for the bound variable v of a block, by predicate bit
+
+_CONNECTIVES = {Z3_OP_TRUE, Z3_OP_FALSE, Z3_OP_NOT, Z3_OP_AND, Z3_OP_OR, Z3_OP_IMPLIES, Z3_OP_XOR, Z3_OP_IFF}
+
+# Sorts of bound variables with domains large enough to realize any set of types
+_INFINITE_SORTS = {Z3_INT_SORT, Z3_REAL_SORT, Z3_UNINTERPRETED_SORT}
+
+
+def _evaluate(nodes, leaf):
+    # Evaluate a compiled formula (post-order list of (op, args)) with bitwise operations;
+    # leaf(kind, index) gives the mask of a leaf and full is the mask of all rows
+    values = []
+    full = leaf(None, None)
+    for op, args in nodes:
+        if op in (_COLUMN, _TYPE):
+            mask = leaf(op, args)
+        else:
+            operands = [values[arg] for arg in args]
+            if op == Z3_OP_TRUE:
+                mask = full
+            elif op == Z3_OP_FALSE:
+                mask = 0
+            elif op == Z3_OP_NOT:
+                mask = full & ~operands[0]
+            elif op == Z3_OP_AND:
+                mask = full
+                for operand in operands:
+                    mask &= operand
+            elif op == Z3_OP_OR:
+                mask = 0
+                for operand in operands:
+                    mask |= operand
+            elif op == Z3_OP_IMPLIES:
+                mask = (full & ~operands[0]) | operands[1]
+            elif op == Z3_OP_XOR:
+                mask = operands[0] ^ operands[1]
+            else:  # Bi-implication
+                mask = full & ~(operands[0] ^ operands[1])
+        values.append(mask)
+    return values[-1]
+
+
+class MonadicEngine:
+    """
+    Decide validity, satisfiability and entailment of monadic first-order formulas.
+
+    The fragment is what the EG and UI rules produce: Boolean combinations of ground atoms
+    (e.g. P(x) for a constant x) and quantified blocks ∃v φ / ∀v φ, where φ is a Boolean
+    combination of unary predicates applied to the single bound variable v and of ground
+    atoms.
+
+    A model of such a formula is described by the set S of "types" it realizes, a type
+    being the truth values of the k predicates of the blocks on one element, plus the
+    type of every constant. Ground atoms and blocks are abstracted as the columns of a
+    truth table; an assignment of the columns is consistent exactly when the types allowed
+    by the blocks (those in every true ∀-body and in no true-negated ∃-body) are not
+    empty, contain a completion of every constant, a witness of every true ∃-block and a
+    counterexample of every false ∀-block. Only the columns that constrain types are
+    enumerated, and the types are 2**k-bit masks, so every check is a few bitwise
+    operations per assignment.
+    """
+
+    def __init__(self, max_predicates=6, max_columns=12):
+        """
+        Args:
+            max_predicates (int): Maximum number of predicates inside the blocks (types are
+                masks of 2**max_predicates bits).
+            max_columns (int): Maximum number of ground atoms and blocks of a query.
+        """
+        self.max_predicates = max_predicates
+        self.max_columns = max_columns
+        self._tables = {}
+
+    def _table(self, num_columns):
+        if num_columns not in self._tables:
+            self._tables[num_columns] = column_masks(num_columns)
+        return self._tables[num_columns]
+
+    def compile(self, exprs):
+        """
+        Compile formulas to truth vectors over their ground atoms and blocks.
+
+        Args:
+            exprs (list): Formulas to compile.
+
+        Returns:
+            tuple: The truth vector of every formula, the mask of the consistent rows of the
+            table, and the mask of all rows.
+
+        Raises:
+            OutOfFragment: If a formula is not monadic, or uses too many predicates or columns.
+        """
+        self._columns = {}  # AST id of a ground atom or block -> column
+        self._atoms = []  # Per column: (predicate decl id, constant AST id) for unary ground atoms, else None
+        self._blocks = {}  # Column -> (is_forall, compiled body)
+        self._predicates = {}  # Predicate decl id -> type bit
+        self._sort = None
+
+        compiled = [self._compile(root.ctx_ref(), root.as_ast(), None) for root in exprs]
+        num_columns = len(self._atoms)
+        if num_columns > self.max_columns:
+            raise OutOfFragment(f"More than {self.max_columns} ground atoms and blocks.")
+        if len(self._predicates) > self.max_predicates:
+            raise OutOfFragment(f"More than {self.max_predicates} predicates in quantified blocks.")
+
+        columns, full = self._table(num_columns)
+        masks = [_evaluate(nodes, lambda kind, index: columns[index] if kind else full) for nodes in compiled]
+        return masks, self._consistent_rows(columns, full), full
+
+    def _compile(self, ctx, root, bound_sort):
+        # Iterative post-order walk producing a list of (op, args); inside a block,
+        # bound_sort is the sort of the bound variable and P(v) compiles to a type leaf
+        nodes = []
+        positions = {}
+        stack = [(root, None)]
+        while stack:
+            ast, kind = stack.pop()
+            ast_id = Z3_get_ast_id(ctx, ast)
+            if kind is None:
+                if ast_id in positions:
+                    continue
+                leaf = self._leaf(ctx, ast, bound_sort)
+                if leaf is not None:
+                    positions[ast_id] = len(nodes)
+                    nodes.append(leaf)
+                    continue
+                kind = self._connective_kind(ctx, ast)
+                stack.append((ast, kind))
+                stack.extend((Z3_get_app_arg(ctx, ast, i), None) for i in range(Z3_get_app_num_args(ctx, ast)))
+                continue
+            args = [positions[Z3_get_ast_id(ctx, Z3_get_app_arg(ctx, ast, i))] for i in range(Z3_get_app_num_args(ctx, ast))]
+            positions[ast_id] = len(nodes)
+            nodes.append((kind, args))
+        # The root is the last node, so _evaluate returns its value
+        nodes.append(nodes[positions[Z3_get_ast_id(ctx, root)]])
+        return nodes
+
+    def _leaf(self, ctx, ast, bound_sort):
+        ast_id = Z3_get_ast_id(ctx, ast)
+        if ast_id in self._columns:
+            if bound_sort is not None and self._columns[ast_id] in self._blocks:
+                raise OutOfFragment("Nested quantifier.")
+            return (_COLUMN, self._columns[ast_id])
+
+        if _is_ground_atom(ctx, ast):
+            atom = None
+            if Z3_get_app_num_args(ctx, ast) == 1:
+                decl = Z3_get_app_decl(ctx, ast)
+                atom = (Z3_get_ast_id(ctx, Z3_func_decl_to_ast(ctx, decl)), Z3_get_ast_id(ctx, Z3_get_app_arg(ctx, ast, 0)),
+                        Z3_get_ast_id(ctx, Z3_sort_to_ast(ctx, Z3_get_domain(ctx, decl, 0))))
+            return self._new_column(ast_id, atom)
+
+        if bound_sort is not None and _is_uninterpreted_app(ctx, ast) and _is_bool(ctx, ast) \
+                and Z3_get_app_num_args(ctx, ast) == 1:
+            arg = Z3_get_app_arg(ctx, ast, 0)
+            if Z3_get_ast_kind(ctx, arg) == Z3_VAR_AST and Z3_get_index_value(ctx, arg) == 0:
+                decl_id = Z3_get_ast_id(ctx, Z3_func_decl_to_ast(ctx, Z3_get_app_decl(ctx, ast)))
+                if decl_id not in self._predicates:
+                    self._predicates[decl_id] = len(self._predicates)
+                return (_TYPE, self._predicates[decl_id])
+
+        if Z3_get_ast_kind(ctx, ast) == Z3_QUANTIFIER_AST:
+            if bound_sort is not None or Z3_is_lambda(ctx, ast) or Z3_get_quantifier_num_bound(ctx, ast) != 1:
+                raise OutOfFragment("Unsupported quantifier.")
+            bound = Z3_get_quantifier_bound_sort(ctx, ast, 0)
+            if Z3_get_sort_kind(ctx, bound) not in _INFINITE_SORTS:
+                raise OutOfFragment("Block over a finite sort.")
+            sort = Z3_get_ast_id(ctx, Z3_sort_to_ast(ctx, bound))
+            if self._sort is not None and sort != self._sort:
+                raise OutOfFragment("Blocks over several sorts.")
+            self._sort = sort
+            body = self._compile(ctx, Z3_get_quantifier_body(ctx, ast), sort)
+            column = self._new_column(ast_id, None)
+            self._blocks[column[1]] = (Z3_is_quantifier_forall(ctx, ast), body)
+            return column
+        return None
+
+    def _new_column(self, ast_id, atom):
+        column = len(self._atoms)
+        self._columns[ast_id] = column
+        self._atoms.append(atom)
+        return (_COLUMN, column)
+
+    @staticmethod
+    def _connective_kind(ctx, ast):
+        if Z3_get_ast_kind(ctx, ast) == Z3_APP_AST and _is_bool(ctx, ast):
+            kind = Z3_get_decl_kind(ctx, Z3_get_app_decl(ctx, ast))
+            if kind in _CONNECTIVES:
+                return kind
+            if kind == Z3_OP_EQ and _is_bool(ctx, Z3_get_app_arg(ctx, ast, 0)):
+                return Z3_OP_IFF
+        raise OutOfFragment("Unsupported subformula.")
+
+    def _consistent_rows(self, columns, full):
+        if not self._blocks:
+            return full
+
+        # Ground atoms that constrain types: inside a block, or unary atoms over the sort of the blocks
+        # whose predicate occurs in a block. Other columns are free and never enumerated.
+        body_atoms = {index for _, body in self._blocks.values() for op, index in body if op == _COLUMN}
+        constants = {}
+        for column, atom in enumerate(self._atoms):
+            if atom is not None and atom[0] in self._predicates and atom[2] == self._sort:
+                constants.setdefault(atom[1], []).append((column, self._predicates[atom[0]]))
+        ground = sorted(body_atoms | {column for atoms in constants.values() for column, _ in atoms})
+        blocks = sorted(self._blocks)
+
+        type_columns, type_full = column_masks(len(self._predicates))
+        consistent = 0
+        for ground_row in range(1 << len(ground)):
+            values = {column: (ground_row >> position) & 1 for position, column in enumerate(ground)}
+            ground_mask = full
+            for column in ground:
+                ground_mask &= columns[column] if values[column] else full & ~columns[column]
+
+            # Types each block body holds on, and the completions of every constant
+            bodies = [
+                _evaluate(self._blocks[column][1],
+                          lambda kind, index: type_full if kind is None else
+                          type_columns[index] if kind == _TYPE else type_full * values.get(index, 0))
+                for column in blocks]
+            completions = []
+            for atoms in constants.values():
+                completion = type_full
+                for column, bit in atoms:
+                    completion &= type_columns[bit] if values[column] else type_full & ~type_columns[bit]
+                completions.append(completion)
+
+            for block_row in range(1 << len(blocks)):
+                allowed = type_full
+                required = list(completions)
+                row_mask = ground_mask
+                for position, column in enumerate(blocks):
+                    is_forall = self._blocks[column][0]
+                    body = bodies[position]
+                    if (block_row >> position) & 1:
+                        row_mask &= columns[column]
+                        if is_forall:
+                            allowed &= body
+                        else:
+                            required.append(body)
+                    else:
+                        row_mask &= full & ~columns[column]
+                        if is_forall:
+                            required.append(type_full & ~body)
+                        else:
+                            allowed &= ~body
+                # Taking every allowed type as the domain satisfies all constraints, if it can
+                if allowed and all(allowed & mask for mask in required):
+                    consistent |= row_mask
+        return consistent
+
+    def is_tautology(self, expr):
+        """
+        Check if a formula is valid.
+
+        Returns:
+            bool: The answer, or None if the formula is outside the fragment.
+        """
+        try:
+            (mask,), consistent, full = self.compile([expr])
+        except OutOfFragment:
+            return None
+        return consistent & ~mask == 0
+
+    def is_satisfiable(self, expr):
+        """
+        Check if a formula is satisfiable.
+
+        Returns:
+            bool: The answer, or None if the formula is outside the fragment.
+        """
+        try:
+            (mask,), consistent, full = self.compile([expr])
+        except OutOfFragment:
+            return None
+        return consistent & mask != 0
+
+    def entails(self, premises, conclusion):
+        """
+        Check if premises entail a conclusion.
+
+        Returns:
+            bool: The answer, or None if a formula is outside the fragment.
+        """
+        try:
+            masks, consistent, full = self.compile(list(premises) + [conclusion])
+        except OutOfFragment:
+            return None
+        rows = consistent
+        for mask in masks[:-1]:
+            rows &= mask
+        return rows & ~masks[-1] == 0
@@ -0,0 +1,129 @@
+from z3 import *
+
+from .profiling import SolverProfiler
+
+
+class EntailmentOracle:
+    """
+    Answer entailment queries against a fixed premise set with one incremental solver.
+
+    Every premise is guarded by an assumption literal (guard_i → premise_i), so a query
+    only pushes the negated statement and calls check() with the guards of the premises in
+    play. When the statement is entailed, the unsat core over the guards gives the
+    premises actually used, minimized so that no premise can be dropped.
+    """
+
+    def __init__(self, premises, minimize=True, profiler=None):
+        """
+        Args:
+            premises (list): List of premises (rule name, expression).
+            minimize (bool): If True, shrink unsat cores until every premise in them is needed.
+            profiler (SolverProfiler): Records every check and sets the solver budgets.
+        """
+        self.premises = list(premises)
+        self.minimize = minimize
+        self.profiler = profiler if profiler is not None else SolverProfiler()
+        ctx = self.premises[0][1].ctx if self.premises else main_ctx()
+        self.solver = self.profiler.new_solver(ctx)
+        self.guards = [Bool(f"__premise_{idx}", ctx) for idx in range(len(self.premises))]
+        self._guard_index = {guard.get_id(): idx for idx, guard in enumerate(self.guards)}
+        for guard, (_, expr) in zip(self.guards, self.premises):
+            self.solver.add(Implies(guard, expr))
+
+    def used_premises(self, statement, exclude=()):
+        """
+        Check if the premises entail a statement and return the premises used.
+
+        Args:
+            statement (z3.ExprRef): The statement to derive.
+            exclude (iterable): Indices of premises that may not be used.
+
+        Returns:
+            list: Sorted indices of a minimal set of premises entailing the statement, or
+            None if the statement is not entailed.
+
+        Raises:
+            BudgetExceeded: If a check runs out of its time or resource budget.
+        """
+        excluded = set(exclude)
+        assumptions = [guard for idx, guard in enumerate(self.guards) if idx not in excluded]
+
+        self.solver.push()
+        try:
+            self.solver.add(Not(statement))
+            if self.profiler.check(self.solver, *assumptions, stage="question", rule="entailment") != unsat:
+                return None
+            core_ids = {lit.get_id() for lit in self.solver.unsat_core()}
+            core = [guard for guard in assumptions if guard.get_id() in core_ids]
+            if self.minimize:
+                core = self._minimize(core)
+        finally:
+            self.solver.pop()
+        return sorted(self._guard_index[guard.get_id()] for guard in core)
+
+    def entails(self, statement, exclude=()):
+        """
+        Check if the premises entail a statement, without tracing the premises used.
+
+        Args:
+            statement (z3.ExprRef): The statement to derive.
+            exclude (iterable): Indices of premises that may not be used.
+
+        Returns:
+            bool: True if the statement is entailed.
+
+        Raises:
+            BudgetExceeded: If the check runs out of its time or resource budget.
+        """
+        excluded = set(exclude)
+        assumptions = [guard for idx, guard in enumerate(self.guards) if idx not in excluded]
+
+        self.solver.push()
+        try:
+            self.solver.add(Not(statement))
+            return self.profiler.check(self.solver, *assumptions, stage="question", rule="entailment") == unsat
+        finally:
+            self.solver.pop()
+
+    def _minimize(self, core):
+        # Deletion-based minimization: drop each guard whose removal keeps the query unsat
+        idx = 0
+        while idx < len(core):
+            candidate = core[:idx] + core[idx + 1:]
+            if self.profiler.check(self.solver, *candidate, stage="question", rule="core_minimization") == unsat:
+                core = candidate
+            else:
+                idx += 1
+        return core
+
+    def check(self, statement, exclude=()):
+        """
+        Label a statement as "Yes" (entailed), "No" (its negation is entailed) or "Uncertain".
+
+        Args:
+            statement (z3.ExprRef): The statement to label.
+            exclude (iterable): Indices of premises that may not be used.
+
+        Returns:
+            tuple: The label and the sorted indices of the premises used (empty for "Uncertain").
+        """
+        used_indices = self.used_premises(statement, exclude)
+        if used_indices is not None:
+            return "Yes", used_indices
+        used_indices = self.used_premises(Not(statement), exclude)
+        if used_indices is not None:
+            return "No", used_indices
+        return "Uncertain", []
+
+    def check_many(self, statements, exclude=()):
+        """
+        Label many statements against the same premises.
+
+        Args:
+            statements (list): The statements to label.
+            exclude (iterable): Indices of premises that may not be used.
+
+        Returns:
+            list: One (label, used indices) tuple per statement.
+        """
+        return [self.check(statement, exclude) for statement in statements]
@@ -0,0 +1,514 @@
+import functools
+import json
+import struct
+import sys
+from array import array
+
+from .lazy import z3
+
+# Operator codes of the formula store
+OP_TRUE = 0
+OP_FALSE = 1
+OP_NOT = 2
+OP_AND = 3
+OP_OR = 4
+OP_IMPLIES = 5
+OP_IFF = 6
+OP_XOR = 7
+OP_EQ = 8  # Equality between non-Boolean terms
+OP_APP = 9  # Uninterpreted function, predicate or constant; payload (name, domain sorts, range sort)
+OP_VAR = 10  # Bound variable; payload (de Bruijn index, sort)
+OP_NUM = 11  # Numeral; payload (value, sort)
+OP_FORALL = 12  # Payload: bound variables ((name, sort), ...)
+OP_EXISTS = 13
+
+
+@functools.lru_cache(maxsize=None)
+def _from_z3():
+    # Built on first use: the Z3 operator codes are only known once z3 is loaded
+    return {
+        z3.Z3_OP_TRUE: OP_TRUE,
+        z3.Z3_OP_FALSE: OP_FALSE,
+        z3.Z3_OP_NOT: OP_NOT,
+        z3.Z3_OP_AND: OP_AND,
+        z3.Z3_OP_OR: OP_OR,
+        z3.Z3_OP_IMPLIES: OP_IMPLIES,
+        z3.Z3_OP_IFF: OP_IFF,
+        z3.Z3_OP_XOR: OP_XOR,
+        z3.Z3_OP_UNINTERPRETED: OP_APP,
+    }
+
+
+_MAGIC = b"FOLP"
+_VERSION = 1
+# Magic, version, number of nodes, number of child slots, length of the JSON metadata
+_HEADER = struct.Struct("<4sBIII")
+
+
+def _sort_name(ctx, sort):
+    return z3.Z3_sort_to_string(ctx, sort)
+
+
+def _make_sort(name, ctx):
+    if name == "Bool":
+        return z3.BoolSort(ctx)
+    if name == "Int":
+        return z3.IntSort(ctx)
+    if name == "Real":
+        return z3.RealSort(ctx)
+    return z3.DeclareSort(name, ctx)
+
+
+def _as_tuple(value):
+    # JSON turns the tuples of the payloads into lists
+    return tuple(_as_tuple(item) for item in value) if isinstance(value, list) else value
+
+
+class FormulaStore:
+    """
+    An interned, hash-consed DAG of formulas stored in flat arrays.
+
+    Every node is an operator code, an optional payload (symbol, bound variables, ...) and
+    a list of child node ids. Structurally equal subformulas are stored once, so equal
+    formulas get equal node ids and a pool of premises sharing atoms and subformulas holds
+    no live Z3 AST. Children are always added before their parents, so node ids are in
+    topological order.
+
+    The flat arrays take about 17 bytes per node, but the intern table used for
+    hash-consing adds a few hundred more (about 500 bytes per node in all for generated
+    premises). A store never forgets a node, so it should be scoped to a premise set or a
+    shard rather than kept for a whole run; to_bytes writes the arrays alone.
+    """
+
+    def __init__(self):
+        self.ops = array("B")
+        self.payloads = array("i")  # Index into payload_table, -1 if the node has no payload
+        self.offsets = array("I", [0])  # Children of node i: children[offsets[i]:offsets[i + 1]]
+        self.children = array("I")
+        self.payload_table = []
+        self._payload_index = {}
+        self._nodes = {}  # (op, payload index, children) -> node id
+        self._decls = {}  # (payload index, context) -> z3.FuncDecl
+
+    def __len__(self):
+        return len(self.ops)
+
+    def _intern_payload(self, payload):
+        if payload is None:
+            return -1
+        if payload not in self._payload_index:
+            self._payload_index[payload] = len(self.payload_table)
+            self.payload_table.append(payload)
+        return self._payload_index[payload]
+
+    def node(self, op, payload=None, children=()):
+        """
+        Return the id of a node, adding it if it is not in the store yet.
+
+        Args:
+            op (int): Operator code (OP_*).
+            payload (tuple): Hashable payload of the node, or None.
+            children (tuple): Ids of the child nodes.
+
+        Returns:
+            int: The node id.
+        """
+        payload_id = self._intern_payload(payload)
+        key = (op, payload_id, tuple(children))
+        node_id = self._nodes.get(key)
+        if node_id is None:
+            node_id = len(self.ops)
+            self.ops.append(op)
+            self.payloads.append(payload_id)
+            self.children.extend(children)
+            self.offsets.append(len(self.children))
+            self._nodes[key] = node_id
+        return node_id
+
+    def op(self, node_id):
+        return self.ops[node_id]
+
+    def payload(self, node_id):
+        payload_id = self.payloads[node_id]
+        return self.payload_table[payload_id] if payload_id >= 0 else None
+
+    def args(self, node_id):
+        return self.children[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def add(self, expr):
+        """
+        Intern a Z3 formula.
+
+        Args:
+            expr (z3.ExprRef): The formula.
+
+        Returns:
+            int: The id of its root node.
+
+        Raises:
+            ValueError: If the formula uses an interpreted symbol the store does not support.
+        """
+        ctx = expr.ctx_ref()
+        from_z3 = _from_z3()
+        memo = {}
+        # Iterative post-order walk over raw AST pointers, memoized on the AST id of shared subterms
+        stack = [(expr.as_ast(), False)]
+        while stack:
+            ast, expanded = stack.pop()
+            ast_id = z3.Z3_get_ast_id(ctx, ast)
+            if ast_id in memo and not expanded:
+                continue
+            kind = z3.Z3_get_ast_kind(ctx, ast)
+
+            if kind == z3.Z3_APP_AST:
+                children = [z3.Z3_get_app_arg(ctx, ast, i) for i in range(z3.Z3_get_app_num_args(ctx, ast))]
+            elif kind == z3.Z3_QUANTIFIER_AST:
+                children = [z3.Z3_get_quantifier_body(ctx, ast)]
+            else:
+                children = []
+            if children and not expanded:
+                stack.append((ast, True))
+                stack.extend((child, False) for child in children)
+                continue
+
+            child_ids = tuple(memo[z3.Z3_get_ast_id(ctx, child)] for child in children)
+            if kind == z3.Z3_APP_AST:
+                decl = z3.Z3_get_app_decl(ctx, ast)
+                decl_kind = z3.Z3_get_decl_kind(ctx, decl)
+                payload = None
+                if decl_kind == z3.Z3_OP_EQ:
+                    is_bool = z3.Z3_get_sort_kind(ctx, z3.Z3_get_sort(ctx, children[0])) == z3.Z3_BOOL_SORT
+                    op = OP_IFF if is_bool else OP_EQ
+                elif decl_kind in from_z3:
+                    op = from_z3[decl_kind]
+                else:
+                    raise ValueError(f"Unsupported symbol in formula store: {z3.Z3_get_symbol_string(ctx, z3.Z3_get_decl_name(ctx, decl))}")
+                if op == OP_APP:
+                    domain = tuple(_sort_name(ctx, z3.Z3_get_domain(ctx, decl, i)) for i in range(z3.Z3_get_domain_size(ctx, decl)))
+                    payload = (z3.Z3_get_symbol_string(ctx, z3.Z3_get_decl_name(ctx, decl)), domain,
+                               _sort_name(ctx, z3.Z3_get_range(ctx, decl)))
+            elif kind == z3.Z3_NUMERAL_AST:
+                op = OP_NUM
+                payload = (z3.Z3_get_numeral_string(ctx, ast), _sort_name(ctx, z3.Z3_get_sort(ctx, ast)))
+            elif kind == z3.Z3_VAR_AST:
+                op = OP_VAR
+                payload = (z3.Z3_get_index_value(ctx, ast), _sort_name(ctx, z3.Z3_get_sort(ctx, ast)))
+            elif kind == z3.Z3_QUANTIFIER_AST and not z3.Z3_is_lambda(ctx, ast):
+                op = OP_FORALL if z3.Z3_is_quantifier_forall(ctx, ast) else OP_EXISTS
+                payload = tuple(
+                    (z3.Z3_get_symbol_string(ctx, z3.Z3_get_quantifier_bound_name(ctx, ast, i)),
+                     _sort_name(ctx, z3.Z3_get_quantifier_bound_sort(ctx, ast, i)))
+                    for i in range(z3.Z3_get_quantifier_num_bound(ctx, ast)))
+            else:
+                raise ValueError("Unsupported subformula in formula store.")
+            memo[ast_id] = self.node(op, payload, child_ids)
+
+        return memo[z3.Z3_get_ast_id(ctx, expr.as_ast())]
+
+    def to_z3(self, node_id, ctx=None):
+        """
+        Build the Z3 expression of a node.
+
+        Args:
+            node_id (int): The node to materialize.
+            ctx (z3.Context): Context of the expression (defaults to the main context).
+
+        Returns:
+            z3.ExprRef: The expression.
+        """
+        ctx = ctx if ctx is not None else z3.main_ctx()
+        memo = {}
+        stack = [(node_id, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in memo and not expanded:
+                continue
+            args = self.args(node)
+            if args and not expanded:
+                stack.append((node, True))
+                stack.extend((arg, False) for arg in args)
+                continue
+            memo[node] = self._build(node, [memo[arg] for arg in args], ctx)
+        return memo[node_id]
+
+    def _build(self, node, args, ctx):
+        op = self.ops[node]
+        if op == OP_TRUE:
+            return z3.BoolVal(True, ctx)
+        if op == OP_FALSE:
+            return z3.BoolVal(False, ctx)
+        if op == OP_NOT:
+            return z3.Not(args[0])
+        if op == OP_AND:
+            return z3.And(*args)
+        if op == OP_OR:
+            return z3.Or(*args)
+        if op == OP_IMPLIES:
+            return z3.Implies(args[0], args[1])
+        if op in (OP_IFF, OP_EQ):
+            return args[0] == args[1]
+        if op == OP_XOR:
+            return z3.Xor(args[0], args[1])
+
+        payload_id = self.payloads[node]
+        payload = self.payload_table[payload_id]
+        if op == OP_APP:
+            key = (payload_id, ctx)
+            if key not in self._decls:
+                name, domain, range_sort = payload
+                sorts = [_make_sort(sort, ctx) for sort in domain + (range_sort,)]
+                self._decls[key] = z3.Function(name, *sorts)
+            decl = self._decls[key]
+            return decl(*args) if args else decl()
+        if op == OP_VAR:
+            return z3.Var(payload[0], _make_sort(payload[1], ctx))
+        if op == OP_NUM:
+            value, sort = payload
+            return z3.RealVal(value, ctx) if sort == "Real" else z3.IntVal(value, ctx)
+
+        # Quantifier over a de Bruijn body, built directly so the indices are kept as stored
+        num_bound = len(payload)
+        sorts = (z3.Sort * num_bound)()
+        names = (z3.Symbol * num_bound)()
+        for i, (name, sort) in enumerate(payload):
+            sorts[i] = _make_sort(sort, ctx).ast
+            names[i] = z3.to_symbol(name, ctx)
+        ast = z3.Z3_mk_quantifier(ctx.ref(), op == OP_FORALL, 1, 0, (z3.Pattern * 0)(), num_bound, sorts, names, args[0].as_ast())
+        return z3.QuantifierRef(ast, ctx)
+
+    def premise(self, rule, expr):
+        """
+        Intern a formula and return it as a compact premise.
+        """
+        return Premise(rule, self, self.add(expr), expr.ctx)
+
+    def to_bytes(self, roots=None):
+        """
+        Serialize the store to a compact binary form.
+
+        Args:
+            roots (list): Optional node ids; only the nodes reachable from them are written,
+                renumbered from 0 in topological order.
+
+        Returns:
+            tuple: The serialized bytes and the new id of every root (or None if roots is None).
+        """
+        if roots is None:
+            nodes = range(len(self.ops))
+        else:
+            reachable = set()
+            stack = list(roots)
+            while stack:
+                node = stack.pop()
+                if node not in reachable:
+                    reachable.add(node)
+                    stack.extend(self.args(node))
+            # Ids are topological, so sorting keeps children before their parents
+            nodes = sorted(reachable)
+        renumber = {node: new for new, node in enumerate(nodes)}
+
+        ops, payloads, offsets, children = array("B"), array("i"), array("I", [0]), array("I")
+        payload_table, payload_index = [], {}
+        for node in nodes:
+            ops.append(self.ops[node])
+            payload_id = self.payloads[node]
+            if payload_id >= 0 and payload_id not in payload_index:
+                payload_index[payload_id] = len(payload_table)
+                payload_table.append(self.payload_table[payload_id])
+            payloads.append(payload_index.get(payload_id, -1))
+            children.extend(renumber[arg] for arg in self.args(node))
+            offsets.append(len(children))
+
+        meta = json.dumps(payload_table, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if sys.byteorder == "big":
+            for values in (payloads, offsets, children):
+                values.byteswap()
+        data = b"".join([
+            _HEADER.pack(_MAGIC, _VERSION, len(ops), len(children), len(meta)),
+            meta, ops.tobytes(), payloads.tobytes(), offsets.tobytes(), children.tobytes(),
+        ])
+        return data, (None if roots is None else [renumber[root] for root in roots])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Load a store written by to_bytes.
+
+        Args:
+            data (bytes): The serialized store.
+
+        Returns:
+            FormulaStore: The store.
+        """
+        magic, version, num_nodes, num_children, meta_size = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a serialized formula store.")
+        position = _HEADER.size
+
+        def take(typecode, count):
+            nonlocal position
+            values = array(typecode)
+            size = values.itemsize * count
+            values.frombytes(data[position:position + size])
+            position += size
+            return values
+
+        store = cls()
+        store.payload_table = [_as_tuple(payload) for payload in json.loads(data[position:position + meta_size].decode("utf-8"))]
+        position += meta_size
+        store.ops = take("B", num_nodes)
+        store.payloads = take("i", num_nodes)
+        store.offsets = take("I", num_nodes + 1)
+        store.children = take("I", num_children)
+        if sys.byteorder == "big":
+            for values in (store.payloads, store.offsets, store.children):
+                values.byteswap()
+
+        store._payload_index = {payload: idx for idx, payload in enumerate(store.payload_table)}
+        for node in range(num_nodes):
+            store._nodes[(store.ops[node], store.payloads[node], tuple(store.args(node)))] = node
+        return store
+
+
+class Premise:
+    """
+    A compact premise: a rule name and the id of its formula in a FormulaStore.
+
+    The Z3 expression is only built when it is accessed, and is not kept. It is built in
+    the context of the interned expression, so a premise follows the context of the
+    reasoner that produced it. A premise unpacks like the (rule name, expression) tuples used everywhere else, so it can be
+    passed to the question generators and renderers unchanged.
+    """
+
+    __slots__ = ("rule", "store", "node", "ctx")
+
+    def __init__(self, rule, store, node, ctx=None):
+        """
+        Args:
+            rule (str): Name of the rule that produced the premise.
+            store (FormulaStore): Store holding the formula.
+            node (int): Id of the formula in the store.
+            ctx (z3.Context): Context the expression is built in (defaults to the main context).
+        """
+        self.rule = rule
+        self.store = store
+        self.node = node
+        self.ctx = ctx
+
+    @property
+    def expr(self):
+        """
+        The Z3 expression of the premise, built on access in the premise's context.
+        """
+        return self.store.to_z3(self.node, self.ctx)
+
+    def to_z3(self, ctx=None):
+        """
+        Build the Z3 expression of the premise in the given context (defaults to its own).
+        """
+        return self.store.to_z3(self.node, ctx if ctx is not None else self.ctx)
+
+    def __iter__(self):
+        yield self.rule
+        yield self.expr
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, idx):
+        if idx in (0, -2):
+            return self.rule
+        if idx in (1, -1):
+            return self.expr
+        raise IndexError("Premise index out of range")
+
+    def __eq__(self, other):
+        if not isinstance(other, Premise):
+            return NotImplemented
+        # Hash-consing makes structural equality an id comparison within a store
+        return self.rule == other.rule and self.store is other.store and self.node == other.node
+
+    def __hash__(self):
+        return hash((self.rule, id(self.store), self.node))
+
+    def __repr__(self):
+        return f"Premise({self.rule!r}, node={self.node})"
+
+    def to_bytes(self):
+        """
+        Serialize the premise with the nodes of its formula.
+        """
+        return dump_premises([self])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Load a premise written by to_bytes.
+        """
+        (premise,) = load_premises(data)
+        return premise
+
+
+def compact_premises(premises, store=None):
+    """
+    Convert (rule name, expression) premises to compact premises sharing one store.
+
+    Args:
+        premises (dict or list): A list of premises, or a dict of lists such as the output
+            of FOLReasoning.generate_premises.
+        store (FormulaStore): Store to intern the formulas in (defaults to a new one).
+
+    Returns:
+        dict or list: The same layout with Premise records.
+    """
+    store = store if store is not None else FormulaStore()
+    if isinstance(premises, dict):
+        return {name: compact_premises(group, store) for name, group in premises.items()}
+    return [store.premise(rule, expr) for rule, expr in premises]
+
+
+def dump_premises(premises):
+    """
+    Serialize compact premises to bytes, with only the store nodes they reach.
+
+    Args:
+        premises (list): Premise records sharing one store.
+
+    Returns:
+        bytes: The serialized pool.
+    """
+    stores = {id(premise.store) for premise in premises}
+    if len(stores) > 1:
+        raise ValueError("Premises to serialize must share one formula store.")
+    store = premises[0].store if premises else FormulaStore()
+    data, roots = store.to_bytes([premise.node for premise in premises])
+    rules = json.dumps([premise.rule for premise in premises], ensure_ascii=False).encode("utf-8")
+    roots = array("I", roots)
+    if sys.byteorder == "big":
+        roots.byteswap()
+    return struct.pack("<I", len(rules)) + rules + roots.tobytes() + data
+
+
+def load_premises(data, ctx=None):
+    """
+    Load premises written by dump_premises into a new store.
+
+    Args:
+        data (bytes): The serialized pool.
+        ctx (z3.Context): Context the premises build their expressions in (defaults to the
+            main context).
+
+    Returns:
+        list: The premises, sharing one FormulaStore.
+    """
+    (rules_size,) = struct.unpack_from("<I", data)
+    position = 4
+    rules = json.loads(data[position:position + rules_size].decode("utf-8"))
+    position += rules_size
+    roots = array("I")
+    roots.frombytes(data[position:position + roots.itemsize * len(rules)])
+    if sys.byteorder == "big":
+        roots.byteswap()
+    position += roots.itemsize * len(rules)
+    store = FormulaStore.from_bytes(data[position:])
+    return [Premise(rule, store, node, ctx) for rule, node in zip(rules, roots)]
@@ -0,0 +1,237 @@
+import json
+import time
+import weakref
+from collections import defaultdict
+
+from .lazy import z3
+
+# reason_unknown() values reported by Z3 when a check runs out of budget
+_BUDGET_REASONS = ("timeout", "canceled", "resource limit")
+
+
+class BudgetExceeded(RuntimeError):
+    """
+    Raised when a solver check runs out of its time or resource budget.
+    """
+
+    def __init__(self, stage, rule, reason):
+        super().__init__(f"Solver budget exceeded in stage {stage!r} (rule {rule!r}): {reason}")
+        self.stage = stage
+        self.rule = rule
+        self.reason = reason
+
+
+# Z3 statistics that are process-wide gauges or running counters: aggregated with max, not sum
+_GAUGE_STATISTICS = ("memory", "num allocs", "rlimit count")
+
+# Fields summed into the per-stage totals
+_TOTALS = ("calls", "time", "retries", "solver_calls", "solver_time")
+
+
+def _new_entry():
+    return {"calls": 0, "time": 0.0, "max_time": 0.0, "engines": defaultdict(int),
+            "solver_calls": 0, "solver_time": 0.0, "results": defaultdict(int), "statistics": {}}
+
+
+class SolverProfiler:
+    """
+    Record every validity query of the generation pipeline and enforce per-call solver budgets.
+
+    Queries are tagged by pipeline stage (e.g. "original", "derived", "question") and rule
+    name. For each (stage, rule) the profiler aggregates the number of queries, their wall
+    time and the engine that answered them (cache, truth table, monadic, Z3), the solver checks with
+    their time, results and Z3 statistics, and the number of rejected candidates (retries)
+    of the generation loops.
+    """
+
+    def __init__(self, timeout=None, rlimit=None):
+        """
+        Args:
+            timeout (int): Optional timeout of each solver check, in milliseconds.
+            rlimit (int): Optional resource limit of each solver check (Z3 rlimit units,
+                deterministic across machines unlike timeouts).
+        """
+        self.timeout = timeout
+        self.rlimit = rlimit
+        self.entries = defaultdict(_new_entry)
+        self.retries = defaultdict(int)
+        self.skipped = defaultdict(int)
+        # Statistics of a solver are cumulative over its checks: the last values seen per
+        # solver, so that each check only adds its own share
+        self._last_statistics = weakref.WeakKeyDictionary()
+
+    def new_solver(self, ctx=None):
+        """
+        Create a solver configured with the per-call budgets.
+        """
+        solver = z3.Solver(ctx=ctx)
+        if self.timeout is not None:
+            solver.set("timeout", self.timeout)
+        if self.rlimit is not None:
+            solver.set("rlimit", self.rlimit)
+        return solver
+
+    def check(self, solver, *assumptions, stage, rule=None):
+        """
+        Run solver.check(*assumptions) and record its time, result and statistics.
+
+        Args:
+            solver (z3.Solver): The solver, usually created with new_solver.
+            assumptions: Assumption literals passed to check().
+            stage (str): Pipeline stage of the query.
+            rule (str): Rule name the query belongs to.
+
+        Returns:
+            z3.CheckSatResult: The result of the check.
+
+        Raises:
+            BudgetExceeded: If the check stopped because of the timeout or rlimit.
+        """
+        start = time.perf_counter()
+        result = solver.check(*assumptions)
+        entry = self.entries[(stage, rule)]
+        entry["solver_calls"] += 1
+        entry["solver_time"] += time.perf_counter() - start
+        entry["results"][str(result)] += 1
+
+        statistics = solver.statistics()
+        last = self._last_statistics.get(solver, {})
+        current = {}
+        for key in statistics.keys():
+            value = current[key] = statistics.get_key_value(key)
+            if any(gauge in key for gauge in _GAUGE_STATISTICS):
+                entry["statistics"][key] = max(entry["statistics"].get(key, 0), value)
+            else:
+                # A counter below its last value was reset by the solver: count it whole
+                delta = value - last.get(key, 0)
+                entry["statistics"][key] = entry["statistics"].get(key, 0) + (delta if delta >= 0 else value)
+        self._last_statistics[solver] = current
+
+        if result == z3.unknown:
+            reason = solver.reason_unknown()
+            if any(budget in reason for budget in _BUDGET_REASONS):
+                raise BudgetExceeded(stage, rule, reason)
+        return result
+
+    def record(self, stage, rule, engine, elapsed):
+        """
+        Record one validity query and the engine that answered it.
+
+        Args:
+            stage (str): Pipeline stage of the query.
+            rule (str): Rule name the query belongs to.
+            engine (str): "cache", "truth_table", "monadic" or "z3".
+            elapsed (float): Wall time of the whole query, in seconds.
+        """
+        entry = self.entries[(stage, rule)]
+        entry["calls"] += 1
+        entry["time"] += elapsed
+        entry["max_time"] = max(entry["max_time"], elapsed)
+        entry["engines"][engine] += 1
+
+    def count_retry(self, stage, rule=None):
+        """
+        Count one rejected candidate of a generation loop.
+        """
+        self.retries[(stage, rule)] += 1
+
+    def count_skip(self, reason):
+        """
+        Count one sample skipped because a query ran out of budget.
+        """
+        self.skipped[reason] += 1
+
+    def summary(self):
+        """
+        Return the aggregated profile as a JSON-serializable dict.
+
+        Returns:
+            dict: Per (stage, rule) entries, totals per stage, and skipped samples.
+        """
+        entries = []
+        for (stage, rule), entry in sorted(self.entries.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            entries.append({
+                "stage": stage,
+                "rule": rule,
+                "calls": entry["calls"],
+                "time": entry["time"],
+                "max_time": entry["max_time"],
+                "retries": self.retries.get((stage, rule), 0),
+                "engines": dict(entry["engines"]),
+                "solver_calls": entry["solver_calls"],
+                "solver_time": entry["solver_time"],
+                "results": dict(entry["results"]),
+                "statistics": dict(entry["statistics"]),
+            })
+        # Retries of (stage, rule) pairs that never reached a query
+        for (stage, rule), count in self.retries.items():
+            if (stage, rule) not in self.entries:
+                entries.append({"stage": stage, "rule": rule, "calls": 0, "time": 0.0, "max_time": 0.0,
+                                "retries": count, "engines": {}, "solver_calls": 0, "solver_time": 0.0,
+                                "results": {}, "statistics": {}})
+
+        stages = defaultdict(lambda: dict.fromkeys(_TOTALS, 0))
+        for entry in entries:
+            for key in _TOTALS:
+                stages[entry["stage"]][key] += entry[key]
+
+        return {
+            "budgets": {"timeout": self.timeout, "rlimit": self.rlimit},
+            "stages": dict(stages),
+            "entries": entries,
+            "skipped": dict(self.skipped),
+        }
+
+    def export_json(self, filepath):
+        """
+        Write the aggregated profile to a JSON file.
+        """
+        with open(filepath, 'w', encoding='utf-8') as json_file:
+            json.dump(self.summary(), json_file, indent=4)
+
+
+def merge_summaries(summaries):
+    """
+    Merge profile summaries, e.g. of the shards of a bulk run.
+
+    Args:
+        summaries (list): Dicts returned by SolverProfiler.summary().
+
+    Returns:
+        dict: A summary with the same layout, aggregated over all inputs.
+    """
+    merged = {}
+    stages = defaultdict(lambda: dict.fromkeys(_TOTALS, 0))
+    skipped = defaultdict(int)
+    budgets = {}
+    for summary in summaries:
+        budgets = summary["budgets"]
+        for stage, totals in summary["stages"].items():
+            for key in _TOTALS:
+                stages[stage][key] += totals[key]
+        for reason, count in summary["skipped"].items():
+            skipped[reason] += count
+        for entry in summary["entries"]:
+            key = (entry["stage"], entry["rule"])
+            if key not in merged:
+                merged[key] = {**entry, "engines": {}, "results": {}, "statistics": {}, "max_time": 0.0,
+                               **dict.fromkeys(_TOTALS, 0)}
+            target = merged[key]
+            for field in _TOTALS:
+                target[field] += entry[field]
+            target["max_time"] = max(target["max_time"], entry["max_time"])
+            for field in ("engines", "results"):
+                for name, count in entry[field].items():
+                    target[field][name] = target[field].get(name, 0) + count
+            for name, value in entry["statistics"].items():
+                if any(gauge in name for gauge in _GAUGE_STATISTICS):
+                    target["statistics"][name] = max(target["statistics"].get(name, 0), value)
+                else:
+                    target["statistics"][name] = target["statistics"].get(name, 0) + value
+
+    return {
+        "budgets": budgets,
+        "stages": dict(stages),
+        "entries": list(merged.values()),
+        "skipped": dict(skipped),
+    }
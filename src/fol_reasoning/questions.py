@@ -1,11 +1,16 @@
 from z3 import *
 import random
-from .utils import expr_to_fol_string
+from .utils import FOLRenderer
+from .oracle import EntailmentOracle
+from .entailment import DerivationError
 
 def trace_chained_premises_with_indices(premises, target_expr):
     """
     Trace the premises that are logically chained to infer the target expression.
 
+    This is a syntactic heuristic (expression equality and first arguments); the question
+    generators use EntailmentOracle.used_premises, which returns sound, minimal premise sets.
+
     Args:
         premises (list): List of premises (rule name, expression).
         target_expr (z3.ExprRef): The target expression to trace.
@@ -27,33 +32,110 @@ def trace_chained_premises_with_indices(premises, target_expr):
 
     return list(reversed(used_indices))  # Reverse to maintain logical order
 
-def generate_chained_multiple_choice_question(premises, option="last"):
+def trace_used_premises(oracle, chosen_step):
+    """
+    Find the premises used to infer one of the premises of the oracle.
+
+    Args:
+        oracle (EntailmentOracle): Oracle loaded with the chained premises.
+        chosen_step (int): Index of the target premise.
+
+    Returns:
+        list: A minimal set of other premises entailing the target, or [chosen_step] if
+        the target does not follow from the other premises.
+    """
+    _, target_expr = oracle.premises[chosen_step]
+    used_indices = oracle.used_premises(target_expr, exclude=[chosen_step])
+    return used_indices if used_indices is not None else [chosen_step]
+
+def displayed_premises(premises):
+    """
+    Return the premises shown with the questions, in the order they are numbered.
+
+    Args:
+        premises (dict): Dictionary containing original, derived, and unrelated premises.
+
+    Returns:
+        list: The original, derived and unrelated premises (rule name, expression).
+    """
+    return premises["original"] + premises["derived"] + premises["unrelated"]
+
+def _subformulas(exprs):
+    # Proper Boolean subformulas of the formulas, outermost first, without entering
+    # quantifiers (their bodies have free de Bruijn variables)
+    found = {}
+    stack = [child for expr in exprs if is_app(expr) for child in reversed(expr.children())]
+    while stack:
+        expr = stack.pop()
+        if not is_bool(expr) or is_true(expr) or is_false(expr) or expr.get_id() in found:
+            continue
+        found[expr.get_id()] = expr
+        if is_app(expr):
+            stack.extend(reversed(expr.children()))
+    return list(found.values())
+
+def generate_chained_multiple_choice_question(premises, option="last", renderer=None, oracle=None, miner=None):
     """
     Generate a multiple-choice question using chained premises.
 
     Args:
         premises (dict): Dictionary containing original, derived, and unrelated premises.
         option (str): The type of question to generate ("last", "random").
+        renderer (FOLRenderer): Optional renderer shared by the sample, so that the answer is
+            rendered once and reused inside every distractor.
+        oracle (EntailmentOracle): Optional oracle already loaded with the displayed
+            premises (see displayed_premises), shared by the questions of a sample.
+        miner (DistractorMiner): Optional miner of distractors that are close to the answer
+            but do not follow from the premises. Without it (or when it finds too few), the
+            distractors are the negation of the answer, its converse and a contradiction.
 
     Returns:
         tuple: A tuple containing the question, the correct answer letter (A, B, C, or D), and the indices of premises used.
+
+    Raises:
+        DerivationError: If fewer than three candidate distractors are not entailed, which
+            only happens when the premises are inconsistent.
     """
     all_premises = premises["original"] + premises["derived"]
     chosen_step = random.randint(0, len(all_premises) - 1) if option == "random" else len(all_premises) - 1
     _, answer_expr = all_premises[chosen_step]
 
     # Trace the indices of premises used to infer the answer
-    used_indices = trace_chained_premises_with_indices(all_premises, answer_expr)
-
-    # Generate the correct answer and distractors
-    answer = expr_to_fol_string(answer_expr)
-    false_answers = [
-        expr_to_fol_string(Not(answer_expr)),
-        expr_to_fol_string(Implies(answer_expr, answer_expr)),
-        expr_to_fol_string(And(answer_expr, Not(answer_expr))),
-        "Uncertain"  # Add "Uncertain" as a distractor
-    ]
-    options = [answer] + false_answers[:3]
+    shown = displayed_premises(premises)
+    oracle = oracle or EntailmentOracle(shown)
+    used_indices = trace_used_premises(oracle, chosen_step)
+
+    # Generate the correct answer and distractors: mined ones first, then the templates
+    renderer = renderer or FOLRenderer()
+    answer = renderer.render(answer_expr)
+    # The miner already leaves out the candidates entailed by the displayed premises
+    mined = miner.mine([expr for _, expr in shown], answer_expr, count=3) if miner is not None else []
+    templates = [Not(answer_expr)]
+    if is_implies(answer_expr):
+        templates.append(Implies(answer_expr.arg(1), answer_expr.arg(0)))  # The converse
+    templates.append(And(answer_expr, Not(answer_expr)))
+    templates += [Not(expr) for _, expr in shown]
+
+    seen = {answer}
+    false_answers = []
+    for expr in mined:
+        text = renderer.render(expr)
+        if text not in seen:
+            seen.add(text)
+            false_answers.append(text)
+
+    # Fill up with the templates that do not follow from the displayed premises
+    for expr in templates:
+        if len(false_answers) == 3:
+            break
+        text = renderer.render(expr)
+        if text not in seen:
+            seen.add(text)
+            if not oracle.entails(expr):
+                false_answers.append(text)
+    if len(false_answers) < 3:
+        raise DerivationError("Every candidate distractor follows from the premises; they are inconsistent.")
+    options = [answer] + false_answers
     random.shuffle(options)
 
     # Determine the correct answer letter
@@ -69,41 +151,52 @@ def generate_chained_multiple_choice_question(premises, option="last"):
     return question, correct_answer_letter, used_indices
 
 
-def generate_chained_yes_no_question(premises, option="last"):
+def generate_chained_yes_no_question(premises, option="last", renderer=None, oracle=None):
     """
     Generate a yes/no/uncertain question using chained premises.
 
     Args:
         premises (dict): Dictionary containing original, derived, and unrelated premises.
         option (str): The type of question to generate ("last", "random").
+        renderer (FOLRenderer): Optional renderer shared by the sample.
+        oracle (EntailmentOracle): Optional oracle already loaded with the displayed
+            premises (see displayed_premises), shared by the questions of a sample.
 
     Returns:
         tuple: A tuple containing the question, the correct answer, and the indices of premises used.
     """
     all_premises = premises["original"] + premises["derived"]
+    shown = displayed_premises(premises)
     chosen_step = random.randint(0, len(all_premises) - 1) if option == "random" else len(all_premises) - 1
     _, target_expr = all_premises[chosen_step]
 
     # Randomly decide the type of question: "Yes", "No", or "Uncertain"
     question_type = random.choice(["Yes", "No", "Uncertain"])
 
+    oracle = oracle or EntailmentOracle(shown)
+    renderer = renderer or FOLRenderer()
     if question_type == "Yes":
-        # Trace the indices of premises used to infer the answer
-        used_indices = trace_chained_premises_with_indices(all_premises, target_expr)
-        answer = "Yes" if used_indices else "Uncertain"
-    elif question_type == "No":
-        # Negate the target expression to create a contradiction
-        target_expr = Not(target_expr)
-        used_indices = trace_chained_premises_with_indices(all_premises, target_expr)
-        answer = "No" if used_indices else "Uncertain"
-    else:  # "Uncertain"
-        # Create an expression that cannot be inferred
-        target_expr = random.choice([expr for _, expr in premises["unrelated"]])
-        used_indices = []
-        answer = "Uncertain"
+        # The statement is one of the premises
+        used_indices = trace_used_premises(oracle, chosen_step)
+        answer = "Yes"
+    else:
+        if question_type == "No":
+            # Negate the target expression to create a contradiction
+            target_expr = Not(target_expr)
+        else:  # "Uncertain"
+            # Pick a part of an unrelated premise, which usually cannot be inferred, or of any
+            # displayed premise when all of them are chained (chain_count == steps). The
+            # premises themselves are displayed, so they are always entailed. They are compared
+            # by rendered text: compact premises build a new expression on every access.
+            sources = premises["unrelated"] or shown
+            displayed = {renderer.render(expr) for _, expr in shown}
+            parts = [expr for expr in _subformulas(expr for _, expr in sources) if renderer.render(expr) not in displayed]
+            target_expr = random.choice(parts) if parts else Not(random.choice(sources)[1])
+        # Label the statement by entailment against the displayed premises
+        answer, used_indices = oracle.check(target_expr)
 
     # Format the question
     question = f"Based on the above premises, is the statement true?\n"
-    question += f"Statement: {expr_to_fol_string(target_expr)}"
+    question += f"Statement: {renderer.render(target_expr)}"
 
     return question, answer, used_indices
\ No newline at end of file
@@ -1,6 +1,21 @@
 from z3 import *
 import random
+import time
 from .utils import expr_to_fol_string
+from .truth_table import TruthTableEngine
+from .monadic import MonadicEngine
+from .cache import ValidityCache, tautology_key, entailment_key
+from .entailment import EntailmentIndex, DerivationError
+from .profiling import SolverProfiler
+from .premise import compact_premises
+from .canonical import canonical_hash
+from .chaining import ForwardChainer, negate
+from .signature import Signature
+
+# Draws of a premise over a signature before it is deemed to admit no new premise
+MAX_SIGNATURE_ATTEMPTS = 1000
+# Planted chains tried before a depth is deemed out of reach among the unrelated premises
+MAX_CHAIN_ATTEMPTS = 1000
 
 class FOLReasoning:
     """
@@ -8,18 +23,56 @@ class FOLReasoning:
     generating premises, displaying them, and creating questions and answers.
     """
 
-    def __init__(self):
+    def __init__(self, engine="truth_table", cross_check=False, cache=None, profiler=None, compact=False,
+                 monadic=True, seed=0, ctx=None, signature=None):
+        """
+        Args:
+            engine (str): Validity engine tried before Z3: "truth_table" for the bitset engine
+                of the propositional fragment, or "z3" to always use the solver.
+            cross_check (bool or float): If True, also ask Z3 whenever the bitset or monadic
+                engine answers and raise an error if they disagree. A float is the fraction of
+                those answers that are checked, sampled at random.
+            cache (ValidityCache): Cache of validity and entailment results. Defaults to a
+                fresh in-memory cache; pass a shared or persistent one to reuse results.
+            profiler (SolverProfiler): Records every validity query and sets the timeout and
+                rlimit of each solver check. Defaults to a profiler without budgets.
+            compact (bool): If True, generate_premises returns Premise records, which build
+                their Z3 expressions on access, instead of (rule name, expression) tuples.
+                Every premise set gets a FormulaStore of its own, freed along with it, so
+                a long-running generator does not accumulate the formulas of past samples.
+            monadic (bool): If True and the engine is "truth_table", formulas with the
+                quantified blocks of the EG and UI rules are decided by the monadic engine
+                instead of Z3.
+            seed (int): Seed of the cross-check sampling. It has its own generator, so
+                sampling does not change the generated premises.
+            ctx (z3.Context): Context of the variables and predicates (defaults to the main
+                context). Reasoners used from several threads each need their own.
+            signature (Signature or dict): Optional signature the premises are drawn over
+                (a Signature, or the keyword arguments of one), instead of the six unary
+                predicates P..U applied to x. Depth chains are not supported with it.
+        """
+        if engine not in ("truth_table", "z3"):
+            raise ValueError(f"Unknown engine: {engine}")
+        self.truth_table = TruthTableEngine() if engine == "truth_table" else None
+        self.monadic = MonadicEngine() if engine == "truth_table" and monadic else None
+        self.cross_check = float(cross_check)
+        self._cross_check_random = random.Random(seed)
+        self.cache = cache if cache is not None else ValidityCache()
+        self.profiler = profiler if profiler is not None else SolverProfiler()
+        self.compact = compact
+        self.ctx = ctx
+
         # Declare variables (lowercase letters)
-        self.variables = Ints('x y z a b c d e f g h t s')
+        self.variables = Ints('x y z a b c d e f g h t s', ctx)
         self.x, self.y, self.z, self.a, self.b, self.c, self.d, self.e, self.f, self.g, self.h, self.t, self.s = self.variables
 
         # Declare functions/predicates (uppercase letters)
-        self.P = Function('P', IntSort(), BoolSort())
-        self.Q = Function('Q', IntSort(), BoolSort())
-        self.R = Function('R', IntSort(), BoolSort())
-        self.S = Function('S', IntSort(), BoolSort())
-        self.T = Function('T', IntSort(), BoolSort())
-        self.U = Function('U', IntSort(), BoolSort())
+        self.P = Function('P', IntSort(ctx), BoolSort(ctx))
+        self.Q = Function('Q', IntSort(ctx), BoolSort(ctx))
+        self.R = Function('R', IntSort(ctx), BoolSort(ctx))
+        self.S = Function('S', IntSort(ctx), BoolSort(ctx))
+        self.T = Function('T', IntSort(ctx), BoolSort(ctx))
+        self.U = Function('U', IntSort(ctx), BoolSort(ctx))
 
         # Define inference rules
         self.rules = {
@@ -38,8 +91,15 @@ class FOLReasoning:
             "EG": lambda p: Exists([self.x], p(self.x) if callable(p) else p),  # Existential Generalization
             "UI": lambda p: ForAll([self.x], p(self.x) if callable(p) else p),  # Universal Instantiation
         }
+        # Rule templates and atoms drawn by _random_premise, built once
+        self._templates = [(rule_name, rule_func, rule_func.__code__.co_argcount) for rule_name, rule_func in self.rules.items()]
+        self._atoms = [f(self.x) for f in (self.P, self.Q, self.R, self.S, self.T, self.U)]
 
-    def generate_premises(self, steps, chain_count, derive_count):
+        self.signature = Signature(ctx=ctx, **signature) if isinstance(signature, dict) else signature
+        if self.signature is not None:
+            self._signature_templates = self._check_templates()
+
+    def generate_premises(self, steps, chain_count, derive_count, depth=None):
         """
         Generate a random set of premises, including derived premises created by chaining existing ones.
 
@@ -47,9 +107,23 @@ class FOLReasoning:
             steps (int): Total number of premises to generate.
             chain_count (int): Number of premises that should be logically chained. chain_count <= steps.
             derive_count (int): Number of derived premises to create by chaining existing premises.
+            depth (int): If given, the premises contain a reasoning chain of exactly this many
+                inference steps instead (derive_count is ignored): the original premises are
+                those of the chain, and the derived premises are its conclusions in order,
+                ending with a conclusion of minimal derivation depth `depth` (1 to 6).
 
         Returns:
-            dict: A dictionary containing lists of original, derived, and unrelated premises.
+            dict: A dictionary containing lists of original, derived, and unrelated premises,
+            as Premise records if the reasoner is compact. With a depth, the "proofs" entry
+            gives for every derived premise the indices, in original + derived, of the
+            premises it was inferred from.
+
+        Raises:
+            ValueError: If the arguments are inconsistent, or the signature admits too few
+                distinct premises.
+            DerivationError: If the pool admits fewer than derive_count derivations, or no
+                planted chain of the requested depth is minimal and consistent.
+            BudgetExceeded: If a solver check runs out of its time or resource budget.
         """
         if chain_count > steps:
             raise ValueError("chain_count should be less than or equal to steps.")
@@ -58,86 +132,232 @@ class FOLReasoning:
         original_premises = []
         derived_premises = []
         unrelated_premises = []
-        unique_premises = set()  # Track unique premises
+        unique_premises = set()  # Canonical fingerprints of the premises, equal for AC-variants
 
-        used_variables = [self.P, self.Q, self.R, self.S, self.T, self.U]  # Use functions, not BoolRef
+        if depth is not None:
+            if self.signature is not None:
+                raise ValueError("Depth chains are not supported with a signature.")
+            if not 1 <= depth <= 6:
+                raise ValueError("depth should be between 1 and 6.")
+            return self._generate_chain(steps - chain_count, depth)
+        random_premise = self._random_premise if self.signature is None else self._signature_premise
 
         # Generate original premises
         for _ in range(steps):
-            while True:
-                rule_name, rule_func = random.choice(list(self.rules.items()))
-                vars_needed = rule_func.__code__.co_argcount
-                chosen_vars = random.sample([f(self.x) for f in used_variables], vars_needed)
-                premise = rule_func(*chosen_vars)
-
-                # Avoid tautologies and duplicates
-                if not self.is_tautology(premise) and str(premise) not in unique_premises:
-                    original_premises.append((rule_name, premise))
-                    unique_premises.add(str(premise))
-                    break
-
-        # Generate derived premises using Z3
+            original_premises.append(random_premise("original", unique_premises))
+
+        # Generate derived premises by chaining two premises of the pool. The entailment
+        # index holds every valid, non-tautological derivation, so each one is drawn in
+        # bounded time and a DerivationError is raised when none is left. Large pools keep
+        # their pairs implicit instead of listing all of them.
+        index = EntailmentIndex(self, original_premises, implicit=self.signature is not None)
         for _ in range(derive_count):
-            while True:
-                # Randomly select two premises to chain
-                premise1 = random.choice(original_premises + derived_premises)
-                premise2 = random.choice(original_premises + derived_premises)
-
-                # Use Z3 to derive a new premise
-                solver = Solver()
-                solver.add(premise1[1])  # Add the first premise
-                solver.add(premise2[1])  # Add the second premise
-
-                # Attempt to derive a new logical conclusion
-                derived_expr = Implies(premise1[1], premise2[1])  # Example: Derive an implication
-                solver.push()
-                solver.add(Not(derived_expr))  # Check if the derived expression is valid
-                if solver.check() == unsat and not self.is_tautology(derived_expr) and str(derived_expr) not in unique_premises:
-                    # If unsatisfiable, the derived expression is valid
-                    derived_rule = f"Derived({premise1[0]} → {premise2[0]})"
-                    derived_premises.append((derived_rule, derived_expr))
-                    unique_premises.add(str(derived_expr))
-                    solver.pop()
-                    break
-                solver.pop()
+            i, j, derived_expr = index.sample(unique_premises)
+            premise1, premise2 = index.premises[i], index.premises[j]
+            derived_rule = f"Derived({premise1[0]} → {premise2[0]})"
+            derived_premises.append((derived_rule, derived_expr))
+            unique_premises.add(canonical_hash(derived_expr))
+            index.add((derived_rule, derived_expr))
 
         # Generate unrelated premises for confusion
         for _ in range(steps - chain_count):
-            while True:
-                rule_name, rule_func = random.choice(list(self.rules.items()))
-                vars_needed = rule_func.__code__.co_argcount
-                chosen_vars = random.sample([f(self.x) for f in used_variables], vars_needed)
-                unrelated_premise = rule_func(*chosen_vars)
-
-                # Avoid tautologies and duplicates
-                if not self.is_tautology(unrelated_premise) and str(unrelated_premise) not in unique_premises:
-                    unrelated_premises.append((rule_name, unrelated_premise))
-                    unique_premises.add(str(unrelated_premise))
-                    break
+            unrelated_premises.append(random_premise("unrelated", unique_premises))
 
         # Shuffle all premises to mix them
         all_premises = original_premises + derived_premises + unrelated_premises
         random.shuffle(all_premises)
 
-        return {
+        premises = {
             "original": original_premises,
             "derived": derived_premises,
             "unrelated": unrelated_premises,
         }
+        if self.compact:
+            return compact_premises(premises)
+        return premises
+
+    def _random_premise(self, stage, unique_premises):
+        # Draw rule instances until one is neither a tautology nor a duplicate
+        while True:
+            rule_name, rule_func, vars_needed = random.choice(self._templates)
+            chosen_vars = random.sample(self._atoms, vars_needed)
+            premise = rule_func(*chosen_vars)
+
+            # Avoid tautologies and duplicates
+            fingerprint = canonical_hash(premise)
+            if fingerprint not in unique_premises and not self.is_tautology(premise, stage=stage, rule=rule_name):
+                unique_premises.add(fingerprint)
+                return rule_name, premise
+            self.profiler.count_retry(stage, rule_name)
 
-    def is_tautology(self, expr):
+    def _check_templates(self):
+        # Keep the rule templates that are not tautologies. Distinct ground atoms of
+        # uninterpreted predicates are independent, so a template instantiated with distinct
+        # atoms is a tautology exactly when the template is: one check per template replaces
+        # one per premise. The quantified rules bind a single atom and are never valid.
+        rng = random.Random(0)  # Keep the premise stream independent of the templates
+        templates = []
+        for rule_name, rule_func, vars_needed in self._templates:
+            if rule_name in ("EG", "UI") or not self.is_tautology(
+                    rule_func(*self.signature.random_atoms(vars_needed, rng)), stage="templates", rule=rule_name):
+                templates.append((rule_name, rule_func, vars_needed))
+        return templates
+
+    def _signature_premise(self, stage, unique_premises):
+        # Draw instances of the non-tautological templates over distinct atoms of the
+        # signature until one is not a duplicate: no validity query per premise. A small
+        # signature runs out of distinct premises, so the number of draws is bounded.
+        for _ in range(MAX_SIGNATURE_ATTEMPTS):
+            rule_name, rule_func, vars_needed = random.choice(self._signature_templates)
+            if rule_name in ("EG", "UI"):
+                variable, atom = self.signature.random_open_atom()
+                premise = (Exists if rule_name == "EG" else ForAll)([variable], atom)
+            else:
+                premise = rule_func(*self.signature.random_atoms(vars_needed))
+
+            fingerprint = canonical_hash(premise)
+            if fingerprint not in unique_premises:
+                unique_premises.add(fingerprint)
+                return rule_name, premise
+            self.profiler.count_retry(stage, rule_name)
+        raise ValueError(f"No new premise over the signature in {MAX_SIGNATURE_ATTEMPTS} draws: it admits too few "
+                         f"distinct premises for {len(unique_premises)} or more. Use more predicates or constants.")
+
+    def _plant_chain(self, depth):
+        # A literal l0 (or ForAll x l0, instantiated by UI) followed by one MP, MT or DS step
+        # per literal, each over a new predicate: l_k → l_k+1, ¬l_k+1 → ¬l_k or Or(¬l_k, l_k+1)
+        used_variables = [self.P, self.Q, self.R, self.S, self.T, self.U]
+        # The UI step needs no predicate of its own, so the deepest chains are universal
+        universal = random.random() < 0.5 or depth == len(used_variables)
+        num_literals = depth if universal else depth + 1
+        literals = [atom if random.random() < 0.5 else Not(atom)
+                    for atom in (f(self.x) for f in random.sample(used_variables, num_literals))]
+
+        chain = [("UI", self.rules["UI"](literals[0])) if universal else ("Premise", literals[0])]
+        for current, following in zip(literals, literals[1:]):
+            rule_name = random.choice(["MP", "MT", "DS"])
+            if rule_name == "MP":
+                chain.append((rule_name, Implies(current, following)))
+            elif rule_name == "MT":
+                chain.append((rule_name, Implies(negate(following), negate(current))))
+            else:
+                chain.append((rule_name, Or(negate(current), following)))
+        return chain, literals[-1]
+
+    def _generate_chain(self, unrelated_count, depth):
+        # Plant a chain of the requested depth among unrelated premises and saturate the whole
+        # set: the chain is kept when no combination of premises reaches its conclusion in
+        # fewer steps or derives a contradiction, and the derivation DAG gives the
+        # ground-truth proof
+        for _ in range(MAX_CHAIN_ATTEMPTS):
+            chain, conclusion = self._plant_chain(depth)
+            unique_premises = {canonical_hash(expr) for _, expr in chain}
+            unrelated = [self._random_premise("unrelated", unique_premises) for _ in range(unrelated_count)]
+            pool = chain + unrelated
+
+            chainer = ForwardChainer(constants=[self.x], max_depth=depth)
+            for _, expr in pool:
+                chainer.add_premise(expr)
+            chainer.saturate()
+            target = chainer.index(conclusion)
+            if target is not None and chainer.facts[target].depth == depth and chainer.is_consistent():
+                break
+            self.profiler.count_retry("chain", f"depth {depth}")
+        else:
+            raise DerivationError(f"No minimal, consistent chain of depth {depth} in {MAX_CHAIN_ATTEMPTS} attempts.")
+
+        derivation = chainer.derivation(target)
+        used = [node for node in derivation if not chainer.facts[node].parents]
+        steps = [node for node in derivation if chainer.facts[node].parents]
+        positions = {node: position for position, node in enumerate(used + steps)}
+
+        original_premises = [pool[node] for node in used]
+        unrelated_premises = [premise for node, premise in enumerate(pool) if node not in positions]
+        derived_premises = []
+        proofs = []
+        for node in steps:
+            fact = chainer.facts[node]
+            derived_premises.append((f"Derived({fact.rule})", fact.expr))
+            proofs.append([positions[parent] for parent in fact.parents])
+
+        premises = {
+            "original": original_premises,
+            "derived": derived_premises,
+            "unrelated": unrelated_premises,
+        }
+        if self.compact:
+            premises = compact_premises(premises)
+        premises["proofs"] = proofs
+        return premises
+
+    def is_tautology(self, expr, stage="query", rule=None):
         """
         Check if a given expression is a tautology.
 
+        Results are cached. On a miss, uses the bitset engine when the expression is in the
+        propositional fragment, the monadic engine when it is in the monadic fragment, and
+        falls back to Z3 otherwise.
+
         Args:
             expr (z3.ExprRef): The expression to check.
+            stage (str): Pipeline stage the query is attributed to by the profiler.
+            rule (str): Rule name the query is attributed to by the profiler.
 
         Returns:
             bool: True if the expression is a tautology, False otherwise.
         """
-        solver = Solver()
-        solver.add(Not(expr))  # Check if the negation of the expression is satisfiable
-        return solver.check() == unsat
+        return self._validity_query("is_tautology", tautology_key(expr), [], expr, stage, rule)
+
+    def entails(self, premises, conclusion, stage="query", rule=None):
+        """
+        Check if a list of premises entails a conclusion.
+
+        Args:
+            premises (list): The premise expressions.
+            conclusion (z3.ExprRef): The expression to derive.
+            stage (str): Pipeline stage the query is attributed to by the profiler.
+            rule (str): Rule name the query is attributed to by the profiler.
+
+        Returns:
+            bool: True if every model of the premises satisfies the conclusion, False otherwise.
+        """
+        return self._validity_query("entails", entailment_key(premises, conclusion), premises, conclusion, stage, rule)
+
+    def _validity_query(self, query, key, premises, conclusion, stage, rule):
+        start = time.perf_counter()
+        engine = "cache"
+        result = self.cache.get(key)
+        if result is None:
+            if self.truth_table:
+                engine = "truth_table"
+                result = self.truth_table.entails(premises, conclusion)
+            if result is None and self.monadic:
+                engine = "monadic"
+                result = self.monadic.entails(premises, conclusion)
+            if result is None or self._sample_cross_check():
+                z3_result = self._z3_entails(premises, conclusion, stage, rule)
+                self._check_agreement(query, engine, result, z3_result, conclusion)
+                engine = "z3"
+                result = z3_result
+            self.cache.put(key, result)
+        self.profiler.record(stage, rule, engine, time.perf_counter() - start)
+        return result
+
+    def _z3_entails(self, premises, conclusion, stage, rule):
+        solver = self.profiler.new_solver(conclusion.ctx)
+        solver.add(*premises)
+        solver.add(Not(conclusion))  # Check if the negation of the conclusion is satisfiable
+        return self.profiler.check(solver, stage=stage, rule=rule) == unsat
+
+    def _sample_cross_check(self):
+        if self.cross_check >= 1:
+            return True
+        return self.cross_check > 0 and self._cross_check_random.random() < self.cross_check
+
+    @staticmethod
+    def _check_agreement(query, engine, result, z3_result, expr):
+        if result is not None and result != z3_result:
+            raise RuntimeError(f"{query} disagrees with Z3 on {expr}: {engine}={result}, z3={z3_result}")
 
     def display_premises(self, premises):
         """
@@ -0,0 +1,389 @@
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from z3 import Context
+
+from .reasoning import FOLReasoning
+from .bulk import generate_sample
+from .cache import ValidityCache
+from .profiling import SolverProfiler, BudgetExceeded
+from .entailment import DerivationError
+
+logger = logging.getLogger(__name__)
+
+# Parameters of a request and their defaults
+DEFAULT_PARAMETERS = {"steps": 3, "chain_count": 1, "derive_count": 2}
+
+
+class Percentiles:
+    """
+    Keep the most recent values of a metric (e.g. request latencies) and report their percentiles.
+    """
+
+    def __init__(self, window=10000):
+        """
+        Args:
+            window (int): Number of most recent values the percentiles are computed over.
+        """
+        self.values = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, value):
+        self.values.append(value)
+        self.count += 1
+
+    def summary(self, fractions=(0.5, 0.9, 0.99)):
+        """
+        Return the number of recorded values and their percentiles over the window.
+        """
+        ordered = sorted(self.values)
+        summary = {"count": self.count}
+        for fraction in fractions:
+            summary[f"p{round(fraction * 100)}"] = ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+        return summary
+
+
+class _Worker(threading.local):
+    # State of one pool thread: a dedicated Z3 context and a reasoner built in it, so the
+    # threads never share Z3 objects and the solver calls run in parallel without the GIL
+    reasoner = None
+
+
+class GenerationService:
+    """
+    A long-running question generator serving JSONL requests.
+
+    Requests are queued on the event loop; a batcher groups up to `batch_size` of them and
+    hands every batch to a thread pool whose threads each own a z3.Context and a pre-built
+    FOLReasoning. At most one batch per thread is in flight and the queue is bounded, so a
+    client that sends faster than the pool can generate is slowed down (backpressure)
+    instead of filling the memory.
+
+    A request is a JSON object with an optional "id" and the parameters "steps",
+    "chain_count" and "derive_count" of generate_premises; the response carries the same
+    "id" and the record of build_record, or an "error". A request {"op": "metrics"}
+    returns the latency percentiles of the queue wait, the generation and the whole request.
+    """
+
+    def __init__(self, workers=4, batch_size=8, batch_wait=0.005, max_pending=256,
+                 cache_path=None, timeout=None, rlimit=None, warmup=True):
+        """
+        Args:
+            workers (int): Number of generation threads, each with its own Z3 context.
+            batch_size (int): Maximum number of requests handed to a thread at once.
+            batch_wait (float): Seconds the batcher waits for more requests before sending
+                an incomplete batch.
+            max_pending (int): Maximum number of queued requests before submitters block.
+            cache_path (str): Optional SQLite file of the validity cache of every thread.
+            timeout (int): Optional timeout of each solver check, in milliseconds.
+            rlimit (int): Optional resource limit of each solver check.
+            warmup (bool): If True, every thread generates one sample when it starts, so the
+                first requests do not pay for the solver and cache set-up.
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_pending = max_pending
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.rlimit = rlimit
+        self.warmup = warmup
+
+        self._local = _Worker()
+        self._executor = None
+        self._queue = None
+        self._slots = None
+        self._batcher = None
+        self._batches = set()
+        self.latency = {"queue": Percentiles(), "generation": Percentiles(), "total": Percentiles()}  # Milliseconds
+        self.batch_sizes = Percentiles()
+        self.errors = 0
+
+    def _init_thread(self):
+        ctx = Context()
+        cache = ValidityCache(path=self.cache_path)
+        profiler = SolverProfiler(timeout=self.timeout, rlimit=self.rlimit)
+        self._local.reasoner = FOLReasoning(cache=cache, profiler=profiler, ctx=ctx)
+        if self.warmup:
+            generate_sample(self._local.reasoner, **DEFAULT_PARAMETERS)
+
+    def _run_batch(self, batch):
+        # Runs in a pool thread: generate every request of the batch with the thread's reasoner
+        results = []
+        for parameters in batch:
+            start = time.perf_counter()
+            try:
+                results.append((generate_sample(self._local.reasoner, **parameters), None, time.perf_counter() - start))
+            except (BudgetExceeded, DerivationError, ValueError) as exc:
+                results.append((None, str(exc), time.perf_counter() - start))
+        return results
+
+    async def _on_every_thread(self, function):
+        # Run function once on each pool thread: a barrier keeps every task on its own
+        # thread. A task that fails breaks the barrier, so the others do not wait forever.
+        loop = asyncio.get_running_loop()
+        barrier = threading.Barrier(self.workers)
+
+        def run():
+            try:
+                function()
+            except BaseException:
+                barrier.abort()
+                raise
+            barrier.wait()
+
+        results = await asyncio.gather(*(loop.run_in_executor(self._executor, run) for _ in range(self.workers)),
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # Report the failure itself rather than the broken barrier of the other threads
+            raise next((error for error in errors if not isinstance(error, threading.BrokenBarrierError)), errors[0])
+
+    def _close_thread(self):
+        # Runs in a pool thread: the SQLite connection of a cache may only be used by its thread
+        if self._local.reasoner is not None:
+            self._local.reasoner.cache.close()
+            self._local.reasoner = None
+
+    async def start(self):
+        """
+        Start the thread pool (building and warming up one reasoner per thread) and the batcher.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fol-worker")
+        try:
+            await self._on_every_thread(self._init_thread)
+        except BaseException:
+            await self._on_every_thread(self._close_thread)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            raise
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        """
+        Finish the batches in flight, close the caches of the threads (writing their pending
+        results) and shut the thread pool down.
+        """
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+        if self._batches:
+            await asyncio.gather(*self._batches)
+        if self._executor is not None:
+            await self._on_every_thread(self._close_thread)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def enqueue(self, parameters):
+        """
+        Queue a generation request, waiting while the queue is full.
+
+        Args:
+            parameters (dict): Keyword arguments of generate_sample (steps, chain_count, derive_count).
+
+        Returns:
+            asyncio.Future: Resolves to the generated record, or raises RuntimeError if the
+            generation failed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        # Blocks while the queue is full: this is the backpressure on the submitters
+        await self._queue.put((parameters, future, time.perf_counter()))
+        return future
+
+    async def submit(self, parameters):
+        """
+        Queue a generation request and wait for its record.
+
+        Returns:
+            dict: The generated record.
+
+        Raises:
+            RuntimeError: If the generation failed.
+        """
+        return await (await self.enqueue(parameters))
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free thread first, so requests stay queued (and bounded) meanwhile
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), max(0.0, deadline - loop.time())))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        dispatched = time.perf_counter()
+        self.batch_sizes.record(len(batch))
+        try:
+            results = await loop.run_in_executor(self._executor, self._run_batch, [parameters for parameters, _, _ in batch])
+        except Exception as exc:  # Keep serving: fail the requests of the batch only
+            logger.exception("Batch of %d requests failed", len(batch))
+            results = [(None, str(exc), 0.0)] * len(batch)
+        finally:
+            self._slots.release()
+
+        for (_, future, queued), (record, error, elapsed) in zip(batch, results):
+            self.latency["queue"].record((dispatched - queued) * 1e3)
+            self.latency["generation"].record(elapsed * 1e3)
+            self.latency["total"].record((time.perf_counter() - queued) * 1e3)
+            if future.cancelled():
+                continue
+            if error is not None:
+                self.errors += 1
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(record)
+
+    def metrics(self):
+        """
+        Return the latency percentiles (milliseconds), the batch size percentiles and the counters.
+        """
+        return {
+            "latency_ms": {name: percentiles.summary() for name, percentiles in self.latency.items()},
+            "batch_size": self.batch_sizes.summary(),
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "errors": self.errors,
+            "workers": self.workers,
+        }
+
+    def parse(self, line):
+        """
+        Parse one JSONL request.
+
+        Args:
+            line (str): The request, a JSON object.
+
+        Returns:
+            tuple: The response under construction, and the parameters of generate_sample, or
+            None if the request is answered without generating (metrics or an error).
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object.")
+        except ValueError as exc:
+            return {"id": None, "error": f"Invalid request: {exc}"}, None
+
+        response = {"id": request.get("id")}
+        if request.get("op") == "metrics":
+            response["metrics"] = self.metrics()
+            return response, None
+        try:
+            parameters = {name: int(request.get(name, default)) for name, default in DEFAULT_PARAMETERS.items()}
+            if parameters["chain_count"] > parameters["steps"]:
+                raise ValueError("chain_count should be less than or equal to steps.")
+        except (TypeError, ValueError) as exc:
+            response["error"] = str(exc)
+            return response, None
+        return response, parameters
+
+    async def handle(self, line):
+        """
+        Answer one JSONL request.
+
+        Returns:
+            dict: The response, with the record or an error.
+        """
+        response, parameters = self.parse(line)
+        if parameters is not None:
+            try:
+                response["record"] = await self.submit(parameters)
+            except RuntimeError as exc:
+                response["error"] = str(exc)
+        return response
+
+    async def serve_stream(self, reader, writer):
+        """
+        Serve JSONL requests from a stream until it ends, writing responses as they complete.
+
+        Responses may come out of order; clients match them by "id". Requests are queued in
+        the order they are read, and reading stops while the queue is full.
+        """
+        pending = set()
+        lock = asyncio.Lock()
+
+        async def respond(response, future):
+            if future is not None:
+                try:
+                    response["record"] = await future
+                except RuntimeError as exc:
+                    response["error"] = str(exc)
+            async with lock:
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            response, parameters = self.parse(line.decode("utf-8"))
+            future = await self.enqueue(parameters) if parameters is not None else None
+            task = asyncio.create_task(respond(response, future))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+
+class _StdinReader:
+    # stdin may be a file or a terminal, which the event loop cannot watch: read it in a thread
+    async def readline(self):
+        return await asyncio.get_running_loop().run_in_executor(None, sys.stdin.buffer.readline)
+
+
+class _StdoutWriter:
+    def write(self, data):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    async def drain(self):
+        pass
+
+
+async def serve(service, host=None, port=None):
+    """
+    Run a service over stdin/stdout, or over TCP connections when a port is given.
+
+    Args:
+        service (GenerationService): The service, not started yet.
+        host (str): Address to listen on (defaults to localhost).
+        port (int): Optional TCP port; every connection is a JSONL stream.
+    """
+    await service.start()
+    try:
+        if port is None:
+            await service.serve_stream(_StdinReader(), _StdoutWriter())
+        else:
+            async def connection(reader, writer):
+                try:
+                    await service.serve_stream(reader, writer)
+                finally:
+                    writer.close()
+
+            server = await asyncio.start_server(connection, host or "127.0.0.1", port)
+            logger.info("Serving on %s", ", ".join(str(sock.getsockname()) for sock in server.sockets))
+            async with server:
+                await server.serve_forever()
+    finally:
+        await service.stop()
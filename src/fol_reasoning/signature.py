@@ -0,0 +1,102 @@
+import random
+from math import prod
+
+from z3 import *
+
+
+class Signature:
+    """
+    A configurable first-order signature: sorts, constants and variables per sort, and
+    predicates of any arity over them.
+
+    Predicate k is named P<k>, takes arities[k % len(arities)] arguments and its argument
+    at position i ranges over sort (k + i) % num_sorts. Sort s is declared as D<s> (the
+    integers when there is a single sort, as in FOLReasoning) with constants <l>0, <l>1, ...
+    and the bound variable x<s>, where <l> is the s-th lowercase letter.
+
+    Atoms are drawn at random instead of enumerated, so the number of ground atoms
+    (predicates times constant tuples) can be far larger than any premise set; the atoms
+    drawn so far are kept, so each one is only built once.
+    """
+
+    def __init__(self, num_predicates=6, arities=(1,), num_sorts=1, constants_per_sort=1, ctx=None):
+        """
+        Args:
+            num_predicates (int): Number of predicates.
+            arities (tuple): Arities assigned to the predicates in turn (each at least 1).
+            num_sorts (int): Number of sorts (at most 26).
+            constants_per_sort (int): Number of constants of every sort.
+            ctx (z3.Context): Context of the declarations (defaults to the main context).
+
+        Raises:
+            ValueError: If the signature has fewer than four ground atoms, the most any
+                rule template uses.
+        """
+        if num_predicates < 1 or constants_per_sort < 1 or not 1 <= num_sorts <= 26:
+            raise ValueError("A signature needs at least one predicate, sort and constant per sort, and at most 26 sorts.")
+        if not arities or min(arities) < 1:
+            raise ValueError("Arities should be at least 1.")
+        self.ctx = ctx
+        if num_sorts == 1:
+            self.sorts = [IntSort(ctx)]
+        else:
+            self.sorts = [DeclareSort(f"D{s}", ctx) for s in range(num_sorts)]
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        self.constants = [[Const(f"{letters[s]}{k}", sort) for k in range(constants_per_sort)]
+                          for s, sort in enumerate(self.sorts)]
+        self.variables = [Const(f"x{s}", sort) for s, sort in enumerate(self.sorts)]
+
+        self.predicates = []
+        self.argument_sorts = []  # Per predicate: sort index of every argument
+        for k in range(num_predicates):
+            argument_sorts = [(k + i) % num_sorts for i in range(arities[k % len(arities)])]
+            domain = [self.sorts[s] for s in argument_sorts]
+            self.predicates.append(Function(f"P{k}", *domain, BoolSort(ctx)))
+            self.argument_sorts.append(argument_sorts)
+
+        self._atoms = {}  # (predicate index, constant indices) -> ground atom
+        self.num_atoms = sum(prod(len(self.constants[s]) for s in sorts) for sorts in self.argument_sorts)
+        if self.num_atoms < 4:
+            raise ValueError(f"The signature has {self.num_atoms} ground atoms; rule templates need up to 4.")
+
+    def random_atoms(self, count, rng=random):
+        """
+        Draw distinct ground atoms.
+
+        Args:
+            count (int): Number of atoms (at most 4 for the rule templates).
+            rng: Random generator (the `random` module or a `random.Random` instance).
+
+        Returns:
+            list: The atoms, e.g. [P3(a0, b1), P0(a2)].
+        """
+        keys = []
+        while len(keys) < count:
+            k = rng.randrange(len(self.predicates))
+            key = (k, tuple(rng.randrange(len(self.constants[s])) for s in self.argument_sorts[k]))
+            if key not in keys:
+                keys.append(key)
+        return [self._atom(k, args) for k, args in keys]
+
+    def _atom(self, k, args):
+        atom = self._atoms.get((k, args))
+        if atom is None:
+            atom = self._atoms[(k, args)] = self.predicates[k](
+                *(self.constants[s][c] for s, c in zip(self.argument_sorts[k], args)))
+        return atom
+
+    def random_open_atom(self, rng=random):
+        """
+        Draw an atom with the variable of its sort at one argument position and constants
+        elsewhere, to be bound by a quantifier.
+
+        Returns:
+            tuple: The variable and the atom, e.g. (x0, P1(x0, b0)).
+        """
+        k = rng.randrange(len(self.predicates))
+        sorts = self.argument_sorts[k]
+        position = rng.randrange(len(sorts))
+        variable = self.variables[sorts[position]]
+        args = [variable if i == position else self.constants[s][rng.randrange(len(self.constants[s]))]
+                for i, s in enumerate(sorts)]
+        return variable, self.predicates[k](*args)
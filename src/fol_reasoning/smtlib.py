@@ -0,0 +1,389 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .lazy import z3
+
+# What a script asks for after an unsat answer: the names of the assertions in an unsat
+# core, or the proof term
+MODES = {
+    "core": ("(set-option :produce-unsat-cores true)", "(get-unsat-core)"),
+    "proof": ("(set-option :produce-proofs true)", "(get-proof)"),
+}
+
+# The two queries of a conclusion: premises with its negation, and premises with it
+QUERIES = ("entail", "refute")
+
+# Statuses that only depend on the script, and so are cached
+DEFINITIVE = ("sat", "unsat")
+
+
+class Problem:
+    """
+    A hand-written problem: premises over any Z3 signature (declared sorts, functions of
+    any arity, quantifiers) and the conclusions to check against them.
+    """
+
+    __slots__ = ("name", "premises", "conclusions")
+
+    def __init__(self, name, premises, conclusions):
+        self.name = name
+        self.premises = list(premises)
+        self.conclusions = list(conclusions)
+
+    def __repr__(self):
+        return f"Problem({self.name!r}, {len(self.premises)} premises, {len(self.conclusions)} conclusions)"
+
+
+def _declarations(exprs):
+    # Uninterpreted sorts and declarations of the formulas, in order of first appearance
+    sorts, decls = {}, {}
+    seen = set()
+    stack = list(reversed(exprs))
+    while stack:
+        expr = stack.pop()
+        if expr.get_id() in seen:
+            continue
+        seen.add(expr.get_id())
+        if z3.is_quantifier(expr):
+            for i in range(expr.num_vars()):
+                sort = expr.var_sort(i)
+                if sort.kind() == z3.Z3_UNINTERPRETED_SORT:
+                    sorts.setdefault(sort.name(), sort)
+            stack.append(expr.body())
+        elif z3.is_app(expr):
+            decl = expr.decl()
+            if decl.kind() == z3.Z3_OP_UNINTERPRETED:
+                for sort in [decl.range()] + [decl.domain(i) for i in range(decl.arity())]:
+                    if sort.kind() == z3.Z3_UNINTERPRETED_SORT:
+                        sorts.setdefault(sort.name(), sort)
+                decls.setdefault(decl.name(), decl)
+            stack.extend(reversed(expr.children()))
+    return ([f"(declare-sort {sort.sexpr()} 0)" for sort in sorts.values()]
+            + [decl.sexpr() for decl in decls.values()])
+
+
+def to_smt2(premises, goal, mode="core"):
+    """
+    Write an SMT-LIB2 script checking the premises together with a goal formula.
+
+    Premises are named p0, p1, ... and the goal "goal", so an unsat core lists the
+    indices of the premises it uses. The script holds no timeout or other solver option
+    beyond the one the mode needs, so its content hash only depends on the problem.
+
+    Args:
+        premises (list): Premise expressions.
+        goal (z3.BoolRef): The formula asserted with them (the negated conclusion to check
+            an entailment).
+        mode (str): "core" to print an unsat core after an unsat answer, "proof" for a proof.
+
+    Returns:
+        str: The script.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    option, command = MODES[mode]
+    lines = [option]
+    lines += _declarations(list(premises) + [goal])
+    lines += [f"(assert (! {premise.sexpr()} :named p{i}))" for i, premise in enumerate(premises)]
+    lines += [f"(assert (! {goal.sexpr()} :named goal))", "(check-sat)", command]
+    return "\n".join(lines) + "\n"
+
+
+def content_hash(script):
+    """
+    Return the cache key of a script: a digest of its text.
+    """
+    return hashlib.blake2b(script.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _file_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(name))
+
+
+def export_problems(problems, output_dir, mode="core"):
+    """
+    Compile problems to SMT-LIB2 files, two per conclusion.
+
+    For conclusion k of a problem, `<name>-c<k>-entail.smt2` asserts the premises and the
+    negated conclusion (unsat: the conclusion follows) and `<name>-c<k>-refute.smt2` the
+    premises and the conclusion (unsat: its negation follows). A manifest.jsonl lists
+    every file with its problem, conclusion and query.
+
+    Args:
+        problems (list): Problem instances.
+        output_dir (str): Directory the files are written to.
+        mode (str): "core" or "proof" (see to_smt2).
+
+    Returns:
+        list: One job per file: a dict with "problem", "conclusion", "query" and "path".
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for problem in problems:
+        for k, conclusion in enumerate(problem.conclusions):
+            for query, goal in zip(QUERIES, (z3.Not(conclusion), conclusion)):
+                path = os.path.join(output_dir, f"{_file_name(problem.name)}-c{k}-{query}.smt2")
+                script = to_smt2(problem.premises, goal, mode)
+                # Rewrite a file only when it changed, so its modification time stays meaningful
+                if not os.path.exists(path) or open(path, encoding="utf-8").read() != script:
+                    with open(path, "w", encoding="utf-8") as file:
+                        file.write(script)
+                jobs.append({"problem": problem.name, "conclusion": k, "query": query, "path": path})
+
+    with open(os.path.join(output_dir, "manifest.jsonl"), "w", encoding="utf-8") as file:
+        for job in jobs:
+            file.write(json.dumps(job, ensure_ascii=False) + "\n")
+    return jobs
+
+
+def parse_output(output):
+    """
+    Parse the output of a solver on a script written by to_smt2.
+
+    Args:
+        output (str): Standard output of the solver.
+
+    Returns:
+        dict: The "status" (sat, unsat, unknown or error), and after an unsat answer the
+        "core" (premise indices, and whether the goal is in it) or the "proof" text.
+    """
+    lines = output.strip().splitlines()
+    status = lines[0].strip() if lines else ""
+    if status not in ("sat", "unsat", "unknown"):
+        return {"status": "error", "error": output.strip()}
+    result = {"status": status}
+    if status == "unsat" and len(lines) > 1:
+        rest = "\n".join(lines[1:]).strip()
+        if rest.startswith("(error"):
+            result["error"] = rest
+        elif re.fullmatch(r"\(\s*([\w|]+\s*)*\)", rest):
+            names = rest.strip("()").split()
+            result["core"] = sorted(int(name[1:]) for name in names if re.fullmatch(r"p\d+", name))
+            result["uses_goal"] = "goal" in names
+        else:
+            result["proof"] = rest
+    return result
+
+
+def label(entail, refute):
+    """
+    Combine the statuses of the two queries of a conclusion into a label.
+
+    Returns:
+        str: "True" if the conclusion follows, "False" if its negation does, "Uncertain" if
+        neither does, "Inconsistent" if the premises are contradictory, or "Unknown" if a
+        query was not decided.
+    """
+    if entail == "unsat" and refute == "unsat":
+        return "Inconsistent"
+    if entail == "unsat":
+        return "True"
+    if refute == "unsat":
+        return "False"
+    if entail == "sat" and refute == "sat":
+        return "Uncertain"
+    return "Unknown"
+
+
+class ResultCache:
+    """
+    Solver results by script content hash, optionally persisted to SQLite.
+
+    Only sat and unsat answers are stored: they do not depend on the time budget, while
+    unknown, timeout and error results are solved again on the next run.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Optional path of a SQLite database used to persist results.
+        """
+        self._entries = {}
+        self._lock = threading.Lock()  # The checker looks results up from its pool threads
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS smt_results (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+            self._db.commit()
+
+    def get(self, key):
+        """
+        Look up a cached result.
+
+        Returns:
+            dict: The result, or None on a miss.
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None and self._db is not None:
+                row = self._db.execute("SELECT result FROM smt_results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    result = self._entries[key] = json.loads(row[0])
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key, result):
+        """
+        Store a sat or unsat result; other results are ignored.
+        """
+        if result["status"] not in DEFINITIVE:
+            return
+        with self._lock:
+            self._entries[key] = dict(result)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO smt_results (key, result) VALUES (?, ?)",
+                                 (key, json.dumps(result, ensure_ascii=False)))
+
+    def commit(self):
+        if self._db is not None:
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def default_command():
+    """
+    Return the solver command: the z3 executable if it is on the PATH, else this module
+    run with the current interpreter, which evaluates the script with the Z3 bindings.
+    """
+    if shutil.which("z3"):
+        return ["z3", "-smt2"]
+    return [sys.executable, "-m", "fol_reasoning.smtlib"]
+
+
+class BatchChecker:
+    """
+    Check SMT-LIB2 scripts in bulk with a pool of solver subprocesses.
+
+    Every script runs in its own process with a soft timeout passed to the solver (it then
+    answers unknown) and a hard one after which the process is killed. Results are cached
+    by content hash, so re-running a benchmark only solves the scripts that changed.
+    """
+
+    def __init__(self, workers=None, timeout=10000, cache=None, command=None):
+        """
+        Args:
+            workers (int): Number of solver processes running at once (defaults to the
+                number of CPUs).
+            timeout (int): Timeout of each script, in milliseconds.
+            cache (ResultCache): Cache of the results. Defaults to a fresh in-memory cache.
+            command (list): Solver command line, the script path is appended (defaults to
+                default_command()). The timeout is passed as "-t:<ms>" to z3 and through the
+                environment to the module fallback.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cache = cache if cache is not None else ResultCache()
+        self.command = list(command) if command is not None else default_command()
+
+    def _run(self, path):
+        command = list(self.command)
+        env = None
+        if os.path.basename(command[0]).startswith("z3"):
+            command.append(f"-t:{self.timeout}")
+        else:
+            package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            env = dict(os.environ, FOL_SMT_TIMEOUT=str(self.timeout),
+                       PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")])))
+        try:
+            # Hard limit: the soft timeout plus a grace period for start-up and output
+            completed = subprocess.run(command + [path], capture_output=True, text=True, env=env,
+                                       timeout=self.timeout / 1000 * 1.5 + 1)
+        except subprocess.TimeoutExpired:
+            return {"status": "timeout"}
+        return parse_output(completed.stdout or completed.stderr)
+
+    def _check(self, path):
+        with open(path, encoding="utf-8") as file:
+            key = content_hash(file.read())
+        result = self.cache.get(key)
+        if result is not None:
+            result["cached"] = True
+            return result
+        result = self._run(path)
+        self.cache.put(key, result)
+        result["cached"] = False
+        return result
+
+    def check_files(self, paths):
+        """
+        Check scripts, running up to `workers` solver processes at a time.
+
+        Args:
+            paths (list): Paths of the SMT-LIB2 files.
+
+        Returns:
+            list: The result of every file, in order (see parse_output), with its "path" and
+            whether it came from the cache.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self._check, paths))
+        self.cache.commit()
+        for path, result in zip(paths, results):
+            result["path"] = path
+        return results
+
+    def check_problems(self, problems, output_dir, mode="core"):
+        """
+        Export problems to SMT-LIB2 files and label every conclusion.
+
+        Args:
+            problems (list): Problem instances.
+            output_dir (str): Directory of the SMT-LIB2 files.
+            mode (str): "core" or "proof".
+
+        Returns:
+            list: One dict per conclusion with the "problem", the "conclusion" index, its
+            "label" (see label) and the results of both queries.
+        """
+        jobs = export_problems(problems, output_dir, mode)
+        results = self.check_files([job["path"] for job in jobs])
+        conclusions = {}
+        for job, result in zip(jobs, results):
+            entry = conclusions.setdefault((job["problem"], job["conclusion"]),
+                                           {"problem": job["problem"], "conclusion": job["conclusion"]})
+            entry[job["query"]] = result
+        for entry in conclusions.values():
+            entry["label"] = label(entry["entail"]["status"], entry["refute"]["status"])
+        return list(conclusions.values())
+
+
+def main(path):
+    # Solver fallback without a z3 executable: evaluate the script with the bindings and
+    # print what z3 -smt2 would
+    timeout = os.environ.get("FOL_SMT_TIMEOUT")
+    if timeout:
+        z3.set_param("timeout", int(timeout))
+    with open(path, encoding="utf-8") as file:
+        script = file.read()
+    try:
+        output = z3.Z3_eval_smtlib2_string(z3.main_ctx().ref(), script)
+    except z3.Z3Exception as exc:
+        # A failing command (e.g. get-unsat-core after sat) raises with the output so far
+        output = exc.value.decode() if isinstance(exc.value, bytes) else str(exc.value)
+    print(output, end="")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
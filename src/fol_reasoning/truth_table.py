@@ -0,0 +1,278 @@
+from z3 import *
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the batch API
+    np = None
+
+# Number of atoms whose truth table fits in one 64-bit word
+WORD_ATOMS = 6
+
+_BOOL_CONNECTIVES = {Z3_OP_TRUE, Z3_OP_FALSE, Z3_OP_NOT, Z3_OP_AND, Z3_OP_OR, Z3_OP_IMPLIES, Z3_OP_XOR, Z3_OP_IFF}
+
+
+class OutOfFragment(Exception):
+    """
+    Raised when a formula is not a propositional combination of ground predicate atoms.
+    """
+
+
+def is_ground_atom(expr):
+    """
+    Check if an expression is a ground atom of the propositional fragment.
+
+    Atoms are applications of uninterpreted Boolean predicates whose arguments are all
+    uninterpreted constants (e.g. P(x)). Distinct atoms of this shape can take any
+    combination of truth values, so treating them as independent propositional
+    variables is sound.
+
+    Args:
+        expr (z3.ExprRef): The expression to check.
+
+    Returns:
+        bool: True if the expression is a ground atom, False otherwise.
+    """
+    return _is_ground_atom(expr.ctx_ref(), expr.as_ast())
+
+
+def _is_uninterpreted_app(ctx, ast):
+    return (Z3_get_ast_kind(ctx, ast) == Z3_APP_AST
+            and Z3_get_decl_kind(ctx, Z3_get_app_decl(ctx, ast)) == Z3_OP_UNINTERPRETED)
+
+
+def _is_bool(ctx, ast):
+    return Z3_get_sort_kind(ctx, Z3_get_sort(ctx, ast)) == Z3_BOOL_SORT
+
+
+def _is_ground_atom(ctx, ast):
+    # Works on raw AST pointers: wrapping every node in a z3.ExprRef costs more than the evaluation
+    if not _is_uninterpreted_app(ctx, ast) or not _is_bool(ctx, ast):
+        return False
+    for i in range(Z3_get_app_num_args(ctx, ast)):
+        arg = Z3_get_app_arg(ctx, ast, i)
+        if not _is_uninterpreted_app(ctx, arg) or Z3_get_app_num_args(ctx, arg) != 0:
+            return False
+    return True
+
+
+def column_masks(num_atoms):
+    """
+    Return the truth vectors of the atoms over a table of 2**num_atoms rows.
+
+    Row i assigns atom k the value of bit k of i, so the mask of atom k has bit i set
+    exactly when bit k of i is set.
+
+    Args:
+        num_atoms (int): Number of atoms in the table.
+
+    Returns:
+        tuple: The mask (as a Python int) of every atom, and the mask of all rows.
+    """
+    width = 1 << num_atoms
+    full = (1 << width) - 1
+    columns = []
+    for k in range(num_atoms):
+        block = 1 << k
+        # Repeat the pattern "block zeros, block ones" over the whole table
+        repeat = full // ((1 << (2 * block)) - 1)
+        columns.append((repeat * ((1 << block) - 1)) << block)
+    return columns, full
+
+
+class TruthTableEngine:
+    """
+    Decide validity, satisfiability and entailment of propositional formulas over ground
+    atoms by compiling them to truth vectors and combining them with bitwise operations.
+    """
+
+    def __init__(self, max_atoms=WORD_ATOMS):
+        """
+        Args:
+            max_atoms (int): Number of atoms of the truth table. Formulas are evaluated over
+                2**max_atoms rows, so the default of 6 keeps every truth vector in 64 bits.
+        """
+        self.max_atoms = max_atoms
+        self._tables = {}
+
+    def _table(self, num_atoms):
+        if num_atoms not in self._tables:
+            self._tables[num_atoms] = column_masks(num_atoms)
+        return self._tables[num_atoms]
+
+    def compile(self, exprs, atoms=None, num_atoms=None):
+        """
+        Compile formulas to truth vectors over a shared atom table.
+
+        Atoms are assigned to columns in order of first appearance, in a single pass over
+        the formulas.
+
+        Args:
+            exprs (list): Formulas to compile.
+            atoms (dict): Optional mapping from atom AST id to column, extended in place so
+                that several calls can share one table.
+            num_atoms (int): Number of columns of the table (defaults to max_atoms).
+
+        Returns:
+            tuple: The truth vector (as a Python int) of every formula, and the mask of all rows.
+
+        Raises:
+            OutOfFragment: If a formula is not in the propositional fragment or uses too many atoms.
+        """
+        num_atoms = self.max_atoms if num_atoms is None else num_atoms
+        atoms = {} if atoms is None else atoms
+        columns, full = self._table(num_atoms)
+        memo = {}
+
+        masks = []
+        for root in exprs:
+            ctx = root.ctx_ref()
+            # Iterative post-order walk over raw AST pointers, memoized on the AST id of
+            # shared subterms. The pointers stay valid while the root expression is alive.
+            stack = [(root.as_ast(), None)]
+            while stack:
+                ast, kind = stack.pop()
+                ast_id = Z3_get_ast_id(ctx, ast)
+                if kind is None:
+                    if ast_id in memo:
+                        continue
+                    if ast_id in atoms or _is_ground_atom(ctx, ast):
+                        if ast_id not in atoms:
+                            if len(atoms) >= num_atoms:
+                                raise OutOfFragment(f"More than {num_atoms} atoms.")
+                            atoms[ast_id] = len(atoms)
+                        memo[ast_id] = columns[atoms[ast_id]]
+                        continue
+                    kind = self._connective_kind(ctx, ast)
+                    stack.append((ast, kind))
+                    stack.extend((Z3_get_app_arg(ctx, ast, i), None) for i in range(Z3_get_app_num_args(ctx, ast)))
+                    continue
+
+                args = [memo[Z3_get_ast_id(ctx, Z3_get_app_arg(ctx, ast, i))] for i in range(Z3_get_app_num_args(ctx, ast))]
+                if kind == Z3_OP_TRUE:
+                    mask = full
+                elif kind == Z3_OP_FALSE:
+                    mask = 0
+                elif kind == Z3_OP_NOT:
+                    mask = full & ~args[0]
+                elif kind == Z3_OP_AND:
+                    mask = full
+                    for arg in args:
+                        mask &= arg
+                elif kind == Z3_OP_OR:
+                    mask = 0
+                    for arg in args:
+                        mask |= arg
+                elif kind == Z3_OP_IMPLIES:
+                    mask = (full & ~args[0]) | args[1]
+                elif kind == Z3_OP_XOR:
+                    mask = args[0] ^ args[1]
+                else:  # Bi-implication
+                    mask = full & ~(args[0] ^ args[1])
+                memo[ast_id] = mask
+            masks.append(memo[root.get_id()])
+        return masks, full
+
+    @staticmethod
+    def _connective_kind(ctx, ast):
+        if Z3_get_ast_kind(ctx, ast) == Z3_APP_AST and _is_bool(ctx, ast):
+            kind = Z3_get_decl_kind(ctx, Z3_get_app_decl(ctx, ast))
+            if kind in _BOOL_CONNECTIVES:
+                return kind
+            # Equality between Booleans is a bi-implication
+            if kind == Z3_OP_EQ and _is_bool(ctx, Z3_get_app_arg(ctx, ast, 0)):
+                return Z3_OP_IFF
+        # Quantifiers, bound variables and theory terms are outside the fragment
+        raise OutOfFragment("Unsupported subformula.")
+
+    def is_tautology(self, expr):
+        """
+        Check if a formula is a tautology.
+
+        Returns:
+            bool: The answer, or None if the formula is outside the fragment.
+        """
+        try:
+            (mask,), full = self.compile([expr])
+        except OutOfFragment:
+            return None
+        return mask == full
+
+    def is_satisfiable(self, expr):
+        """
+        Check if a formula is satisfiable.
+
+        Returns:
+            bool: The answer, or None if the formula is outside the fragment.
+        """
+        try:
+            (mask,), _ = self.compile([expr])
+        except OutOfFragment:
+            return None
+        return mask != 0
+
+    def entails(self, premises, conclusion):
+        """
+        Check if the premises entail the conclusion.
+
+        Returns:
+            bool: The answer, or None if a formula is outside the fragment.
+        """
+        try:
+            masks, full = self.compile(list(premises) + [conclusion])
+        except OutOfFragment:
+            return None
+        models = full
+        for mask in masks[:-1]:
+            models &= mask
+        return models & ~masks[-1] == 0
+
+    def compile_batch(self, exprs, atoms=None):
+        """
+        Compile a batch of formulas to 64-bit truth vectors over one shared atom table.
+
+        Args:
+            exprs (list): Formulas to compile.
+            atoms (dict): Optional mapping from atom AST id to column.
+
+        Returns:
+            tuple: A numpy.uint64 array with one truth vector per formula, and the mask of all rows.
+
+        Raises:
+            OutOfFragment: If a formula is outside the fragment or the batch uses more than 6 atoms.
+        """
+        if np is None:
+            raise ImportError("The batch API requires NumPy.")
+        masks, full = self.compile(exprs, atoms, num_atoms=WORD_ATOMS)
+        return np.array(masks, dtype=np.uint64), np.uint64(full)
+
+    def is_tautology_batch(self, exprs):
+        """
+        Check which formulas of a batch are tautologies.
+
+        Returns:
+            numpy.ndarray: A Boolean array with one entry per formula.
+        """
+        masks, full = self.compile_batch(exprs)
+        return masks == full
+
+    def is_satisfiable_batch(self, exprs):
+        """
+        Check which formulas of a batch are satisfiable.
+
+        Returns:
+            numpy.ndarray: A Boolean array with one entry per formula.
+        """
+        masks, _ = self.compile_batch(exprs)
+        return masks != 0
+
+    def entails_batch(self, premises, conclusions):
+        """
+        Check which conclusions of a batch are entailed by the same premises.
+
+        Returns:
+            numpy.ndarray: A Boolean array with one entry per conclusion.
+        """
+        premises = list(premises)
+        masks, full = self.compile_batch(premises + list(conclusions))
+        models = np.bitwise_and.reduce(masks[:len(premises)]) if premises else full
+        return (masks[len(premises):] & models) == models
@@ -1,36 +1,316 @@
-from z3 import *
+import functools
 import json
 
-def expr_to_fol_string(expr):
-    if is_app(expr):
-        if expr.decl().name() == '=>':
-            return f"({expr_to_fol_string(expr.arg(0))} → {expr_to_fol_string(expr.arg(1))})"
-        elif expr.decl().name() == 'and':
-            return f"({expr_to_fol_string(expr.arg(0))} ∧ {expr_to_fol_string(expr.arg(1))})"
-        elif expr.decl().name() == 'or':
-            return f"({expr_to_fol_string(expr.arg(0))} ∨ {expr_to_fol_string(expr.arg(1))})"
-        elif expr.decl().name() == 'not':
-            return f"¬{expr_to_fol_string(expr.arg(0))}"
-    return str(expr)
+from .lazy import z3
+from .premise import (OP_TRUE, OP_FALSE, OP_NOT, OP_AND, OP_OR, OP_IMPLIES, OP_IFF, OP_XOR, OP_EQ, OP_APP,
+                      OP_VAR, OP_NUM, OP_FORALL, OP_EXISTS)
 
-def save_to_json(filepath, premises, questions, answers, indices):
+# Output syntaxes of the renderer. Connectives are written with explicit parentheses,
+# quantifiers as "<quantifier><variables> <body>" wrapped as the syntax requires.
+SYNTAXES = {
+    "unicode": {
+        "not": "¬{}", "and": " ∧ ", "or": " ∨ ", "implies": " → ", "iff": " ↔ ", "xor": " ⊕ ",
+        "true": "⊤", "false": "⊥", "forall": "∀{} {}", "exists": "∃{} {}", "var_sep": ",",
+    },
+    "ascii": {
+        "not": "~{}", "and": " & ", "or": " | ", "implies": " -> ", "iff": " <-> ", "xor": " xor ",
+        "true": "true", "false": "false", "forall": "(forall {}. {})", "exists": "(exists {}. {})", "var_sep": " ",
+    },
+    "tptp": {
+        "not": "~{}", "and": " & ", "or": " | ", "implies": " => ", "iff": " <=> ", "xor": " <~> ",
+        "true": "$true", "false": "$false", "forall": "(![{}]: {})", "exists": "(?[{}]: {})", "var_sep": ",",
+    },
+}
+
+_CONNECTIVES = ("and", "or", "implies", "iff", "xor")
+
+# Interpreted symbols written infix in every syntax but TPTP, which uses its own names
+_INFIX = {
+    "eq": ("=", "="),
+    "add": ("+", "$sum"),
+    "sub": ("-", "$difference"),
+    "mul": ("*", "$product"),
+    "lt": ("<", "$less"),
+    "le": ("<=", "$lesseq"),
+    "gt": (">", "$greater"),
+    "ge": (">=", "$greatereq"),
+}
+
+# Operators of the formula store nodes (see premise.py)
+_STORE_OPERATORS = {
+    OP_TRUE: "true", OP_FALSE: "false", OP_NOT: "not", OP_AND: "and", OP_OR: "or",
+    OP_IMPLIES: "implies", OP_IFF: "iff", OP_XOR: "xor", OP_EQ: "eq",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _z3_operators():
+    # Built on first use, so that importing the renderer does not load z3
+    return {
+        z3.Z3_OP_TRUE: "true", z3.Z3_OP_FALSE: "false", z3.Z3_OP_NOT: "not",
+        z3.Z3_OP_AND: "and", z3.Z3_OP_OR: "or", z3.Z3_OP_IMPLIES: "implies", z3.Z3_OP_IFF: "iff",
+        z3.Z3_OP_XOR: "xor", z3.Z3_OP_EQ: "eq", z3.Z3_OP_ADD: "add", z3.Z3_OP_SUB: "sub",
+        z3.Z3_OP_MUL: "mul", z3.Z3_OP_LT: "lt", z3.Z3_OP_LE: "le", z3.Z3_OP_GT: "gt", z3.Z3_OP_GE: "ge",
+    }
+
+
+class FOLRenderer:
     """
-    Save premises, questions, answers, and indices to a JSON file.
+    Render Z3 formulas as FOL strings in one or more syntaxes ("unicode", "ascii", "tptp").
+
+    The AST is walked without recursion and every syntax is produced in the same traversal.
+    Rendered subterms are memoized per AST id for the lifetime of the renderer, so a
+    renderer kept for one sample renders shared subterms (e.g. the answer inside every
+    distractor) only once. The renderer keeps a reference to every rendered formula,
+    which keeps the memoized AST ids valid; use one renderer per sample.
+
+    Formulas of a FormulaStore (e.g. loaded compact premises) are rendered directly from
+    the store with render_node, without building Z3 expressions or loading z3.
+    """
+
+    def __init__(self, syntaxes=("unicode",)):
+        """
+        Args:
+            syntaxes (tuple): Output syntaxes, keys of SYNTAXES. render() returns the first one.
+        """
+        for syntax in syntaxes:
+            if syntax not in SYNTAXES:
+                raise ValueError(f"Unknown syntax: {syntax}")
+        self.syntaxes = tuple(syntaxes)
+        self._tables = [SYNTAXES[syntax] for syntax in self.syntaxes]
+        self._memo = {}
+        self._roots = []
+
+    def clear(self):
+        """
+        Forget every memoized string, e.g. before moving on to the next sample.
+        """
+        self._memo.clear()
+        self._roots.clear()
+
+    def render(self, expr):
+        """
+        Render a formula in the first syntax of the renderer.
+
+        Args:
+            expr (z3.ExprRef): The formula to render.
+
+        Returns:
+            str: The rendered formula.
+        """
+        return self._render(expr)[0]
+
+    def render_all(self, expr):
+        """
+        Render a formula in every syntax of the renderer.
+
+        Args:
+            expr (z3.ExprRef): The formula to render.
+
+        Returns:
+            dict: Mapping from syntax name to rendered formula.
+        """
+        return dict(zip(self.syntaxes, self._render(expr)))
+
+    def render_node(self, store, node):
+        """
+        Render a formula of a FormulaStore in the first syntax of the renderer.
+
+        Args:
+            store (FormulaStore): The store holding the formula.
+            node (int): Id of the formula in the store.
+
+        Returns:
+            str: The rendered formula, identical to render() on the expression it was interned from.
+        """
+        return self._render_node(store, node)[0]
+
+    def _render(self, expr):
+        ctx = expr.ctx_ref()
+        root = expr.as_ast()
+        root_key = (z3.Z3_get_ast_id(ctx, root), ())
+        if root_key in self._memo:
+            return self._memo[root_key]
+        self._roots.append(expr)
+        operators = _z3_operators()
+
+        # Explicit stack of (ast, bound variable names in scope, expanded). Subterms under
+        # binders are memoized together with the names in scope, since de Bruijn indices
+        # only get their names from the enclosing quantifiers.
+        stack = [(root, (), False)]
+        while stack:
+            ast, names, expanded = stack.pop()
+            key = (z3.Z3_get_ast_id(ctx, ast), names)
+            if key in self._memo:
+                continue
+            kind = z3.Z3_get_ast_kind(ctx, ast)
+
+            if kind == z3.Z3_QUANTIFIER_AST:
+                bound = tuple(
+                    z3.Z3_get_symbol_string(ctx, z3.Z3_get_quantifier_bound_name(ctx, ast, i))
+                    for i in range(z3.Z3_get_quantifier_num_bound(ctx, ast)))
+                body = (z3.Z3_get_quantifier_body(ctx, ast), names + bound)
+                if not expanded:
+                    stack.append((ast, names, True))
+                    stack.append((*body, False))
+                    continue
+                body_strings = self._memo[(z3.Z3_get_ast_id(ctx, body[0]), body[1])]
+                quantifier = "forall" if z3.Z3_is_quantifier_forall(ctx, ast) else "exists"
+                self._memo[key] = self._render_quantifier(quantifier, bound, body_strings)
+
+            elif kind == z3.Z3_VAR_AST:
+                name = names[-1 - z3.Z3_get_index_value(ctx, ast)]
+                self._memo[key] = tuple(self._variable(name, syntax) for syntax in self.syntaxes)
+
+            elif kind == z3.Z3_NUMERAL_AST:
+                self._memo[key] = (z3.Z3_get_numeral_string(ctx, ast),) * len(self.syntaxes)
+
+            else:
+                num_args = z3.Z3_get_app_num_args(ctx, ast)
+                children = [(z3.Z3_get_app_arg(ctx, ast, i), names) for i in range(num_args)]
+                if not expanded and children:
+                    stack.append((ast, names, True))
+                    stack.extend((*child, False) for child in children)
+                    continue
+                args = [self._memo[(z3.Z3_get_ast_id(ctx, child), child_names)] for child, child_names in children]
+                decl = z3.Z3_get_app_decl(ctx, ast)
+                operator = operators.get(z3.Z3_get_decl_kind(ctx, decl))
+                if operator == "eq" and z3.Z3_get_sort_kind(ctx, z3.Z3_get_sort(ctx, z3.Z3_get_app_arg(ctx, ast, 0))) == z3.Z3_BOOL_SORT:
+                    operator = "iff"
+                name = z3.Z3_get_symbol_string(ctx, z3.Z3_get_decl_name(ctx, decl))
+                self._memo[key] = self._render_app(operator, name, args)
+
+        return self._memo[root_key]
+
+    def _render_node(self, store, root):
+        # Same walk as _render over the nodes of a store; keys are (store id, node, names)
+        # so they never collide with the AST ids of Z3 expressions
+        store_id = id(store)
+        root_key = (store_id, root, ())
+        if root_key in self._memo:
+            return self._memo[root_key]
+        self._roots.append(store)
+
+        stack = [(root, (), False)]
+        while stack:
+            node, names, expanded = stack.pop()
+            key = (store_id, node, names)
+            if key in self._memo:
+                continue
+            op = store.op(node)
+            payload = store.payload(node)
+
+            if op in (OP_FORALL, OP_EXISTS):
+                bound = tuple(name for name, _ in payload)
+                body = (store.args(node)[0], names + bound)
+                if not expanded:
+                    stack.append((node, names, True))
+                    stack.append((*body, False))
+                    continue
+                body_strings = self._memo[(store_id, *body)]
+                self._memo[key] = self._render_quantifier("forall" if op == OP_FORALL else "exists", bound, body_strings)
+
+            elif op == OP_VAR:
+                name = names[-1 - payload[0]]
+                self._memo[key] = tuple(self._variable(name, syntax) for syntax in self.syntaxes)
+
+            elif op == OP_NUM:
+                self._memo[key] = (payload[0],) * len(self.syntaxes)
+
+            else:
+                children = [(child, names) for child in store.args(node)]
+                if not expanded and children:
+                    stack.append((node, names, True))
+                    stack.extend((*child, False) for child in children)
+                    continue
+                args = [self._memo[(store_id, *child)] for child in children]
+                name = payload[0] if op == OP_APP else None
+                self._memo[key] = self._render_app(_STORE_OPERATORS.get(op), name, args)
+
+        return self._memo[root_key]
+
+    def _render_quantifier(self, quantifier, bound, body_strings):
+        return tuple(
+            table[quantifier].format(table["var_sep"].join(self._variable(name, syntax) for name in bound), text)
+            for syntax, table, text in zip(self.syntaxes, self._tables, body_strings))
+
+    def _render_app(self, operator, name, args):
+        # operator is the name of an interpreted symbol, or None for an uninterpreted one
+        rendered = []
+        for position, (syntax, table) in enumerate(zip(self.syntaxes, self._tables)):
+            operands = [arg[position] for arg in args]
+            if operator in ("true", "false"):
+                text = table[operator]
+            elif operator == "not":
+                text = table["not"].format(operands[0])
+            elif operator in _CONNECTIVES:
+                # n-ary connectives keep all of their operands
+                text = "(" + table[operator].join(operands) + ")"
+            elif operator in _INFIX and (syntax != "tptp" or operator == "eq"):
+                text = "(" + f" {_INFIX[operator][0]} ".join(operands) + ")"
+            elif operator in _INFIX:
+                text = f"{_INFIX[operator][1]}({', '.join(operands)})"
+            else:
+                symbol = name[:1].lower() + name[1:] if syntax == "tptp" else name
+                text = f"{symbol}({', '.join(operands)})" if operands else symbol
+            rendered.append(text)
+        return tuple(rendered)
+
+    @staticmethod
+    def _variable(name, syntax):
+        # TPTP variables start with an uppercase letter
+        return name[:1].upper() + name[1:] if syntax == "tptp" else name
+
+
+def expr_to_fol_string(expr, syntax="unicode", renderer=None):
+    """
+    Render a Z3 formula as a FOL string.
+
+    Args:
+        expr (z3.ExprRef): The formula to render.
+        syntax (str): Output syntax ("unicode", "ascii" or "tptp"), ignored if a renderer is given.
+        renderer (FOLRenderer): Optional renderer whose memoized subterms are reused.
+
+    Returns:
+        str: The rendered formula.
+    """
+    if renderer is None:
+        renderer = FOLRenderer((syntax,))
+    return renderer.render(expr)
+
+def build_record(premises, questions, answers, indices):
+    """
+    Build a single dataset record from rendered premises and questions.
 
     Args:
-        filepath (str): Path to the JSON file.
         premises (list): List of premises in string format.
         questions (list): List of questions in string format.
         answers (list): List of answers (e.g., "A", "B", "Yes", "Uncertain").
         indices (list): List of lists, where each sublist contains indices of premises used for each answer.
+
+    Returns:
+        dict: The record, with the same keys as the files written by save_to_json.
     """
-    data = {
+    return {
         "premises": premises,
         "questions": questions,
         "answers": answers,
         "idx": indices
     }
 
+def save_to_json(filepath, premises, questions, answers, indices):
+    """
+    Save premises, questions, answers, and indices to a JSON file.
+
+    Args:
+        filepath (str): Path to the JSON file.
+        premises (list): List of premises in string format.
+        questions (list): List of questions in string format.
+        answers (list): List of answers (e.g., "A", "B", "Yes", "Uncertain").
+        indices (list): List of lists, where each sublist contains indices of premises used for each answer.
+    """
+    data = build_record(premises, questions, answers, indices)
+
     with open(filepath, 'w', encoding='utf-8') as json_file:
         json.dump(data, json_file, indent=4, ensure_ascii=False)
 
@@ -0,0 +1,231 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+import random
+
+# Compression codecs: file suffix and opener. Each checkpoint closes the current file, which
+# ends a compressed member/stream; appending after a resume starts a new one, and all three
+# formats read concatenated members back as a single stream.
+COMPRESSIONS = {
+    None: ("", open),
+    "gzip": (".gz", gzip.open),
+    "bz2": (".bz2", bz2.open),
+    "xz": (".xz", lzma.open),
+}
+
+
+class JsonlWriter:
+    """
+    Stream dataset records to JSONL files, one record per line, with optional compression,
+    size-based sharding and checkpoint-resume.
+
+    A checkpoint stores the number of records written, the position in the current shard
+    file and the state of the random generator driving the generation. Resuming truncates
+    whatever was written after the last checkpoint and restores the generator, so an
+    interrupted run continues exactly where it stopped.
+    """
+
+    def __init__(self, output_dir, prefix="data", compression=None, max_shard_bytes=None,
+                 checkpoint_every=100, rng=random, resume=False, state=None):
+        """
+        Args:
+            output_dir (str): Directory the shard files and the checkpoint are written to.
+            prefix (str): Prefix of the file names.
+            compression (str): None, "gzip", "bz2" or "xz".
+            max_shard_bytes (int): Start a new shard once the current one holds this many
+                uncompressed bytes. None writes a single shard.
+            checkpoint_every (int): Number of records between automatic checkpoints.
+            rng: Random generator whose state is checkpointed (the `random` module or a
+                `random.Random` instance).
+            resume (bool): If True and a checkpoint exists, continue from it. Otherwise
+                existing shards with the same prefix are overwritten.
+            state: Optional object checkpointed along with the records, e.g. a DedupIndex
+                with a journal: its checkpoint(count) is called before every checkpoint is
+                written, and its restore(count) when resuming (restore(0) when starting over).
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.compression = compression
+        self.max_shard_bytes = max_shard_bytes
+        self.checkpoint_every = checkpoint_every
+        self.rng = rng
+        self.state = state
+
+        self.count = 0  # Records written (and kept) so far
+        self.shard = 0
+        self.shard_bytes = 0  # Uncompressed bytes in the current shard
+        self._file = None
+        self._since_checkpoint = 0
+        self._append = False  # Whether the next open of the current shard keeps its content
+
+        os.makedirs(output_dir, exist_ok=True)
+        if resume and os.path.exists(self.checkpoint_path):
+            self._restore()
+        else:
+            self._remove_shards(0)
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+            if self.state is not None:
+                self.state.restore(0)
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.output_dir, f"{self.prefix}.checkpoint.json")
+
+    def shard_path(self, shard):
+        """
+        Return the path of the given shard file.
+        """
+        suffix, _ = COMPRESSIONS[self.compression]
+        return os.path.join(self.output_dir, f"{self.prefix}-{shard:05d}.jsonl{suffix}")
+
+    @property
+    def paths(self):
+        """
+        Paths of the shard files written so far.
+        """
+        return [self.shard_path(shard) for shard in range(self.shard + 1) if os.path.exists(self.shard_path(shard))]
+
+    def _open(self):
+        _, opener = COMPRESSIONS[self.compression]
+        mode = "at" if self._append else "wt"
+        self._file = opener(self.shard_path(self.shard), mode, encoding="utf-8")
+        self._append = True
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            # The compressed stream is only complete once closed, so sync through a new handle
+            with open(self.shard_path(self.shard), "ab") as shard_file:
+                os.fsync(shard_file.fileno())
+
+    def write(self, record):
+        """
+        Append one record as a JSON line, rolling over to a new shard and checkpointing as configured.
+
+        Args:
+            record (dict): The record to write.
+        """
+        if self._file is None:
+            self._open()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._file.write(line)
+        self.shard_bytes += len(line.encode("utf-8"))
+        self.count += 1
+        self._since_checkpoint += 1
+
+        if self.max_shard_bytes is not None and self.shard_bytes >= self.max_shard_bytes:
+            self._close_file()
+            self.shard += 1
+            self.shard_bytes = 0
+            self._append = False
+            self.checkpoint()
+        elif self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Make everything written so far durable and record the position and the RNG state.
+
+        The shard and the checkpoint file are both synced to disk before the checkpoint
+        replaces the previous one, so it never points past data lost in a crash.
+        """
+        # Closing ends the compressed stream, so the file size is a valid truncation point
+        self._close_file()
+        if self.state is not None:
+            self.state.checkpoint(self.count)
+        path = self.shard_path(self.shard)
+        state = {
+            "count": self.count,
+            "shard": self.shard,
+            "shard_bytes": self.shard_bytes,
+            "file_size": os.path.getsize(path) if os.path.exists(path) else 0,
+            "compression": self.compression,
+            "rng_state": _encode_rng_state(self.rng.getstate()),
+        }
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as json_file:
+            json.dump(state, json_file)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        self._since_checkpoint = 0
+
+    def _restore(self):
+        with open(self.checkpoint_path, encoding='utf-8') as json_file:
+            state = json.load(json_file)
+        if state["compression"] != self.compression:
+            raise ValueError(f"Checkpoint was written with compression {state['compression']!r}.")
+
+        self.count = state["count"]
+        self.shard = state["shard"]
+        self.shard_bytes = state["shard_bytes"]
+        self.rng.setstate(_decode_rng_state(state["rng_state"]))
+
+        # Drop whatever was written after the checkpoint
+        path = self.shard_path(self.shard)
+        if os.path.exists(path):
+            with open(path, "r+b") as shard_file:
+                shard_file.truncate(state["file_size"])
+        self._remove_shards(self.shard + 1)
+        self._append = True
+        if self.state is not None:
+            self.state.restore(self.count)
+
+    def _remove_shards(self, first):
+        shard = first
+        while os.path.exists(self.shard_path(shard)):
+            os.remove(self.shard_path(shard))
+            shard += 1
+
+    def close(self):
+        """
+        Write a final checkpoint and close the current shard.
+        """
+        self.checkpoint()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the last checkpoint so the run resumes from a consistent state
+            self._close_file()
+
+
+def _encode_rng_state(state):
+    version, internal, gauss_next = state
+    return [version, list(internal), gauss_next]
+
+
+def _decode_rng_state(state):
+    version, internal, gauss_next = state
+    return version, tuple(internal), gauss_next
+
+
+def read_jsonl(paths):
+    """
+    Iterate over the records of JSONL shard files, compressed or not.
+
+    Args:
+        paths (list): Shard files, in order.
+
+    Yields:
+        dict: One record per line.
+    """
+    for path in paths:
+        opener = open
+        for suffix, codec_opener in COMPRESSIONS.values():
+            if suffix and path.endswith(suffix):
+                opener = codec_opener
+        with opener(path, "rt", encoding="utf-8") as shard_file:
+            for line in shard_file:
+                if line.strip():
+                    yield json.loads(line)
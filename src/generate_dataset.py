@@ -0,0 +1,94 @@
+import argparse
+import json
+import logging
+
+from fol_reasoning.bulk import generate_bulk
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a sharded FOL reasoning dataset in parallel.")
+    parser.add_argument("--output-dir", default="dataset", help="Directory the shard files are written to.")
+    parser.add_argument("--samples", type=int, default=10000, help="Total number of samples to generate.")
+    parser.add_argument("--shard-size", type=int, default=1000, help="Number of samples per shard.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the run; each shard derives its own seed from it.")
+    parser.add_argument("--steps", type=int, default=3, help="Total number of premises per sample.")
+    parser.add_argument("--chain-count", type=int, default=1, help="Number of chained premises per sample.")
+    parser.add_argument("--derive-count", type=int, default=2, help="Number of derived premises per sample.")
+    parser.add_argument("--shards", type=int, nargs="*", default=None, help="Only (re)generate these shard indices.")
+    parser.add_argument("--cache", default=None, help="Optional SQLite file persisting validity results across runs.")
+    parser.add_argument("--compression", choices=["gzip", "bz2", "xz"], default=None, help="Compress the JSONL files.")
+    parser.add_argument("--max-file-bytes", type=int, default=None, help="Roll a shard over to a new file after this many bytes.")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Number of samples between checkpoints.")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run from its checkpoints.")
+    parser.add_argument("--timeout", type=int, default=None, help="Timeout of each solver check, in milliseconds.")
+    parser.add_argument("--rlimit", type=int, default=None, help="Resource limit of each solver check.")
+    parser.add_argument("--no-dedup", action="store_true", help="Keep duplicate problems.")
+    parser.add_argument("--dedup-index", default=None, help="Optional SQLite file of the dedup index shared across shards and runs.")
+    parser.add_argument("--mine-distractors", action="store_true", help="Mine multiple-choice distractors close to the answer (requires NumPy).")
+    parser.add_argument("--predicates", type=int, default=None, help="Draw premises over a signature with this many predicates.")
+    parser.add_argument("--arities", type=int, nargs="+", default=[1], help="Arities of the signature predicates, assigned in turn.")
+    parser.add_argument("--sorts", type=int, default=1, help="Number of sorts of the signature.")
+    parser.add_argument("--constants", type=int, default=1, help="Number of constants per sort of the signature.")
+    parser.add_argument("--profile", default=None, help="Optional path to write the solver profile as JSON.")
+    parser.add_argument("--stats", default=None, help="Optional path to write the run statistics as JSON.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    result = generate_bulk(
+        args.output_dir,
+        args.samples,
+        shard_size=args.shard_size,
+        workers=args.workers,
+        seed=args.seed,
+        steps=args.steps,
+        chain_count=args.chain_count,
+        derive_count=args.derive_count,
+        shards=args.shards,
+        cache_path=args.cache,
+        compression=args.compression,
+        max_file_bytes=args.max_file_bytes,
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        timeout=args.timeout,
+        rlimit=args.rlimit,
+        dedup=not args.no_dedup,
+        dedup_path=args.dedup_index,
+        mine_distractors=args.mine_distractors,
+        signature=None if args.predicates is None else {
+            "num_predicates": args.predicates,
+            "arities": tuple(args.arities),
+            "num_sorts": args.sorts,
+            "constants_per_sort": args.constants,
+        },
+    )
+
+    # Report throughput per worker to see how generation scales across cores
+    summary = result["summary"]
+    print("\n=== Throughput ===")
+    for pid, worker in sorted(summary["workers"].items()):
+        print(f"Worker {pid}: {worker['samples']} samples in {worker['elapsed']:.2f}s "
+              f"({worker['samples_per_sec']:.1f} samples/sec)")
+    print(f"Total: {summary['samples']} samples in {summary['wall_time']:.2f}s "
+          f"({summary['samples_per_sec']:.1f} samples/sec, "
+          f"{summary['samples_per_sec_per_worker']:.1f} samples/sec per worker)")
+
+    cache = summary["cache"]
+    print(f"Validity cache: {cache['hits']} hits ({cache['disk_hits']} from disk), "
+          f"{cache['misses']} misses, {cache['evictions']} evictions")
+    print(f"Duplicate problems rejected: {summary['duplicates']}")
+
+    profile = result["profile"]
+    print("\n=== Solver profile ===")
+    for stage, totals in sorted(profile["stages"].items()):
+        print(f"{stage}: {totals['calls']} queries in {totals['time']:.2f}s, "
+              f"{totals['solver_calls']} solver checks in {totals['solver_time']:.2f}s, {totals['retries']} retries")
+    if profile["skipped"]:
+        print(f"Skipped samples: {profile['skipped']}")
+
+    if args.profile:
+        with open(args.profile, 'w', encoding='utf-8') as json_file:
+            json.dump(profile, json_file, indent=4)
+
+    if args.stats:
+        with open(args.stats, 'w', encoding='utf-8') as json_file:
+            json.dump({"shards": result["shards"], "summary": result["summary"]}, json_file, indent=4)
@@ -0,0 +1,49 @@
+import argparse
+import glob
+import json
+import os
+
+from fol_reasoning.grading import Grader
+from fol_reasoning.writer import read_jsonl
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grade model answers against a generated dataset.")
+    parser.add_argument("--dataset", nargs="+", required=True,
+                        help="Dataset files (save_to_json output or JSONL shards), or directories of shards.")
+    parser.add_argument("--predictions", nargs="+", required=True,
+                        help="JSONL files of predictions {record, question, answer, premises}.")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Number of predictions scored at once.")
+    parser.add_argument("--output", default=None, help="Optional path to write the per-prediction results as JSONL.")
+    parser.add_argument("--summary", default=None, help="Optional path to write the summary as JSON.")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.dataset:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, "*.jsonl*"))))
+        else:
+            paths.append(path)
+    grader = Grader.load(paths)
+    print(f"Loaded {len(grader.offsets)} records, {len(grader)} questions")
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for result in grader.grade_stream(read_jsonl(args.predictions), batch_size=args.batch_size):
+            if output is not None:
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if output is not None:
+            output.close()
+
+    summary = grader.summary()
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+    print(f"Accuracy: {summary['accuracy']:.3f} over {summary['count']} predictions "
+          f"({summary['missing']} of unknown questions)")
+    for kind, metrics in summary["types"].items():
+        line = (f"{kind}: accuracy {metrics['accuracy']:.3f} over {metrics['count']}, "
+                f"{metrics['unparsed']} unparsed, {metrics['predictions_per_sec']:.0f} predictions/sec")
+        if "premises" in metrics:
+            line += f", premise F1 {metrics['premises']['f1']:.3f}"
+        print(line)
@@ -0,0 +1,32 @@
+import argparse
+import asyncio
+import logging
+
+from fol_reasoning.service import GenerationService, serve
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve FOL reasoning samples on demand over JSONL (stdin/stdout or TCP).")
+    parser.add_argument("--workers", type=int, default=4, help="Number of generation threads, each with its own Z3 context.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Maximum number of requests handed to a thread at once.")
+    parser.add_argument("--batch-wait", type=float, default=0.005, help="Seconds to wait for more requests before sending a batch.")
+    parser.add_argument("--max-pending", type=int, default=256, help="Maximum number of queued requests before reading stops.")
+    parser.add_argument("--cache", default=None, help="Optional SQLite file persisting validity results across runs.")
+    parser.add_argument("--timeout", type=int, default=None, help="Timeout of each solver check, in milliseconds.")
+    parser.add_argument("--rlimit", type=int, default=None, help="Resource limit of each solver check.")
+    parser.add_argument("--no-warmup", action="store_true", help="Do not generate a sample on every thread at start-up.")
+    parser.add_argument("--host", default=None, help="Address to listen on with --port (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=None, help="Serve JSONL over TCP on this port instead of stdin/stdout.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    service = GenerationService(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        batch_wait=args.batch_wait,
+        max_pending=args.max_pending,
+        cache_path=args.cache,
+        timeout=args.timeout,
+        rlimit=args.rlimit,
+        warmup=not args.no_warmup,
+    )
+    asyncio.run(serve(service, host=args.host, port=args.port))
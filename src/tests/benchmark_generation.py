@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.reasoning import FOLReasoning
+from fol_reasoning.questions import generate_chained_multiple_choice_question, generate_chained_yes_no_question
+from fol_reasoning.utils import expr_to_fol_string, build_record
+from fol_reasoning.cache import ValidityCache
+
+# (steps, chain_count, derive_count) configurations measured for generate_premises throughput
+DEFAULT_GRID = [(3, 1, 2), (3, 3, 2), (5, 2, 2), (5, 3, 4), (8, 4, 4)]
+
+# Direction of every metric kind: +1 if higher is better, -1 if lower is better
+DIRECTIONS = {
+    "samples_per_sec": 1,
+    "median_us": -1,
+    "p95_us": -1,
+    "peak_bytes_per_10k": -1,
+    "import_ms": -1,
+}
+
+# Metrics reported but never counted as regressions: import times are dominated by disk
+# and filesystem-cache state rather than by the code, and swing by tens of percent between
+# identical runs. What the import benchmark gates is whether z3 gets loaded.
+REPORT_ONLY = {"import_ms"}
+
+# Entry points timed by the import benchmark; the lightweight ones must not load z3
+IMPORT_MODULES = {
+    "fol_reasoning.utils": False,
+    "fol_reasoning.premise": False,
+    "fol_reasoning.writer": False,
+    "fol_reasoning.reasoning": True,
+    "fol_reasoning.bulk": True,
+}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _latency(timings):
+    return {
+        "calls": len(timings),
+        "median_us": statistics.median(timings) * 1e6,
+        "p95_us": _percentile(timings, 0.95) * 1e6,
+    }
+
+
+def _calibrate(repeat):
+    # Time a fixed pure-Python workload: timings are compared relative to it, so that a
+    # slower or busier machine does not show up as a regression
+    best = float("inf")
+    for _ in range(max(repeat, 3)):
+        start = time.perf_counter()
+        table = {}
+        for idx in range(200000):
+            table[idx % 1000] = table.get(idx % 1000, 0) + idx
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _uncached_reasoner():
+    # Disable the validity cache so repeated measurements time the engines themselves
+    return FOLReasoning(cache=ValidityCache(maxsize=0))
+
+
+def _generate_sample(fol_reasoning, steps, chain_count, derive_count):
+    premises = fol_reasoning.generate_premises(steps, chain_count, derive_count)
+    all_premises = premises["original"] + premises["derived"] + premises["unrelated"]
+    mc_question, mc_answer, mc_used_indices = generate_chained_multiple_choice_question(premises, option="last")
+    yn_question, yn_answer, yn_used_indices = generate_chained_yes_no_question(premises, option="random")
+    return build_record(
+        [expr_to_fol_string(expr) for _, expr in all_premises],
+        [mc_question, yn_question],
+        [mc_answer, yn_answer],
+        [mc_used_indices, yn_used_indices],
+    )
+
+
+def bench_generate_premises(grid, samples, seed, repeat):
+    """
+    Measure generate_premises throughput for every (steps, chain_count, derive_count) of the grid,
+    keeping the best of `repeat` identical runs.
+    """
+    results = {}
+    for steps, chain_count, derive_count in grid:
+        elapsed = float("inf")
+        for _ in range(repeat):
+            random.seed(seed)
+            fol_reasoning = _uncached_reasoner()
+            start = time.perf_counter()
+            for _ in range(samples):
+                fol_reasoning.generate_premises(steps, chain_count, derive_count)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        results[f"generate_premises[{steps},{chain_count},{derive_count}]"] = {
+            "samples": samples,
+            "samples_per_sec": samples / elapsed,
+        }
+    return results
+
+
+def bench_latencies(samples, seed, repeat):
+    """
+    Measure the per-call latency of is_tautology, expr_to_fol_string and both question generators.
+    Every call is timed `repeat` times and its fastest time is kept.
+    """
+    random.seed(seed)
+    fol_reasoning = _uncached_reasoner()
+    premise_sets = [fol_reasoning.generate_premises(3, 1, 2) for _ in range(samples)]
+    formulas = [expr for premises in premise_sets for group in premises.values() for _, expr in group]
+
+    names = ("is_tautology", "expr_to_fol_string", "multiple_choice_question", "yes_no_question")
+    timings = {name: None for name in names}
+    for _ in range(repeat):
+        run = {name: [] for name in names}
+        for expr in formulas:
+            start = time.perf_counter()
+            fol_reasoning.is_tautology(expr)
+            run["is_tautology"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            expr_to_fol_string(expr)
+            run["expr_to_fol_string"].append(time.perf_counter() - start)
+
+        random.seed(seed)
+        for premises in premise_sets:
+            start = time.perf_counter()
+            generate_chained_multiple_choice_question(premises, option="last")
+            run["multiple_choice_question"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            generate_chained_yes_no_question(premises, option="random")
+            run["yes_no_question"].append(time.perf_counter() - start)
+
+        for name in names:
+            timings[name] = run[name] if timings[name] is None else list(map(min, timings[name], run[name]))
+
+    return {name: _latency(values) for name, values in timings.items()}
+
+
+def bench_memory(samples, seed):
+    """
+    Measure the peak traced memory of generating samples and keeping their records in memory,
+    scaled to 10k samples.
+    """
+    random.seed(seed)
+    fol_reasoning = FOLReasoning()
+    tracemalloc.start()
+    records = [_generate_sample(fol_reasoning, 3, 1, 2) for _ in range(samples)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "peak_memory": {
+            "samples": len(records),
+            "peak_bytes": peak,
+            "peak_bytes_per_10k": peak * 10000 / samples,
+        }
+    }
+
+
+def bench_import_time(repeat):
+    """
+    Measure the import time of every entry point of IMPORT_MODULES in a fresh interpreter,
+    keeping the best of `repeat` runs, and check which ones load z3.
+    """
+    src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    for module, needs_z3 in IMPORT_MODULES.items():
+        script = (f"import sys, time; start = time.perf_counter(); import {module}; "
+                  f"print(time.perf_counter() - start, 'z3' in sys.modules)")
+        best = float("inf")
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", script], cwd=src, check=True,
+                                    capture_output=True, text=True).stdout.split()
+            best = min(best, float(output[0]))
+        loads_z3 = output[1] == "True"
+        if loads_z3 and not needs_z3:
+            raise RuntimeError(f"Importing {module} loads z3.")
+        results[f"import[{module}]"] = {"import_ms": best * 1e3, "loads_z3": loads_z3}
+    return results
+
+
+def _calibrated(benchmark, repeat):
+    # Calibrate right before and after a benchmark: machine speed drifts over tens of
+    # seconds (frequency scaling, noisy neighbours), so a single calibration for the whole
+    # run can land in a different phase than the timings it scales
+    before = _calibrate(repeat)
+    results = benchmark()
+    calibration = (before + _calibrate(repeat)) / 2
+    for metrics in results.values():
+        metrics["calibration_sec"] = calibration
+    return results
+
+
+def run_benchmarks(grid=DEFAULT_GRID, samples=50, latency_samples=50, memory_samples=300, seed=0, repeat=3):
+    """
+    Run the whole suite with fixed seeds.
+
+    Returns:
+        dict: Environment information and one entry of metrics per benchmark, each with the
+        calibration time measured around it.
+    """
+    calibration = _calibrate(repeat)
+    benchmarks = {}
+    for configuration in grid:
+        benchmarks.update(_calibrated(lambda: bench_generate_premises([configuration], samples, seed, repeat), repeat))
+    benchmarks.update(_calibrated(lambda: bench_latencies(latency_samples, seed, repeat), repeat))
+    benchmarks.update(bench_memory(memory_samples, seed))
+    benchmarks.update(bench_import_time(repeat))
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "calibration_sec": calibration,
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Compare results to a baseline and list the metrics that regressed by more than the threshold.
+
+    Timing metrics are scaled by the ratio of the calibration workloads measured around the
+    benchmark in both runs (or of the whole runs, for benchmarks without their own), so the
+    comparison measures the pipeline rather than the speed of the machine at the time.
+    Metrics of REPORT_ONLY are compared but never regress; an entry point that starts
+    loading z3 always does.
+
+    Args:
+        results (dict): Output of run_benchmarks.
+        baseline (dict): A previous output of run_benchmarks.
+        threshold (float): Allowed relative regression (e.g. 0.2 for 20%).
+
+    Returns:
+        list: One dict per compared metric, with its relative change and whether it regressed.
+    """
+    run_calibration = results["environment"].get("calibration_sec")
+    run_reference_calibration = baseline.get("environment", {}).get("calibration_sec")
+
+    comparisons = []
+    for name, metrics in results["benchmarks"].items():
+        reference = baseline["benchmarks"].get(name, {})
+        speed = 1.0
+        calibration = metrics.get("calibration_sec", run_calibration)
+        reference_calibration = reference.get("calibration_sec", run_reference_calibration)
+        if calibration and reference_calibration:
+            speed = calibration / reference_calibration  # > 1 if this run's machine is slower
+        for metric, direction in DIRECTIONS.items():
+            if metric not in metrics or not reference.get(metric):
+                continue
+            expected = reference[metric]
+            if metric == "samples_per_sec":
+                expected /= speed
+            elif metric.endswith(("_us", "_ms")):
+                expected *= speed
+            # Positive change means better, whatever the direction of the metric
+            change = direction * (metrics[metric] - expected) / expected
+            comparisons.append({
+                "benchmark": name,
+                "metric": metric,
+                "baseline": reference[metric],
+                "value": metrics[metric],
+                "change": change,
+                "regressed": metric not in REPORT_ONLY and change < -threshold,
+            })
+        if "loads_z3" in metrics and "loads_z3" in reference:
+            comparisons.append({
+                "benchmark": name,
+                "metric": "loads_z3",
+                "baseline": reference["loads_z3"],
+                "value": metrics["loads_z3"],
+                "change": 0.0,
+                "regressed": metrics["loads_z3"] and not reference["loads_z3"],
+            })
+    return comparisons
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the FOL generation pipeline against a stored baseline.")
+    default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+    parser.add_argument("--baseline", default=default_baseline, help="Baseline results to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.4, help="Allowed relative regression of any gated metric.")
+    parser.add_argument("--samples", type=int, default=50, help="Samples per generate_premises configuration.")
+    parser.add_argument("--latency-samples", type=int, default=50, help="Premise sets used for the latency benchmarks.")
+    parser.add_argument("--memory-samples", type=int, default=300, help="Samples generated for the memory benchmark.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of every benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Identical runs per timing; the fastest is kept.")
+    parser.add_argument("--output", default=None, help="Optional path to write the results as JSON.")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(samples=args.samples, latency_samples=args.latency_samples,
+                             memory_samples=args.memory_samples, seed=args.seed, repeat=args.repeat)
+
+    regressions = []
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as json_file:
+            json.dump(results, json_file, indent=4)
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as json_file:
+            baseline = json.load(json_file)
+        results["comparison"] = compare_to_baseline(results, baseline, args.threshold)
+        for comparison in results["comparison"]:
+            status = "REGRESSED" if comparison["regressed"] else "ok"
+            if comparison["metric"] in REPORT_ONLY:
+                status = "(not gated)"
+            print(f"{comparison['benchmark']:<45} {comparison['metric']:<20} "
+                  f"{comparison['value']:>14.1f} ({comparison['change']:+.1%}) {status}")
+        regressions = [comparison for comparison in results["comparison"] if comparison["regressed"]]
+    else:
+        print(json.dumps(results["benchmarks"], indent=4))
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as json_file:
+            json.dump(results, json_file, indent=4)
+
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}.")
+        sys.exit(1)
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fol_reasoning.bulk as bulk
+from fol_reasoning.bulk import generate_shard
+from fol_reasoning.entailment import DerivationError
+from fol_reasoning.writer import read_jsonl
+
+
+def _shard_bytes(stats):
+    content = b""
+    for path in stats["paths"]:
+        with open(path, "rb") as shard_file:
+            content += shard_file.read()
+    return content
+
+
+def test_resumed_shard_matches_uninterrupted(tmp_path):
+    fresh = generate_shard(0, 150, str(tmp_path / "fresh"), 7, 2, 1, 1, checkpoint_every=20)
+    assert fresh["dedup"]["duplicates"] > 0
+
+    resumed_dir = str(tmp_path / "resumed")
+    generate_shard(0, 75, resumed_dir, 7, 2, 1, 1, checkpoint_every=20)
+    resumed = generate_shard(0, 150, resumed_dir, 7, 2, 1, 1, checkpoint_every=20, resume=True)
+    assert resumed["resumed_from"] == 75
+    assert _shard_bytes(resumed) == _shard_bytes(fresh)
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_resume_drops_samples_after_the_checkpoint(tmp_path, monkeypatch, shared):
+    def dedup_path(name):
+        return str(tmp_path / f"{name}.sqlite") if shared else None
+
+    fresh = generate_shard(0, 100, str(tmp_path / "fresh"), 7, 2, 1, 1, checkpoint_every=20,
+                           dedup_path=dedup_path("fresh"))
+
+    # Interrupt the shard between two checkpoints: the records and fingerprints written
+    # after the last checkpoint must be forgotten on resume
+    generate_sample = bulk.generate_sample
+    calls = []
+
+    def interrupted(*args, **kwargs):
+        calls.append(None)
+        if len(calls) > 70:
+            raise KeyboardInterrupt
+        return generate_sample(*args, **kwargs)
+
+    resumed_dir = str(tmp_path / "resumed")
+    monkeypatch.setattr(bulk, "generate_sample", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        generate_shard(0, 100, resumed_dir, 7, 2, 1, 1, checkpoint_every=20, dedup_path=dedup_path("resumed"))
+    monkeypatch.setattr(bulk, "generate_sample", generate_sample)
+    resumed = generate_shard(0, 100, resumed_dir, 7, 2, 1, 1, checkpoint_every=20, resume=True,
+                             dedup_path=dedup_path("resumed"))
+    assert 0 < resumed["resumed_from"] < 70
+    assert _shard_bytes(resumed) == _shard_bytes(fresh)
+
+
+def test_shard_resamples_after_a_derivation_error(tmp_path, monkeypatch):
+    generate_sample = bulk.generate_sample
+    calls = []
+
+    def failing_once(*args, **kwargs):
+        calls.append(None)
+        if len(calls) == 3:
+            raise DerivationError("No new derivation.")
+        return generate_sample(*args, **kwargs)
+
+    monkeypatch.setattr(bulk, "generate_sample", failing_once)
+    stats = generate_shard(0, 5, str(tmp_path), 7, 2, 1, 1)
+    assert len(list(read_jsonl(stats["paths"]))) == 5
+    assert stats["profile"]["stages"]["sample"]["retries"] == 1
@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.cache import ValidityCache
+
+
+def test_validity_caches_share_a_database(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first, second = ValidityCache(path=path), ValidityCache(path=path)
+    first.put("T:a", True)
+    second.put("T:b", False)
+
+    # Neither cache holds the write lock between puts, so both flush without waiting
+    start = time.perf_counter()
+    second.flush()
+    first.flush()
+    assert time.perf_counter() - start < 5
+
+    third = ValidityCache(path=path)
+    assert third.get("T:a") is True
+    assert third.get("T:b") is False
+    for cache in (first, second, third):
+        cache.close()
+
+
+def test_buffered_results_are_hits(tmp_path):
+    cache = ValidityCache(maxsize=1, path=str(tmp_path / "cache.sqlite"))
+    cache.put("T:a", True)
+    cache.put("T:b", False)  # Evicts T:a from memory before it is written
+    assert cache.get("T:a") is True
+    cache.close()
+
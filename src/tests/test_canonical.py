@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.canonical import DedupIndex
+
+
+def test_dedup_indexes_share_a_database(tmp_path):
+    path = str(tmp_path / "dedup.sqlite")
+    first, second = DedupIndex(path=path), DedupIndex(path=path)
+    start = time.perf_counter()
+    assert first.add(b"a" * 16)
+    assert second.add(b"b" * 16)
+    assert not second.add(b"a" * 16)
+    assert not first.add(b"b" * 16)
+    assert time.perf_counter() - start < 5
+    assert len(first) == 2
+    first.close()
+    second.close()
+
+
+def test_dedup_restore_forgets_fingerprints_after_the_checkpoint(tmp_path):
+    journal = str(tmp_path / "dedup.journal")
+    index = DedupIndex(journal=journal)
+    index.restore(0)
+    assert index.add(b"a" * 16)
+    index.checkpoint(1)
+    assert index.add(b"b" * 16)
+    index.close()
+
+    restored = DedupIndex(journal=journal)
+    restored.restore(1)
+    assert b"a" * 16 in restored
+    assert b"b" * 16 not in restored
+    restored.close()
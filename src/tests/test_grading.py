@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.grading import MULTIPLE_CHOICE, YES_NO, Grader, normalize_answer
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("B", "B"),
+    ("(C)", "C"),
+    ("A", "A"),
+    ("Answer: (C)", "C"),
+    ("**Answer:** D", "D"),
+    ("A is correct.", "A"),
+    ("B because premise 1 entails it.", "B"),
+    ("A statement that follows is C.", "C"),
+    ("The answer is a consequence of premise 2, so B", "B"),
+    ("I first thought A, but the answer is D.", "D"),
+    ("Answer: B. Option A does not follow.", "B"),
+    ("a", None),
+    ("I do not know.", None),
+    (None, None),
+])
+def test_normalize_multiple_choice(text, expected):
+    assert normalize_answer(MULTIPLE_CHOICE, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Yes", "Yes"),
+    ("The statement is true.", "Yes"),
+    ("It is false.", "No"),
+    ("It is not true.", "No"),
+    ("It is not false.", "Yes"),
+    ("The statement is not necessarily true; it is uncertain.", "Uncertain"),
+    ("This cannot be determined from the premises.", "Uncertain"),
+    ("No. If P(x) were true, Q(x) would be too.", "No"),
+    ("It looks true at first. Answer: Uncertain", "Uncertain"),
+    ("Maybe", None),
+])
+def test_normalize_yes_no(text, expected):
+    assert normalize_answer(YES_NO, text) == expected
+
+
+def test_grade_batch():
+    grader = Grader()
+    grader.add_record({
+        "premises": ["P(x)", "P(x) → Q(x)"],
+        "questions": ["Based on the above premises, which statement can be inferred?\nA. ...",
+                      "Based on the above premises, is the statement true?\nQ(x)"],
+        "answers": ["B", "Yes"],
+        "idx": [[1, 2], [1, 2]],
+    })
+    results = grader.grade_batch([
+        {"record": 0, "question": 0, "answer": "Answer: B", "premises": [1]},
+        {"record": 0, "question": 1, "answer": "It is not true."},
+        {"record": 1, "question": 0, "answer": "B"},
+        {"record": None, "question": 0, "answer": "B"},
+        {"record": "first", "question": 0, "answer": "B"},
+    ])
+    assert results[0]["correct"] and results[0]["recall"] == 0.5 and results[0]["precision"] == 1.0
+    assert results[1]["parsed"] == "No" and not results[1]["correct"]
+    assert all(result["error"] == "Unknown question." for result in results[2:])
+    assert grader.missing == 3
+    assert grader.summary()["accuracy"] == 0.5
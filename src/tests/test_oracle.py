@@ -0,0 +1,101 @@
+import os
+import random
+import sys
+
+from z3 import *
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.reasoning import FOLReasoning
+from fol_reasoning.oracle import EntailmentOracle
+from fol_reasoning.questions import (displayed_premises, generate_chained_multiple_choice_question,
+                                     generate_chained_yes_no_question)
+from fol_reasoning.utils import FOLRenderer
+
+
+class RecordingOracle(EntailmentOracle):
+    # Keep every statement labelled, so the tests can check the labels independently
+    def __init__(self, premises):
+        super().__init__(premises)
+        self.labelled = []
+
+    def check(self, statement, exclude=()):
+        label, used = super().check(statement, exclude)
+        self.labelled.append((statement, label))
+        return label, used
+
+    def entails(self, statement, exclude=()):
+        entailed = super().entails(statement, exclude)
+        self.labelled.append((statement, "Yes" if entailed else None))
+        return entailed
+
+
+def _entails(premises, statement):
+    solver = Solver()
+    solver.add(*premises)
+    solver.add(Not(statement))
+    return solver.check() == unsat
+
+
+def _label(premises, statement):
+    if _entails(premises, statement):
+        return "Yes"
+    return "No" if _entails(premises, Not(statement)) else "Uncertain"
+
+
+def _samples(count, seed=0):
+    random.seed(seed)
+    reasoning = FOLReasoning()
+    for _ in range(count):
+        premises = reasoning.generate_premises(3, 1, 2)
+        yield premises, [expr for _, expr in displayed_premises(premises)]
+
+
+def test_yes_no_labels_follow_the_displayed_premises():
+    labels = set()
+    for premises, shown in _samples(60):
+        oracle = RecordingOracle(displayed_premises(premises))
+        renderer = FOLRenderer()
+        question, answer, used = generate_chained_yes_no_question(premises, option="random", renderer=renderer,
+                                                                  oracle=oracle)
+        labels.add(answer)
+        statement = question.split("Statement: ", 1)[1]
+        rendered_premises = {renderer.render(expr) for expr in shown}
+        if answer == "Yes":
+            assert used and all(0 <= idx < len(shown) for idx in used)
+        if statement in rendered_premises:
+            assert answer == "Yes"
+        for expr, label in oracle.labelled:
+            if renderer.render(expr) == statement:
+                assert label == answer == _label(shown, expr)
+    assert labels == {"Yes", "No", "Uncertain"}
+
+
+def test_used_premises_entail_the_answer():
+    for premises, shown in _samples(30):
+        oracle = RecordingOracle(displayed_premises(premises))
+        question, answer, used = generate_chained_yes_no_question(premises, option="last", oracle=oracle)
+        # The statement is the last derived premise itself unless the oracle labelled another
+        statement = oracle.labelled[-1][0] if oracle.labelled else premises["derived"][-1][1]
+        if answer == "Yes":
+            assert _entails([shown[idx] for idx in used], statement)
+        elif answer == "No":
+            assert _entails([shown[idx] for idx in used], Not(statement))
+        else:
+            assert used == []
+
+
+def test_multiple_choice_has_exactly_one_entailed_option():
+    for premises, shown in _samples(40):
+        oracle = RecordingOracle(displayed_premises(premises))
+        renderer = FOLRenderer()
+        question, letter, _ = generate_chained_multiple_choice_question(premises, option="last", renderer=renderer,
+                                                                        oracle=oracle)
+        options = dict(line.split(". ", 1) for line in question.splitlines()[1:])
+        assert sorted(options) == ["A", "B", "C", "D"]
+        assert len(set(options.values())) == 4
+        assert options[letter] == renderer.render(premises["derived"][-1][1])
+        candidates = {renderer.render(expr): expr for expr, _ in oracle.labelled}
+        for option, text in options.items():
+            if option != letter:
+                assert not _entails(shown, candidates[text])
@@ -0,0 +1,23 @@
+import os
+import sys
+
+from z3 import *
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.profiling import SolverProfiler, _GAUGE_STATISTICS
+
+
+def test_statistics_of_a_reused_solver_are_not_double_counted():
+    profiler = SolverProfiler()
+    solver = profiler.new_solver()
+    p, q, r = Bools("p q r")
+    solver.add(Or(p, q), Or(Not(p), r), Or(Not(q), r))
+    assert profiler.check(solver, Not(r), stage="test") == unsat
+    assert profiler.check(solver, p, stage="test") == sat
+
+    statistics = solver.statistics()
+    summed = profiler.entries[("test", None)]["statistics"]
+    for key in statistics.keys():
+        if not any(gauge in key for gauge in _GAUGE_STATISTICS) and key != "time":
+            assert summed[key] == statistics.get_key_value(key), key
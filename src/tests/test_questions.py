@@ -0,0 +1,73 @@
+import os
+import random
+import sys
+
+from z3 import *
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.distractors import DistractorMiner
+from fol_reasoning.reasoning import FOLReasoning
+from fol_reasoning.oracle import EntailmentOracle
+from fol_reasoning.questions import (displayed_premises, generate_chained_multiple_choice_question,
+                                     generate_chained_yes_no_question)
+from fol_reasoning.utils import FOLRenderer
+
+
+class CheckedOracle(EntailmentOracle):
+    # Keep every statement checked, so the tests can tell which candidates reached the solver
+    def __init__(self, premises):
+        super().__init__(premises)
+        self.checked = []
+
+    def check(self, statement, exclude=()):
+        self.checked.append(statement)
+        return super().check(statement, exclude)
+
+    def entails(self, statement, exclude=()):
+        self.checked.append(statement)
+        return super().entails(statement, exclude)
+
+
+def _entails(premises, statement):
+    solver = Solver()
+    solver.add(*premises)
+    solver.add(Not(statement))
+    return solver.check() == unsat
+
+
+def test_mined_distractors_are_not_checked_again():
+    random.seed(1)
+    reasoning = FOLReasoning()
+    miner = DistractorMiner.from_reasoner(reasoning)
+    used = 0
+    for _ in range(20):
+        premises = reasoning.generate_premises(3, 1, 2)
+        shown = [expr for _, expr in displayed_premises(premises)]
+        oracle = CheckedOracle(displayed_premises(premises))
+        renderer = FOLRenderer()
+        state = random.getstate()
+        mined = {renderer.render(expr): expr for expr in miner.mine(shown, premises["derived"][-1][1], count=3)}
+        random.setstate(state)
+        question, letter, _ = generate_chained_multiple_choice_question(premises, option="last", renderer=renderer,
+                                                                        oracle=oracle, miner=miner)
+        checked = {renderer.render(expr) for expr in oracle.checked}
+        options = dict(line.split(". ", 1) for line in question.splitlines()[1:])
+        for option, text in options.items():
+            if text in mined:
+                used += 1
+                assert text not in checked
+                assert not _entails(shown, mined[text])
+    assert used > 20
+
+
+def test_yes_no_question_without_unrelated_premises():
+    random.seed(0)
+    reasoning = FOLReasoning()
+    answers = set()
+    for _ in range(30):
+        premises = reasoning.generate_premises(3, 3, 2)
+        assert not premises["unrelated"]
+        _, answer, _ = generate_chained_yes_no_question(premises, option="random")
+        answers.add(answer)
+    assert answers <= {"Yes", "No", "Uncertain"}
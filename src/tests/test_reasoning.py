@@ -0,0 +1,88 @@
+import os
+import random
+import sys
+
+import pytest
+from z3 import Context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fol_reasoning.reasoning as reasoning_module
+from fol_reasoning.entailment import DerivationError
+from fol_reasoning.questions import generate_chained_multiple_choice_question, generate_chained_yes_no_question
+from fol_reasoning.reasoning import FOLReasoning
+
+
+def test_small_signature_runs_out_of_premises():
+    random.seed(0)
+    reasoning = FOLReasoning(signature={"num_predicates": 2, "arities": (1,), "num_sorts": 1, "constants_per_sort": 2})
+    with pytest.raises(ValueError, match="too few distinct premises"):
+        reasoning.generate_premises(20, 10, 5)
+
+
+@pytest.mark.parametrize("depth", [0, 7])
+def test_depth_out_of_range(depth):
+    with pytest.raises(ValueError, match="depth should be between 1 and 6"):
+        FOLReasoning().generate_premises(3, 1, 0, depth=depth)
+
+
+@pytest.mark.parametrize("depth", [1, 6])
+def test_chain_of_extreme_depth(depth):
+    reasoning = FOLReasoning()
+    for seed in range(5):
+        random.seed(seed)
+        premises = reasoning.generate_premises(3, 1, 0, depth=depth)
+        assert len(premises["derived"]) >= depth
+        assert len(premises["proofs"]) == len(premises["derived"])
+
+
+def test_chain_attempts_are_bounded(monkeypatch):
+    reasoning = FOLReasoning()
+    plant_chain = reasoning._plant_chain
+
+    def unreachable(depth):
+        chain, _ = plant_chain(depth)
+        return chain, reasoning.P(reasoning.y)  # Never derived from the chain
+
+    monkeypatch.setattr(reasoning_module, "MAX_CHAIN_ATTEMPTS", 5)
+    monkeypatch.setattr(reasoning, "_plant_chain", unreachable)
+    with pytest.raises(DerivationError, match="depth 2"):
+        reasoning.generate_premises(3, 1, 0, depth=2)
+    assert reasoning.profiler.retries[("chain", "depth 2")] == 5
+
+
+def test_derivations_only_check_for_tautologies(monkeypatch):
+    random.seed(0)
+    reasoning = FOLReasoning()
+
+    def entails(*args, **kwargs):
+        raise AssertionError("Implies(p1, p2) always follows from {p1, p2}.")
+
+    monkeypatch.setattr(reasoning, "entails", entails)
+    premises = reasoning.generate_premises(5, 2, 3)
+    assert len(premises["derived"]) == 3
+
+
+def test_compact_premise_sets_have_their_own_store():
+    random.seed(0)
+    reasoning = FOLReasoning(compact=True)
+    first = reasoning.generate_premises(3, 1, 2)
+    sizes = []
+    for _ in range(50):
+        premises = reasoning.generate_premises(3, 1, 2)
+        stores = {id(premise.store) for group in premises.values() for premise in group}
+        assert len(stores) == 1
+        sizes.append(len(premises["original"][0].store))
+    assert first["original"][0].store is not premises["original"][0].store
+    assert max(sizes) < 100
+
+
+def test_compact_premises_keep_the_context_of_the_reasoner():
+    random.seed(0)
+    ctx = Context()
+    reasoning = FOLReasoning(compact=True, ctx=ctx)
+    for _ in range(10):
+        premises = reasoning.generate_premises(3, 1, 2)
+        assert all(premise.expr.ctx is ctx for group in premises.values() for premise in group)
+        generate_chained_multiple_choice_question(premises)
+        generate_chained_yes_no_question(premises, option="random")
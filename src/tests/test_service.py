@@ -0,0 +1,41 @@
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.service import GenerationService
+
+
+def test_stop_writes_the_pending_cache_results(tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+
+    async def serve():
+        service = GenerationService(workers=2, cache_path=cache_path, warmup=False)
+        await service.start()
+        record = await service.submit({"steps": 3, "chain_count": 1, "derive_count": 2})
+        await service.stop()
+        return record
+
+    assert len(asyncio.run(serve())["questions"]) == 2
+    with sqlite3.connect(cache_path) as db:
+        assert db.execute("SELECT COUNT(*) FROM validity").fetchone()[0] > 0
+
+
+def test_start_fails_instead_of_hanging_when_a_thread_fails(monkeypatch):
+    init_thread = GenerationService._init_thread
+    calls = []
+
+    def failing(self):
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("No reasoner.")
+        init_thread(self)
+
+    monkeypatch.setattr(GenerationService, "_init_thread", failing)
+    service = GenerationService(workers=3, warmup=False)
+    with pytest.raises(RuntimeError, match="No reasoner"):
+        asyncio.run(asyncio.wait_for(service.start(), 30))
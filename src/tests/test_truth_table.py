@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+
+import pytest
+from z3 import *
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.reasoning import FOLReasoning
+from fol_reasoning.truth_table import TruthTableEngine
+
+
+def _z3_valid(expr):
+    solver = Solver()
+    solver.add(Not(expr))
+    result = solver.check()
+    assert result != unknown
+    return result == unsat
+
+
+def _rule_instances(count, seed):
+    # Instances of every rule over random literals, with and without shared atoms, so
+    # both valid and invalid formulas come up
+    random.seed(seed)
+    reasoning = FOLReasoning(engine="z3")
+    atoms = [f(reasoning.x) for f in (reasoning.P, reasoning.Q, reasoning.R, reasoning.S, reasoning.T, reasoning.U)]
+    formulas = []
+    for _ in range(count):
+        for rule_name, rule_func, arity in reasoning._templates:
+            literals = [atom if random.random() < 0.5 else Not(atom) for atom in random.choices(atoms, k=arity)]
+            formula = rule_func(*literals)
+            formulas += [formula, Not(formula), And(formula, random.choice(literals))]
+    return reasoning, formulas
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_truth_table_engine_agrees_with_z3(seed):
+    engine = TruthTableEngine()
+    _, formulas = _rule_instances(5, seed)
+    decided = 0
+    for formula in formulas:
+        result = engine.is_tautology(formula)
+        if result is not None:
+            decided += 1
+            assert result == _z3_valid(formula), formula
+    assert decided > len(formulas) // 2
+
+
+def test_entailment_agrees_with_z3():
+    random.seed(0)
+    reasoning = FOLReasoning(engine="z3")
+    engine = TruthTableEngine()
+    decided = 0
+    for _ in range(20):
+        premises = reasoning.generate_premises(3, 1, 2)
+        pool = [expr for group in premises.values() for _, expr in group]
+        for conclusion in pool + [Not(expr) for expr in pool]:
+            others = [expr for expr in pool if not expr.eq(conclusion)]
+            result = engine.entails(others, conclusion)
+            if result is not None:
+                decided += 1
+                assert result == _z3_valid(Implies(And(others), conclusion))
+    assert decided
@@ -0,0 +1,80 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fol_reasoning.writer import JsonlWriter, read_jsonl
+
+
+def _write(writer, count):
+    # Records drawn from the checkpointed generator, as the dataset generators do
+    while writer.count < count:
+        writer.write({"index": writer.count, "value": writer.rng.random()})
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "bz2", "xz"])
+def test_resume_after_interruption(tmp_path, compression):
+    options = {"compression": compression, "max_shard_bytes": 2000, "checkpoint_every": 25}
+    with JsonlWriter(str(tmp_path / "fresh"), rng=random.Random(1), **options) as writer:
+        _write(writer, 200)
+    expected = list(read_jsonl(writer.paths))
+    assert len(writer.paths) > 1
+
+    # Interrupted between two checkpoints: the records after the last one are dropped
+    output_dir = str(tmp_path / "resumed")
+    with pytest.raises(KeyboardInterrupt):
+        with JsonlWriter(output_dir, rng=random.Random(1), **options) as writer:
+            _write(writer, 130)
+            raise KeyboardInterrupt
+    with JsonlWriter(output_dir, rng=random.Random(2), resume=True, **options) as writer:
+        assert writer.count < 130
+        _write(writer, 200)
+    assert list(read_jsonl(writer.paths)) == expected
+
+
+def test_start_over_removes_previous_shards(tmp_path):
+    with JsonlWriter(str(tmp_path), max_shard_bytes=500) as writer:
+        for index in range(100):
+            writer.write({"index": index})
+    with JsonlWriter(str(tmp_path), max_shard_bytes=500) as writer:
+        writer.write({"index": 0})
+    assert writer.paths == [writer.shard_path(0)]
+    assert list(read_jsonl(writer.paths)) == [{"index": 0}]
+
+
+def test_resume_rejects_other_compression(tmp_path):
+    with JsonlWriter(str(tmp_path), compression="gzip") as writer:
+        writer.write({"index": 0})
+    with pytest.raises(ValueError):
+        JsonlWriter(str(tmp_path), compression="xz", resume=True)
+
+
+def test_checkpoint_syncs_the_shard_and_its_state(tmp_path, monkeypatch):
+    events = []
+    fsync, replace = os.fsync, os.replace
+
+    def recording_fsync(fd):
+        events.append(("fsync", os.fstat(fd).st_ino))
+        fsync(fd)
+
+    def recording_replace(source, target):
+        events.append(("replace", os.stat(source).st_ino))
+        replace(source, target)
+
+    monkeypatch.setattr(os, "fsync", recording_fsync)
+    monkeypatch.setattr(os, "replace", recording_replace)
+    with JsonlWriter(str(tmp_path), checkpoint_every=10) as writer:
+        for index in range(25):
+            writer.write({"index": index})
+    shard = os.stat(writer.shard_path(0)).st_ino
+
+    replaces = [position for position, (event, _) in enumerate(events) if event == "replace"]
+    assert len(replaces) == 3
+    start = 0
+    for position in replaces:
+        synced = {inode for event, inode in events[start:position] if event == "fsync"}
+        assert {shard, events[position][1]} <= synced
+        start = position + 1